@@ -0,0 +1,121 @@
+"""Persistent, content-addressed cache for model analyses.
+
+Entries are keyed by the uploaded image's content hash, a hash of the exact
+prompt sent (so editing a prompt template invalidates old answers on its own),
+the model id and any extra variant such as the output language. The cache is
+a SQLite file shared by all sessions and survives restarts; entries expire
+after a TTL and the least recently used ones are evicted past a size budget.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from enhancement import content_hash
+
+DEFAULT_PATH = os.path.join(
+    os.environ.get("DOCSIGHT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "docsight")),
+    "analyses.sqlite3",
+)
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def analysis_key(image_key, prompt, model_id, *variant):
+    """Cache key for an analysis of image_key; prompt is the full text sent to the model."""
+    prompt_version = content_hash(prompt.encode())
+    return content_hash("\0".join([image_key, prompt_version, model_id, *map(str, variant)]).encode())
+
+
+class AnalysisCache:
+    def __init__(self, path=DEFAULT_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # One connection shared by Streamlit's script threads, serialized by self._lock
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS analyses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS analyses_accessed ON analyses (accessed)")
+        return self._connection
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT value FROM analyses WHERE key = ? AND created >= ?", (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            connection.execute("UPDATE analyses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, value):
+        now = time.time()
+        size = len(value.encode())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO analyses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._evict(connection, now)
+
+    def _evict(self, connection, now):
+        connection.execute("DELETE FROM analyses WHERE created < ?", (now - self.ttl_seconds,))
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM analyses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until the budget is met
+        excess = total - self.max_bytes
+        freed = 0
+        doomed = []
+        for key, size in connection.execute("SELECT key, size FROM analyses ORDER BY accessed"):
+            doomed.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        connection.executemany("DELETE FROM analyses WHERE key = ?", doomed)
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM analyses")
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analyses"
+            ).fetchone()
+        return {"entries": entries, "bytes": size, "hits": self.hits, "misses": self.misses}
+
+
+analysis_cache = AnalysisCache()
+
+
+def cache_stream(key, chunks):
+    """Pass a text stream through, storing the whole text under key once the stream completes."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    text = "".join(parts)
+    if text.strip():
+        analysis_cache.put(key, text)
@@ -0,0 +1,151 @@
+"""Semantic cache for follow-up answers.
+
+Follow-up questions repeat constantly with small wording changes ("is this
+serious?", "is it serious"). Questions are normalized (case, punctuation,
+filler words), embedded locally, and compared against earlier questions asked
+about the same context: the same assessment or report, identified by a
+fingerprint. Above a similarity threshold the stored answer is reused instead
+of calling the model.
+
+Similarity alone cannot tell "sugar of 180" from "sugar of 80", "should I go"
+from "should I not go" or ibuprofen from paracetamol: one changed word barely
+moves the embedding of a long question. So a hit also needs the same content
+words, in the same order, and the same negations as the earlier question;
+only filler and a few generic words ("go", "mean", "level") may differ.
+Entries expire after a TTL and the least recently used are evicted past a
+size limit.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import embeddings
+from embeddings import embed
+from enhancement import content_hash
+
+# Hashed word features score paraphrases lower than a neural model, so they need a lower bar.
+# The threshold is only a second check: question_guard already requires the same content words
+DEFAULT_THRESHOLD = "0.9" if embeddings.BACKEND == "onnx" else "0.75"
+SIMILARITY_THRESHOLD = float(os.environ.get("DOCSIGHT_ANSWER_CACHE_THRESHOLD", DEFAULT_THRESHOLD))
+TTL_SECONDS = float(os.environ.get("DOCSIGHT_ANSWER_CACHE_TTL", str(24 * 3600)))
+MAX_ENTRIES = int(os.environ.get("DOCSIGHT_ANSWER_CACHE_ENTRIES", "4096"))
+
+# Dropped before embedding so phrasing differences stop mattering; negations are kept on purpose
+_FILLER = frozenset(
+    "a an the is are was were be been am do does did i me my mine you your it its this that these those "
+    "to of in on at for with about please can could would should will shall just so really very "
+    "what whats tell explain".split()
+)
+# Words that do not change what is being asked about ("go see a doctor", "creatinine level")
+_GENERIC = frozenset("go get mean means meaning level levels value values result results reading".split())
+
+_NEGATION = re.compile(
+    r"\b(?:no|not|never|without|none|nor|neither|nothing|cannot|\w+n't|"
+    r"(?:do|does|did|ca|wo|is|are|was|were|should|would|could|have|has|had|must|need)nt)\b"
+)
+
+
+def question_guard(question):
+    """Content words (drugs, tests, values, qualifiers) and negations of a question.
+
+    A cached answer is only reused when these match exactly, so a swapped drug
+    name, number or "elevated" for "low" is always a miss.
+    """
+    text = question.lower().replace("’", "'")
+    negations = sorted("not" if word.endswith(("n't", "nt")) or word == "cannot" else word
+                       for word in _NEGATION.findall(text))
+    content = [word for word in re.findall(r"[^\W_]+(?:[.,]\d+)?", text) if word not in _FILLER and word not in _GENERIC]
+    return tuple(content), tuple(negations)
+
+
+def normalize_question(question):
+    words = re.findall(r"[^\W_]+", question.lower())
+    kept = [word for word in words if word not in _FILLER and word not in _GENERIC]
+    return " ".join(kept or words)
+
+
+def context_fingerprint(*parts):
+    return content_hash("\0".join(str(part) for part in parts).encode())
+
+
+class SemanticAnswerCache:
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, ttl_seconds=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # (context, question id) -> (embedding, question, answer, created, guard); order is recency of use
+        self._entries = OrderedDict()
+        self._by_context = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, context, question):
+        """Return (answer, similarity, cached question) for a similar earlier question, or None."""
+        query = embed([normalize_question(question)])[0]
+        guard = question_guard(question)
+        now = time.time()
+        with self._lock:
+            keys = [key for key in self._by_context.get(context, ())
+                    if now - self._entries[key][3] <= self.ttl_seconds and self._entries[key][4] == guard]
+            if keys:
+                similarities = np.stack([self._entries[key][0] for key in keys]) @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    key = keys[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    _, cached_question, answer, _, _ = self._entries[key]
+                    return answer, float(similarities[best]), cached_question
+            self.misses += 1
+            return None
+
+    def store(self, context, question, answer):
+        if not answer or not answer.strip():
+            return
+        vector = embed([normalize_question(question)])[0]
+        with self._lock:
+            key = (context, self._next_id)
+            self._next_id += 1
+            self._entries[key] = (vector, question, answer, time.time(), question_guard(question))
+            self._by_context.setdefault(context, []).append(key)
+            self._evict()
+
+    def _evict(self):
+        now = time.time()
+        expired = [key for key, entry in self._entries.items() if now - entry[3] > self.ttl_seconds]
+        for key in expired:
+            self._remove(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        del self._entries[key]
+        keys = self._by_context[key[0]]
+        keys.remove(key)
+        if not keys:
+            del self._by_context[key[0]]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "contexts": len(self._by_context),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+answer_cache = SemanticAnswerCache()
+
+
+def cached_answer_caption(similarity, cached_question):
+    stats = answer_cache.stats()
+    return (f"⚡ Reused the answer to a similar question (“{cached_question}”, similarity {similarity:.2f}); "
+            f"answer cache hit rate {stats['hit_rate']:.0%} over {stats['hits'] + stats['misses']} questions")
@@ -1,8 +1,22 @@
+import importlib
+import os
+import sys
 import streamlit as st
-from page1 import medical_image_enhancement
-from page2 import medical_image_analysis
-from page3 import medical_symptom_checker
-from page4 import lab_report_explainer
+from metrics import span
+
+# Feature -> (module, entry point). A page is imported the first time someone opens it,
+# so starting the server and opening one feature does not pay for the other pages' libraries.
+PAGES = {
+    "🖼️ Medical Image Enhancement": ("page1", "medical_image_enhancement"),
+    "🔬 Medical Image Analysis": ("page2", "medical_image_analysis"),
+    "🤒 Symptom Checker": ("page3", "medical_symptom_checker"),
+    "📄 Medical Interpreter": ("page4", "lab_report_explainer"),
+}
+
+# The diagnostics page shows process-wide usage and cost and can reset the metrics,
+# so it is only offered to operators who set DOCSIGHT_DIAGNOSTICS=1
+if os.environ.get("DOCSIGHT_DIAGNOSTICS", "0") == "1":
+    PAGES["📈 Diagnostics"] = ("page5", "diagnostics")
 
 # Set page config
 st.set_page_config(
@@ -28,25 +42,20 @@ with st.sidebar:
     st.markdown("---")
     page = st.radio(
         "Select a Feature:",
-        [
-            "🖼️ Medical Image Enhancement",
-            "🔬 Medical Image Analysis",
-            "🤒 Symptom Checker",
-            "📄 Medical Interpreter"
-        ]
+        list(PAGES)
     )
     st.markdown("---")
     st.info("Built with ❤️")
 
 # Routing logic
-if "Enhancement" in page:
-    medical_image_enhancement()
-elif "Analysis" in page:
-    medical_image_analysis()
-elif "Symptom" in page:
-    medical_symptom_checker()
-elif "Interpreter" in page:
-    lab_report_explainer()
+module_name, entry_point = PAGES[page]
+if module_name in sys.modules:
+    module = sys.modules[module_name]
+else:
+    # Only the first import is timed, so the diagnostics page shows the real cold cost
+    with span(f"app.import.{module_name}"):
+        module = importlib.import_module(module_name)
+getattr(module, entry_point)()
 
 
 
@@ -0,0 +1,310 @@
+"""Backend dispatch for the enhancement filters.
+
+Each operation has several registered implementations (OpenCV, scikit-image,
+SciPy). Choices come from backend_calibration.json, measured offline per size
+bucket, dtype and parameters; an image whose bucket was not measured uses the
+nearest measured bucket. Parameters with no calibration data at all are timed
+on first use on a small crop, keeping the implementations whose output matches
+the reference within tolerance, and the fastest is remembered under the crop's
+own bucket. A backend can be pinned per operation with pin_backend() or
+DOCSIGHT_BACKEND_<OPERATION>=<name> (DOCSIGHT_BACKEND pins all).
+
+    python backends.py --verify      # equivalence check for every implementation
+    python backends.py --calibrate   # write backend_calibration.json
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+CALIBRATION_PATH = os.environ.get(
+    "DOCSIGHT_BACKEND_CALIBRATION",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend_calibration.json"),
+)
+
+# Images above this many pixels share one size bucket, the largest the calibration measures (2048x2048)
+MAX_BUCKET_PIXELS = 2 ** 22
+# Side of the crop timed when an operation meets parameters without calibration data
+FIRST_USE_SAMPLE = 256
+
+# operation -> {backend name: (function, supports(image, params), tolerance)}
+REGISTRY = {}
+REFERENCE = {}
+
+_choices = {}
+_nearest = {}  # Key -> choice borrowed from the nearest measured bucket
+_pins = {}
+_lock = threading.Lock()
+
+
+def register(operation, backend, supports=None, tolerance=0, reference=False):
+    def decorator(function):
+        REGISTRY.setdefault(operation, {})[backend] = (function, supports or (lambda image, params: True), tolerance)
+        if reference:
+            REFERENCE[operation] = backend
+        return function
+    return decorator
+
+
+def _separable(kernel):
+    return np.linalg.matrix_rank(np.asarray(kernel, dtype=np.float64)) == 1
+
+
+def _saturate(result, dtype):
+    info = np.iinfo(dtype)
+    return np.clip(np.rint(result), info.min, info.max).astype(dtype)
+
+
+# Median filter with replicated borders, the only border mode cv2.medianBlur offers
+
+@register("median", "scipy", reference=True)
+def _median_scipy(image, kernel_size=3):
+    from scipy import ndimage
+    return ndimage.median_filter(image, size=kernel_size, mode="nearest")
+
+
+@register("median", "opencv",
+          supports=lambda image, params: image.dtype == np.uint8 or params.get("kernel_size", 3) <= 5)
+def _median_opencv(image, kernel_size=3):
+    return cv2.medianBlur(image, kernel_size)
+
+
+@register("median", "skimage")
+def _median_skimage(image, kernel_size=3):
+    from skimage.filters import median as skimage_median
+    return skimage_median(image, footprint=np.ones((kernel_size, kernel_size), bool), mode="nearest")
+
+
+# Sobel gradient magnitude, scaled like skimage.filters.sobel
+
+@register("sobel", "skimage", reference=True, tolerance=1e-5)
+def _sobel_skimage(image):
+    from skimage.filters import sobel as skimage_sobel
+    return skimage_sobel(image)
+
+
+@register("sobel", "opencv", tolerance=1e-5)
+def _sobel_opencv(image):
+    scaled = image.astype(np.float32) / np.iinfo(image.dtype).max
+    gx = cv2.Sobel(scaled, cv2.CV_32F, 1, 0, ksize=3, borderType=cv2.BORDER_REFLECT)
+    gy = cv2.Sobel(scaled, cv2.CV_32F, 0, 1, ksize=3, borderType=cv2.BORDER_REFLECT)
+    return np.sqrt((gx * gx + gy * gy) / 32)
+
+
+# Gaussian smoothing with the kernel OpenCV derives from the kernel size
+
+@register("gaussian", "opencv", reference=True, tolerance=1)
+def _gaussian_opencv(image, kernel_size=3):
+    return cv2.GaussianBlur(image, (kernel_size, kernel_size), 0)
+
+
+@register("gaussian", "scipy", tolerance=1)
+def _gaussian_scipy(image, kernel_size=3):
+    from scipy import ndimage
+    weights = cv2.getGaussianKernel(kernel_size, 0, cv2.CV_32F).ravel()
+    smoothed = ndimage.correlate1d(image.astype(np.float32), weights, axis=0, mode="mirror")
+    smoothed = ndimage.correlate1d(smoothed, weights, axis=1, mode="mirror")
+    return _saturate(smoothed, image.dtype)
+
+
+# Correlation with a small kernel (sharpening, low/high pass, point and line detection)
+
+@register("filter2d", "opencv", reference=True, tolerance=1)
+def _filter2d_opencv(image, kernel):
+    return cv2.filter2D(image, -1, np.asarray(kernel, np.float32))
+
+
+@register("filter2d", "opencv_separable", supports=lambda image, params: _separable(params["kernel"]), tolerance=1)
+def _filter2d_separable(image, kernel):
+    u, s, vt = np.linalg.svd(np.asarray(kernel, dtype=np.float64))
+    column = (u[:, 0] * np.sqrt(s[0])).astype(np.float32)
+    row = (vt[0] * np.sqrt(s[0])).astype(np.float32)
+    return cv2.sepFilter2D(image, -1, row, column)
+
+
+@register("filter2d", "scipy", tolerance=1)
+def _filter2d_scipy(image, kernel):
+    from scipy import ndimage
+    filtered = ndimage.correlate(image.astype(np.float32), np.asarray(kernel, np.float32), mode="mirror")
+    return _saturate(filtered, image.dtype)
+
+
+def size_bucket(image):
+    return int(np.log2(min(max(image.size, 1), MAX_BUCKET_PIXELS)))
+
+
+def _describe(value):
+    if isinstance(value, np.ndarray):
+        return f"{'x'.join(map(str, value.shape))}{'s' if _separable(value) else ''}"
+    return str(value)
+
+
+def _key(operation, image, params):
+    # Parameters are part of the key because they change which backend wins (kernel size, separability)
+    variant = ",".join(f"{name}={_describe(value)}" for name, value in sorted(params.items()))
+    return f"{operation}|{image.dtype}|{size_bucket(image)}|{variant}"
+
+
+def pin_backend(operation, backend):
+    """Force an operation onto one backend; pass None to return to automatic dispatch."""
+    if backend is not None and backend not in REGISTRY[operation]:
+        raise ValueError(f"Unknown backend {backend!r} for {operation}; choose from {sorted(REGISTRY[operation])}")
+    with _lock:
+        if backend is None:
+            _pins.pop(operation, None)
+        else:
+            _pins[operation] = backend
+
+
+def pinned_backend(operation):
+    return _pins.get(operation) or os.environ.get(f"DOCSIGHT_BACKEND_{operation.upper()}") or os.environ.get("DOCSIGHT_BACKEND")
+
+
+def equivalent(result, reference, tolerance):
+    result, reference = np.asarray(result), np.asarray(reference)
+    if result.shape != reference.shape:
+        return False
+    return float(np.abs(result.astype(np.float64) - reference).max(initial=0)) <= tolerance
+
+
+def calibrate(operation, image, params, repeats=3):
+    """Time every supported implementation on image and return (fastest equivalent backend, timings)."""
+    candidates = {
+        name: entry for name, entry in REGISTRY[operation].items() if entry[1](image, params)
+    }
+    reference_name = REFERENCE[operation]
+    reference = candidates[reference_name][0](image, **params)
+    timings = {}
+    for name, (function, _, tolerance) in candidates.items():
+        if name != reference_name and not equivalent(function(image, **params), reference, tolerance):
+            continue
+        start = time.perf_counter()
+        for _ in range(repeats):
+            function(image, **params)
+        timings[name] = (time.perf_counter() - start) / repeats
+    return min(timings, key=timings.get), timings
+
+
+def dispatch(operation, image, **params):
+    """Run operation with the pinned, calibrated, or (on first use) freshly timed fastest backend."""
+    implementations = REGISTRY[operation]
+    backend = pinned_backend(operation)
+    if backend in implementations and implementations[backend][1](image, params):
+        return implementations[backend][0](image, **params)
+
+    key = _key(operation, image, params)
+    backend = _choices.get(key) or _nearest.get(key)
+    if backend is None:
+        backend = _nearest_choice(key)
+    if backend is None or not implementations[backend][1](image, params):
+        # Time on a bounded crop so first use on a huge image never runs the slowest backend at full size
+        sample = np.ascontiguousarray(image[:FIRST_USE_SAMPLE, :FIRST_USE_SAMPLE])
+        backend, _ = calibrate(operation, sample, params, repeats=1)
+        with _lock:
+            _choices[_key(operation, sample, params)] = backend
+            _nearest.clear()
+    return implementations[backend][0](image, **params)
+
+
+def _nearest_choice(key):
+    """Choice measured for the closest size bucket with the same operation, dtype and parameters."""
+    operation, dtype, bucket, variant = key.split("|", 3)
+    with _lock:
+        measured = [(abs(int(other[2]) - int(bucket)), choice) for other, choice in
+                    ((other.split("|", 3), choice) for other, choice in _choices.items())
+                    if other[0] == operation and other[1] == dtype and other[3] == variant]
+        if not measured:
+            return None
+        _nearest[key] = choice = min(measured)[1]
+        return choice
+
+
+def load_calibration(path=CALIBRATION_PATH):
+    if os.path.exists(path):
+        with open(path) as f:
+            choices = json.load(f)
+        with _lock:
+            _choices.update({key: name for key, name in choices.items() if name in REGISTRY.get(key.split("|")[0], {})})
+            _nearest.clear()
+
+
+def _sample_params(operation):
+    # The kernel sizes page1 offers, and one kernel of each shape enhancement passes to filter2d
+    return {
+        "median": [{"kernel_size": size} for size in (3, 5, 7, 9, 11)],
+        "sobel": [{}],
+        "gaussian": [{"kernel_size": size} for size in (3, 5, 7, 9, 11)],
+        "filter2d": [
+            {"kernel": np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]], np.float32)},
+            {"kernel": np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], np.float32)},
+            {"kernel": np.ones((5, 5), np.float32) / 25},
+        ],
+    }[operation]
+
+
+def _synthetic_image(side, dtype, seed=0):
+    rng = np.random.default_rng(seed)
+    top = np.iinfo(dtype).max
+    image = cv2.GaussianBlur(rng.random((side, side), dtype=np.float32), (7, 7), 0)
+    return (image * top).astype(dtype)
+
+
+def verify(sizes=(257,), dtypes=(np.uint8, np.uint16)):
+    """Check every implementation against its reference. Returns a list of failure messages."""
+    failures = []
+    for operation, implementations in REGISTRY.items():
+        for dtype in dtypes:
+            for side in sizes:
+                image = _synthetic_image(side, dtype)
+                for params in _sample_params(operation):
+                    reference = implementations[REFERENCE[operation]][0](image, **params)
+                    for name, (function, supports, tolerance) in implementations.items():
+                        if supports(image, params) and not equivalent(function(image, **params), reference, tolerance):
+                            failures.append(f"{operation}/{name} differs from {REFERENCE[operation]} on {dtype.__name__} {side}x{side}")
+    return failures
+
+
+def write_calibration(path=CALIBRATION_PATH, sizes=(256, 512, 1024, 2048), dtypes=(np.uint8, np.uint16)):
+    choices = {}
+    for operation in REGISTRY:
+        for dtype in dtypes:
+            for side in sizes:
+                image = _synthetic_image(side, dtype)
+                for params in _sample_params(operation):
+                    key = _key(operation, image, params)
+                    choices[key], timings = calibrate(operation, image, params)
+                    print(f"{key}: {choices[key]} " + ", ".join(f"{n}={t * 1000:.2f}ms" for n, t in sorted(timings.items())))
+    with open(path, "w") as f:
+        json.dump(choices, f, indent=2, sort_keys=True)
+    return choices
+
+
+load_calibration()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify or calibrate the enhancement filter backends.")
+    parser.add_argument("--verify", action="store_true", help="Check every implementation against the reference")
+    parser.add_argument("--calibrate", action="store_true", help="Time the backends and write the calibration file")
+    parser.add_argument("--output", default=CALIBRATION_PATH)
+    args = parser.parse_args(argv)
+
+    if args.verify or not args.calibrate:
+        failures = verify()
+        for failure in failures:
+            print(failure, file=sys.stderr)
+        print("All backends equivalent" if not failures else f"{len(failures)} mismatches")
+        if failures:
+            return 1
+    if args.calibrate:
+        write_calibration(args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""Headless batch enhancement over a directory or glob of images.
+
+Example:
+    python batch.py "archive/**/*.png" enhanced/ --operation "Median Filter" --param kernel_size=5
+"""
+import argparse
+import ast
+import glob
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cv2
+import numpy as np
+
+from enhancement import OPERATIONS, apply_operation, to_uint8
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+
+
+def parse_param(text):
+    name, sep, value = text.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"Expected name=value, got {text!r}")
+    try:
+        value = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        pass  # Plain strings such as method=Sobel
+    return name, value
+
+
+def find_inputs(source):
+    """Yield (path, relative path) pairs lazily so huge archives are never listed in memory."""
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    yield path, os.path.relpath(path, source)
+    else:
+        # Outputs mirror the layout below the first wildcard component of the pattern
+        base_parts = []
+        for part in source.split(os.sep):
+            if glob.has_magic(part):
+                break
+            base_parts.append(part)
+        base = os.sep.join(base_parts) if len(base_parts) < len(source.split(os.sep)) else os.path.dirname(source)
+        for path in glob.iglob(source, recursive=True):
+            if path.lower().endswith(IMAGE_EXTENSIONS):
+                yield path, os.path.relpath(path, base or ".")
+
+
+def output_path(output_dir, relative_path):
+    return os.path.join(output_dir, os.path.splitext(relative_path)[0] + ".png")
+
+
+def process_file(source_path, destination_path, operation, params):
+    """Worker entry point: enhance one file and write it atomically. Returns the latency in seconds."""
+    start = time.perf_counter()
+    image = cv2.imread(source_path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError(f"Could not decode {source_path}")
+    result = to_uint8(apply_operation(image, operation, params))
+    os.makedirs(os.path.dirname(destination_path) or ".", exist_ok=True)
+    # Write next to the target and rename, so an interrupted run never leaves a partial output behind
+    temporary_path = f"{destination_path}.{os.getpid()}.tmp.png"
+    if not cv2.imwrite(temporary_path, result):
+        raise OSError(f"Could not write {destination_path}")
+    os.replace(temporary_path, destination_path)
+    return time.perf_counter() - start
+
+
+def run_batch(source, output_dir, operation, params, workers=None, max_in_flight=None):
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 4
+    latencies = []
+    skipped = failed = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+
+        def drain(block_until):
+            nonlocal failed
+            done, _ = wait(pending, return_when=block_until)
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    latencies.append(future.result())
+                except Exception as e:
+                    failed += 1
+                    print(f"Failed: {path}: {e}", file=sys.stderr)
+
+        for path, relative_path in find_inputs(source):
+            destination_path = output_path(output_dir, relative_path)
+            if os.path.exists(destination_path):
+                skipped += 1  # Resume: finished outputs from an earlier run are kept
+                continue
+            # Bound the number of queued files so memory stays flat on very large batches
+            if len(pending) >= max_in_flight:
+                drain(FIRST_COMPLETED)
+            future = executor.submit(process_file, path, destination_path, operation, params)
+            pending[future] = path
+        while pending:
+            drain(FIRST_COMPLETED)
+
+    return {
+        "processed": len(latencies),
+        "skipped": skipped,
+        "failed": failed,
+        "elapsed": time.perf_counter() - start,
+        "latencies": latencies,
+    }
+
+
+def format_report(stats):
+    lines = [
+        f"Processed: {stats['processed']}  Skipped: {stats['skipped']}  Failed: {stats['failed']}",
+        f"Elapsed: {stats['elapsed']:.2f}s",
+    ]
+    if stats["latencies"]:
+        latencies = np.array(stats["latencies"]) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        lines.append(f"Throughput: {stats['processed'] / stats['elapsed']:.2f} images/sec")
+        lines.append(f"Per-file latency: p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms, max {latencies.max():.1f} ms")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply a DocSight enhancement to many images.")
+    parser.add_argument("input", help="Input directory or glob pattern (use ** for recursion)")
+    parser.add_argument("output", help="Directory the enhanced PNGs are written to")
+    parser.add_argument("--operation", required=True, choices=sorted(OPERATIONS))
+    parser.add_argument("--param", action="append", type=parse_param, default=[],
+                        help="Operation parameter as name=value, e.g. kernel_size=5 or method=Canny")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--backend", default=None,
+                        help="Pin every filter to one backend (opencv, scipy, skimage) instead of auto-dispatch")
+    args = parser.parse_args(argv)
+
+    if args.backend:
+        # Set in the environment so worker processes inherit the pin
+        os.environ["DOCSIGHT_BACKEND"] = args.backend
+
+    stats = run_batch(args.input, args.output, args.operation, dict(args.param), workers=args.workers)
+    print(format_report(stats))
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
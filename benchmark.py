@@ -0,0 +1,166 @@
+"""Offline benchmark and regression check for every page1 enhancement operation.
+
+Synthetic images are generated deterministically, so runs are comparable
+across machines' dependency bumps without network access or sample data.
+
+    python benchmark.py --update-baseline            # record benchmark_baseline.json
+    python benchmark.py                              # compare against it, exit 1 on regression
+    python benchmark.py --sizes 512 2048 --threshold 0.3
+
+Peak memory is measured with tracemalloc, which sees NumPy allocations
+(including arrays OpenCV returns) but not scratch buffers inside native code.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from enhancement import apply_operation
+from pipeline import Pipeline
+
+DEFAULT_SIZES = (512, 2048, 8192)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+# (name, operation, params) with the parameters users typically pick in the UI
+CASES = [
+    ("equalize", "Histogram Equalization", {}),
+    ("gamma", "Gray Level Transformation", {"gamma": 0.6}),
+    ("invert", "Image Inversion", {}),
+    ("window", "Intensity Windowing", {"center": 110, "width": 120}),
+    ("smooth_k5", "Image Smoothing", {"kernel_size": 5}),
+    ("sharpen", "Image Sharpening", {}),
+    ("low_pass", "Low Pass Filter", {}),
+    ("high_pass", "High Pass Filter", {}),
+    ("median_k3", "Median Filter", {"kernel_size": 3}),
+    ("median_k7", "Median Filter", {"kernel_size": 7}),
+    ("point", "Point Detection", {}),
+    ("line", "Line Detection", {}),
+    ("sobel", "Edge Detection", {"method": "Sobel"}),
+    ("canny", "Edge Detection", {"method": "Canny"}),
+    ("watershed", "Image Segmentation", {"method": "Watershed"}),
+    ("fcm_k3", "Image Segmentation", {"method": "Fuzzy C-Means", "clusters": 3}),
+    ("fcm_k3_spatial", "Image Segmentation", {"method": "Fuzzy C-Means", "clusters": 3, "spatial": True}),
+    ("pipeline_4", "Pipeline", [
+        ("Median Filter", {"kernel_size": 3}),
+        ("Histogram Equalization", {}),
+        ("Gray Level Transformation", {"gamma": 0.8}),
+        ("Image Sharpening", {}),
+    ]),
+]
+
+
+def synthetic_image(side, seed=0):
+    """Radiograph-like test image: smooth anatomy-scale structure, a few bright blobs, and noise."""
+    rng = np.random.default_rng(seed)
+    coarse = rng.random((max(side // 64, 2), max(side // 64, 2)), dtype=np.float32)
+    image = cv2.resize(coarse, (side, side), interpolation=cv2.INTER_CUBIC)
+    for _ in range(8):
+        center = tuple(int(v) for v in rng.integers(0, side, 2))
+        cv2.circle(image, center, int(side * rng.uniform(0.02, 0.08)), float(rng.uniform(0.8, 1.2)), -1)
+    image += rng.normal(0, 0.03, image.shape).astype(np.float32)
+    return cv2.normalize(image, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
+
+
+def _run(image, operation, params):
+    if operation == "Pipeline":
+        return Pipeline(params).run(image)
+    return apply_operation(image, operation, params)
+
+
+def measure(image, operation, params, repeats):
+    _run(image, operation, params)  # Warm-up: backend calibration, lazy imports, caches
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        _run(image, operation, params)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    _run(image, operation, params)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    seconds = float(np.median(timings))
+    return {
+        "seconds": seconds,
+        "megapixels_per_second": image.size / 1e6 / seconds,
+        "peak_bytes": int(peak),
+    }
+
+
+def run_benchmarks(sizes, repeats, cases=None, log=print):
+    results = {}
+    for side in sizes:
+        image = synthetic_image(side)
+        # Large sizes get fewer repeats so the whole suite stays practical in release checks
+        size_repeats = max(1, repeats if side <= 2048 else repeats // 3)
+        for name, operation, params in cases or CASES:
+            key = f"{name}@{side}"
+            results[key] = measure(image, operation, params, size_repeats)
+            log(f"{key:28s} {results[key]['seconds'] * 1000:10.2f} ms "
+                f"{results[key]['megapixels_per_second']:10.1f} MP/s "
+                f"{results[key]['peak_bytes'] / 2 ** 20:8.1f} MiB")
+    return results
+
+
+def compare(results, baseline, threshold, memory_threshold):
+    """Return a list of regression messages for cases that got slower or hungrier than allowed."""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if current["seconds"] > previous["seconds"] * (1 + threshold):
+            regressions.append(f"{key}: {previous['seconds'] * 1000:.2f} ms -> {current['seconds'] * 1000:.2f} ms")
+        if current["peak_bytes"] > previous["peak_bytes"] * (1 + memory_threshold):
+            regressions.append(f"{key}: peak {previous['peak_bytes'] / 2 ** 20:.1f} MiB -> {current['peak_bytes'] / 2 ** 20:.1f} MiB")
+    return regressions
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the DocSight enhancement operations.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Square image sides")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--cases", nargs="+", help="Only run these case names (see CASES)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown as a fraction (0.25 = 25%%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.25, help="Allowed peak memory growth as a fraction")
+    args = parser.parse_args(argv)
+
+    cases = [case for case in CASES if not args.cases or case[0] in args.cases]
+    results = run_benchmarks(args.sizes, args.repeats, cases)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline first", file=sys.stderr)
+        return 2
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline["results"], args.threshold, args.memory_threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    print(f"{len(regressions)} regressions against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""Process-wide pooling of Gemini clients and agno Agents.
+
+Building an Agent and its Gemini model on every Streamlit rerun recreates the
+HTTP client, so every call pays connection setup and a TLS handshake. Here one
+google-genai client (and its connection pool) is kept per API key, and agents
+are checked out of a pool keyed by (API-key fingerprint, model id, tool set,
+agent options) and returned after use, so concurrent sessions never share a
+running agent. Entries idle for longer than IDLE_SECONDS are dropped.
+
+DOCSIGHT_MODEL_BACKEND=mock swaps every agent for the local stand-in in
+mock_model, for load tests and offline work.
+
+Async calls run on one long-lived event loop (run_coroutine), because the
+shared clients' async connection pools are bound to the loop they were
+first used on.
+
+agno and the Gemini SDK take a few seconds to import, so they are imported
+with the first real agent rather than with the pages.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import record_usage, registry
+
+IDLE_SECONDS = 15 * 60
+MAX_IDLE_AGENTS_PER_KEY = 8
+
+# Streamed run events that carry a text delta; "RunResponse" is the agno 1.x name.
+# Completion events repeat the full text and are skipped.
+CONTENT_EVENTS = {"RunContent", "RunResponseContent", "RunResponse"}
+COMPLETED_EVENTS = {"RunCompleted"}
+
+
+def _duckduckgo_tools():
+    from search_tools import CachedSearchTools
+    return CachedSearchTools("duckduckgo")
+
+
+def _google_search_tools():
+    from search_tools import CachedSearchTools
+    return CachedSearchTools("google")
+
+
+# Tool sets are referred to by name so they can be part of the pool key
+TOOL_FACTORIES = {
+    "duckduckgo": _duckduckgo_tools,
+    "googlesearch": _google_search_tools,
+}
+
+
+def key_fingerprint(api_key):
+    """Stable identifier for an API key that is safe to keep in pool keys and logs."""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+class ResourcePool:
+    """Thread-safe pool of idle resources per key, with idle-time eviction."""
+
+    def __init__(self, idle_seconds=IDLE_SECONDS, max_idle_per_key=MAX_IDLE_AGENTS_PER_KEY):
+        self.idle_seconds = idle_seconds
+        self.max_idle_per_key = max_idle_per_key
+        self.created = 0
+        self.reused = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, factory):
+        with self._lock:
+            self._evict_idle()
+            entries = self._idle.get(key)
+            if entries:
+                self.reused += 1
+                return entries.pop()[1]
+            self.created += 1
+        return factory()
+
+    def release(self, key, resource):
+        with self._lock:
+            entries = self._idle.setdefault(key, [])
+            if len(entries) < self.max_idle_per_key:
+                entries.append((time.monotonic(), resource))
+
+    @contextmanager
+    def lease(self, key, factory):
+        resource = self.acquire(key, factory)
+        try:
+            yield resource
+        finally:
+            self.release(key, resource)
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        for key in list(self._idle):
+            self._idle[key] = [entry for entry in self._idle[key] if entry[0] >= cutoff]
+            if not self._idle[key]:
+                del self._idle[key]
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._idle.values())
+
+
+class _ClientCache:
+    """One long-lived google-genai client per API key; clients are thread-safe and shared."""
+
+    def __init__(self, idle_seconds=IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def get(self, api_key):
+        fingerprint = key_fingerprint(api_key)
+        now = time.monotonic()
+        with self._lock:
+            for key, (last_used, _) in list(self._clients.items()):
+                if now - last_used > self.idle_seconds:
+                    del self._clients[key]
+            client = self._clients.get(fingerprint, (None, None))[1]
+            if client is None:
+                from google import genai
+                client = genai.Client(api_key=api_key)
+            self._clients[fingerprint] = (now, client)
+            return client
+
+
+genai_clients = _ClientCache()
+agent_pool = ResourcePool()
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _event_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="docsight-async", daemon=True).start()
+        return _loop
+
+
+def run_coroutine(coroutine):
+    """Run a coroutine on the shared event loop and block until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coroutine, _event_loop()).result()
+
+
+def build_model(api_key, model_id):
+    """A Gemini model backed by the shared client for api_key."""
+    from agno.models.google import Gemini
+    return Gemini(id=model_id, api_key=api_key, client=genai_clients.get(api_key))
+
+
+@contextmanager
+def lease_agent(api_key, model_id, tools=(), **agent_options):
+    """Check out a pooled Agent for the duration of a call.
+
+    tools is a tuple of TOOL_FACTORIES names; agent_options are passed to Agent().
+    """
+    tools = tuple(tools)
+    key = (key_fingerprint(api_key), model_id, tools, repr(sorted(agent_options.items())))
+
+    mock = os.environ.get("DOCSIGHT_MODEL_BACKEND") == "mock"
+
+    def factory():
+        if mock:
+            from mock_model import MockAgent
+            return MockAgent(model_id, tools, **agent_options)
+        from agno.agent import Agent
+        return Agent(
+            model=build_model(api_key, model_id),
+            tools=[TOOL_FACTORIES[name]() for name in tools] or None,
+            **agent_options
+        )
+
+    with agent_pool.lease(("mock",) + key if mock else key, factory) as agent:
+        if not mock:
+            # Keep the shared client fresh in the cache while its agents are in use
+            genai_clients.get(api_key)
+        yield agent
+
+
+def stream_agent(api_key, model_id, message, tools=(), images=None, **agent_options):
+    """Yield the text deltas of an agent run, for st.write_stream.
+
+    The pooled agent stays checked out until the stream is exhausted or closed.
+    Time to first token and the run's token usage are recorded in metrics.
+    """
+    start = time.perf_counter()
+    first_token = True
+    with lease_agent(api_key, model_id, tools, **agent_options) as agent:
+        for event in agent.run(message, images=images, stream=True):
+            kind = getattr(event, "event", None)
+            if kind in CONTENT_EVENTS and isinstance(event.content, str):
+                if first_token:
+                    registry.observe("docsight_model_first_token_seconds", time.perf_counter() - start, model=model_id)
+                    first_token = False
+                yield event.content
+            elif kind in COMPLETED_EVENTS:
+                record_usage(model_id, getattr(event, "metrics", None))
@@ -0,0 +1,174 @@
+"""DICOM ingestion shared by the enhancement and analysis pages.
+
+Headers are parsed without touching pixel data, and frames are decoded one at
+a time when they are viewed, so scrolling a long series only pays for the
+slices that are actually displayed or sent to the model.
+"""
+import io
+from functools import lru_cache
+
+import cv2
+import numpy as np
+import streamlit as st
+
+from enhancement import LRUByteCache, _freeze, content_hash
+
+FRAME_CACHE_BYTES = 256 * 1024 * 1024
+MAX_LUT_ENTRIES = 1 << 16  # Wider stored ranges (32-bit dose grids) are windowed arithmetically
+
+frame_cache = LRUByteCache(FRAME_CACHE_BYTES)
+
+
+def _first(value, default=None):
+    from pydicom.multival import MultiValue
+    if value is None or value == "":
+        return default
+    if isinstance(value, MultiValue):
+        return float(value[0]) if len(value) else default
+    return float(value)
+
+
+def apply_window(values, center, width, invert=False):
+    """Window modality values (after rescale) to uint8 display values."""
+    width = max(width, 1.0)
+    # Linear VOI function from DICOM PS3.3 C.11.2.1.2
+    display = ((values - (center - 0.5)) / (width - 1 if width > 1 else 1) + 0.5) * 255
+    display = np.clip(np.rint(display), 0, 255).astype(np.uint8)
+    return 255 - display if invert else display
+
+
+@lru_cache(maxsize=32)
+def window_lut(center, width, slope, intercept, low, high, invert):
+    """Map every possible stored value in [low, high] to a windowed uint8 display value."""
+    lut = apply_window(np.arange(low, high + 1, dtype=np.float64) * slope + intercept, center, width, invert)
+    lut.setflags(write=False)
+    return lut
+
+
+class DicomSeries:
+    """A multi-frame DICOM file or a set of single-frame slices, decoded lazily per frame."""
+
+    def __init__(self, files):
+        # pydicom is only imported once a DICOM file is actually opened
+        import pydicom
+        self._files = []
+        for data in files:
+            header = pydicom.dcmread(io.BytesIO(data), stop_before_pixels=True, force=True)
+            if not hasattr(header, "Rows"):
+                raise ValueError("DICOM file does not contain an image")
+            self._files.append((data, header, content_hash(data)))
+        # Slices of a series are ordered by position along the scan axis, falling back to instance number
+        self._files.sort(key=lambda item: self._slice_order(item[1]))
+        self._frames = [
+            (file_index, frame_index)
+            for file_index, (_, header, _) in enumerate(self._files)
+            for frame_index in range(int(getattr(header, "NumberOfFrames", 1) or 1))
+        ]
+
+    @staticmethod
+    def _slice_order(header):
+        position = getattr(header, "ImagePositionPatient", None)
+        instance = int(getattr(header, "InstanceNumber", 0) or 0)
+        return (float(position[2]) if position else 0.0, instance)
+
+    @property
+    def header(self):
+        return self._files[0][1]
+
+    @property
+    def num_frames(self):
+        return len(self._frames)
+
+    @property
+    def is_color(self):
+        return int(getattr(self.header, "SamplesPerPixel", 1)) > 1
+
+    def default_window(self, index=0):
+        """Window center/width from the header, or spanning the values actually present.
+
+        Without a window in the header, the range comes from Smallest/LargestImagePixelValue
+        or else the decoded frame; the full BitsStored range would show most images as flat gray.
+        """
+        header = self._files[self._frames[index][0]][1]
+        center = _first(getattr(header, "WindowCenter", None))
+        width = _first(getattr(header, "WindowWidth", None))
+        if center is None or width is None:
+            low = _first(getattr(header, "SmallestImagePixelValue", None))
+            high = _first(getattr(header, "LargestImagePixelValue", None))
+            if low is None or high is None or high <= low:
+                frame = self.raw_frame(index)
+                low, high = float(frame.min()), float(frame.max())
+            slope, intercept = self._rescale(header)
+            low, high = sorted((low * slope + intercept, high * slope + intercept))
+            center = (low + high) / 2
+            width = max(high - low, 1.0)
+        return center, width
+
+    @staticmethod
+    def _rescale(header):
+        return _first(getattr(header, "RescaleSlope", None), 1.0), _first(getattr(header, "RescaleIntercept", None), 0.0)
+
+    @staticmethod
+    def _stored_range(header):
+        bits = int(getattr(header, "BitsStored", 8))
+        if int(getattr(header, "PixelRepresentation", 0)) == 1:
+            return -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+        return 0, (1 << bits) - 1
+
+    def raw_frame(self, index):
+        """Decode a single frame, caching the stored values."""
+        file_index, frame_index = self._frames[index]
+        data, header, data_key = self._files[file_index]
+        cache_key = (data_key, frame_index)
+        frame = frame_cache.get(cache_key)
+        if frame is None:
+            frames_in_file = int(getattr(header, "NumberOfFrames", 1) or 1)
+            from pydicom.pixels import pixel_array
+            frame = pixel_array(io.BytesIO(data), index=frame_index if frames_in_file > 1 else None)
+            frame_cache.put(cache_key, _freeze(frame))
+        return frame
+
+    def windowed(self, index, center=None, width=None):
+        """Return a frame as uint8: windowed grayscale for monochrome data, RGB for color data."""
+        frame = self.raw_frame(index)
+        header = self._files[self._frames[index][0]][1]
+        if self.is_color:
+            return frame if frame.dtype == np.uint8 else cv2.normalize(frame, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
+        if center is None or width is None:
+            center, width = self.default_window(index)
+        low, high = self._stored_range(header)
+        slope, intercept = self._rescale(header)
+        invert = getattr(header, "PhotometricInterpretation", "") == "MONOCHROME1"
+        if high - low >= MAX_LUT_ENTRIES or frame.dtype.kind == "f":
+            return apply_window(frame * np.float64(slope) + intercept, float(center), float(width), invert)
+        lut = window_lut(float(center), float(width), slope, intercept, low, high, invert)
+        return np.take(lut, frame.astype(np.int32) - low, mode="clip")
+
+    def key(self, index, center, width):
+        file_index, frame_index = self._frames[index]
+        return f"{self._files[file_index][2]}:{frame_index}:{center}:{width}"
+
+
+def load_series(files):
+    """Parse (and cache) a DicomSeries for a list of uploaded byte strings."""
+    series_key = "dicom:" + ":".join(content_hash(data) for data in files)
+    series = frame_cache.get(series_key)
+    if series is None:
+        series = frame_cache.put(series_key, DicomSeries(files), nbytes=sum(len(data) for data in files))
+    return series
+
+
+def dicom_frame_picker(series, key="dicom"):
+    """Frame slider and window/level controls. Returns (frame index, window center, window width)."""
+    index = 0
+    if series.num_frames > 1:
+        index = st.slider("Slice / frame", 1, series.num_frames, 1, key=f"{key}_frame") - 1
+    center, width = None, None
+    if not series.is_color:
+        default_center, default_width = series.default_window(index)
+        col1, col2 = st.columns(2)
+        with col1:
+            center = st.number_input("Window center", value=float(default_center), key=f"{key}_center")
+        with col2:
+            width = st.number_input("Window width", value=float(default_width), min_value=1.0, key=f"{key}_width")
+    return index, center, width
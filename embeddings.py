@@ -0,0 +1,50 @@
+"""Local text embeddings for retrieval and answer caching.
+
+The default is a feature-hashing embedding over word unigrams and bigrams: it
+needs no model download or network access, is deterministic across
+processes, and matches lab vocabulary (test names, drug names, values) well.
+Set DOCSIGHT_EMBEDDINGS=onnx to use Chroma's bundled MiniLM model instead,
+which understands paraphrases better but downloads ~80 MB on first use.
+"""
+import hashlib
+import os
+import re
+
+import numpy as np
+
+DIMENSIONS = 1024
+BACKEND = os.environ.get("DOCSIGHT_EMBEDDINGS", "hashing")
+
+_WORD = re.compile(r"[^\W_]+(?:\.\d+)?")
+
+_onnx_model = None
+
+
+def _features(text):
+    words = _WORD.findall(text.lower())
+    yield from words
+    for first, second in zip(words, words[1:]):
+        yield f"{first} {second}"
+
+
+def _hashing_embedding(text):
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for feature in _features(text):
+        digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+        # The top bit picks a sign so colliding features tend to cancel instead of piling up
+        vector[digest % DIMENSIONS] += 1.0 if digest >> 63 else -1.0
+    return vector
+
+
+def embed(texts):
+    """L2-normalized float32 embeddings, one row per text."""
+    global _onnx_model
+    if BACKEND == "onnx":
+        if _onnx_model is None:
+            from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+            _onnx_model = DefaultEmbeddingFunction()
+        vectors = np.asarray(_onnx_model(list(texts)), dtype=np.float32)
+    else:
+        vectors = np.stack([_hashing_embedding(text) for text in texts]) if texts else np.zeros((0, DIMENSIONS), np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
@@ -0,0 +1,298 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from backends import dispatch
+from fcm import fuzzy_cmeans_segmentation
+
+
+# Byte budgets for the process-wide caches shared by every Streamlit session
+DECODED_CACHE_BYTES = 256 * 1024 * 1024
+RESULT_CACHE_BYTES = 512 * 1024 * 1024
+
+
+class LRUByteCache:
+    """Thread-safe LRU cache that evicts entries once their total size exceeds max_bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes=None):
+        if nbytes is None:
+            nbytes = getattr(value, "nbytes", 0)
+        if nbytes > self.max_bytes:
+            return value
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+decoded_cache = LRUByteCache(DECODED_CACHE_BYTES)
+result_cache = LRUByteCache(RESULT_CACHE_BYTES)
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def array_hash(image):
+    image = np.ascontiguousarray(image)
+    digest = hashlib.blake2b(f"{image.shape}{image.dtype}".encode(), digest_size=16)
+    digest.update(image.data.cast("B"))
+    return digest.hexdigest()
+
+
+def _freeze(array):
+    # Cached arrays are shared between sessions, so callers must not modify them in place
+    array.setflags(write=False)
+    return array
+
+
+def decode_grayscale(file_bytes, image_key=None):
+    image_key = image_key or content_hash(file_bytes)
+    image = decoded_cache.get(image_key)
+    if image is None:
+        buffer = np.frombuffer(file_bytes, dtype=np.uint8)
+        image = cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise ValueError("Could not decode the uploaded image")
+        decoded_cache.put(image_key, _freeze(image))
+    return image
+
+
+def _lut_dtype(levels):
+    return np.uint8 if levels <= 256 else np.uint16
+
+
+def equalization_lut(hist):
+    # Same mapping as cv2.equalizeHist, derived from a histogram with one bin per level
+    hist = np.asarray(hist, dtype=np.float64).ravel()
+    levels = hist.size
+    dtype = _lut_dtype(levels)
+    nonzero = np.flatnonzero(hist)
+    if nonzero.size == 0:
+        return np.arange(levels, dtype=dtype)
+    first = nonzero[0]
+    total = hist.sum()
+    if hist[first] == total:
+        return np.full(levels, first, dtype=dtype)
+    scale = (levels - 1) / (total - hist[first])
+    lut = np.rint((np.cumsum(hist) - hist[first]) * scale)
+    lut[:first + 1] = 0
+    return np.clip(lut, 0, levels - 1).astype(dtype)
+
+
+def gamma_lut(gamma=1.0, levels=256):
+    top = levels - 1
+    return (np.power(np.arange(levels) / top, gamma) * top).astype(_lut_dtype(levels))
+
+
+def inversion_lut(levels=256):
+    return (levels - 1 - np.arange(levels)).astype(_lut_dtype(levels))
+
+
+def window_lut(center=128, width=256, levels=256):
+    low = center - width / 2.0
+    lut = (np.arange(levels) - low) * ((levels - 1) / max(width, 1))
+    return np.clip(np.rint(lut), 0, levels - 1).astype(_lut_dtype(levels))
+
+
+def smoothing_kernel(kernel_size=3):
+    gaussian = cv2.getGaussianKernel(kernel_size, 0, cv2.CV_32F)
+    return gaussian @ gaussian.T
+
+
+def sharpening_kernel():
+    return np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]], np.float32)
+
+
+def low_pass_kernel():
+    return np.ones((5, 5), np.float32) / 25
+
+
+def high_pass_kernel():
+    return np.array([[-1, -1, -1], [-1, 8, -1], [-1, -1, -1]], np.float32)
+
+
+def point_detection_kernel():
+    return np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], np.float32)
+
+
+def line_detection_kernel():
+    return np.array([[-1, -1, 2], [-1, 2, -1], [2, -1, -1]], np.float32)
+
+
+def to_uint8(image):
+    """Map float, boolean or label outputs onto a uint8 image for display or saving."""
+    image = np.asarray(image)
+    if image.dtype == np.uint8:
+        return image
+    if image.dtype == bool:
+        return image.astype(np.uint8) * 255
+    low, high = float(image.min()), float(image.max())
+    if np.issubdtype(image.dtype, np.floating):
+        if low >= 0 and high <= 1:
+            return (image * 255).astype(np.uint8)
+        if low >= 0 and high <= 255:
+            return image.astype(np.uint8)
+    # Labels and wider integer ranges are stretched so every value stays distinguishable
+    scaled = (image - low) * (255.0 / max(high - low, 1e-12))
+    return scaled.astype(np.uint8)
+
+
+def histogram_equalization(image):
+    return cv2.equalizeHist(image)
+
+
+def gray_level_transformation(image, gamma=1.0):
+    return cv2.LUT(image, gamma_lut(gamma))
+
+
+def image_inversion(image):
+    return cv2.LUT(image, inversion_lut())
+
+
+def intensity_windowing(image, center=128, width=256):
+    return cv2.LUT(image, window_lut(center, width))
+
+
+def image_smoothing(image, kernel_size=3):
+    return dispatch("gaussian", image, kernel_size=kernel_size)
+
+
+def image_sharpening(image):
+    return dispatch("filter2d", image, kernel=sharpening_kernel())
+
+
+def low_pass_filter(image):
+    return dispatch("filter2d", image, kernel=low_pass_kernel())
+
+
+def high_pass_filter(image):
+    return dispatch("filter2d", image, kernel=high_pass_kernel())
+
+
+def median_filtering(image, kernel_size=3):
+    return dispatch("median", image, kernel_size=kernel_size)
+
+
+def point_detection(image):
+    return dispatch("filter2d", image, kernel=point_detection_kernel())
+
+
+def line_detection(image):
+    return dispatch("filter2d", image, kernel=line_detection_kernel())
+
+
+def edge_detection(image, method="Sobel"):
+    if method == "Sobel":
+        return dispatch("sobel", image)
+    if method == "Canny":
+        from skimage.feature import canny
+        return canny(image, sigma=1.0) * 255  # Convert to uint8 for display
+    raise ValueError(f"Unknown edge detection method: {method}")
+
+
+def image_segmentation(image, method="Watershed", clusters=3, fuzziness=2.0, spatial=False):
+    if method == "Watershed":
+        gradient = dispatch("sobel", image)
+        markers = np.zeros_like(image)
+        markers[image < 50] = 1
+        markers[image > 150] = 2
+        from skimage.segmentation import watershed
+        return watershed(gradient, markers)
+    if method == "Fuzzy C-Means":
+        return fuzzy_cmeans_segmentation(image, clusters, fuzziness, spatial)
+    raise ValueError(f"Unknown segmentation method: {method}")
+
+
+OPERATIONS = {
+    "Histogram Equalization": histogram_equalization,
+    "Gray Level Transformation": gray_level_transformation,
+    "Image Inversion": image_inversion,
+    "Intensity Windowing": intensity_windowing,
+    "Image Smoothing": image_smoothing,
+    "Image Sharpening": image_sharpening,
+    "Low Pass Filter": low_pass_filter,
+    "High Pass Filter": high_pass_filter,
+    "Median Filter": median_filtering,
+    "Point Detection": point_detection,
+    "Line Detection": line_detection,
+    "Edge Detection": edge_detection,
+    "Image Segmentation": image_segmentation,
+}
+
+# Point operations expressed as lookup tables with one entry per level (256 for
+# uint8). Each factory receives the histogram of its input (needed by
+# equalization), the number of levels, then the step parameters.
+POINT_OPERATIONS = {
+    "Histogram Equalization": lambda hist, levels=256: equalization_lut(hist),
+    "Gray Level Transformation": lambda hist, levels=256, gamma=1.0: gamma_lut(gamma, levels),
+    "Image Inversion": lambda hist, levels=256: inversion_lut(levels),
+    "Intensity Windowing": lambda hist, levels=256, center=128, width=256: window_lut(center, width, levels),
+}
+
+# Linear filters expressed as float32 correlation kernels
+LINEAR_OPERATIONS = {
+    "Image Smoothing": smoothing_kernel,
+    "Image Sharpening": sharpening_kernel,
+    "Low Pass Filter": low_pass_kernel,
+    "High Pass Filter": high_pass_kernel,
+    "Point Detection": point_detection_kernel,
+    "Line Detection": line_detection_kernel,
+}
+
+# Operations whose output is not a uint8 image, so they can only end a chain
+TERMINAL_OPERATIONS = ("Edge Detection", "Image Segmentation")
+
+
+def apply_operation(image, operation, params=None):
+    """Run one enhancement operation without touching the caches."""
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unknown enhancement operation: {operation}")
+    return OPERATIONS[operation](image, **(params or {}))
+
+
+def enhance(image, operation, params=None, image_key=None):
+    """Run an operation, memoized on (image content hash, operation, parameters)."""
+    params = params or {}
+    if image_key is None:
+        image_key = array_hash(image)
+    cache_key = (image_key, operation, tuple(sorted(params.items())))
+    result = result_cache.get(cache_key)
+    if result is None:
+        result = _freeze(np.asarray(apply_operation(image, operation, params)))
+        result_cache.put(cache_key, result)
+    return result
@@ -0,0 +1,106 @@
+"""Fuzzy c-means segmentation for grayscale images, computed over the intensity histogram.
+
+Pixels with the same intensity share the same memberships, so clustering the
+histogram bins weighted by their counts gives the same centers as clustering
+every pixel, at O(levels x clusters) per iteration regardless of image size.
+Labels and membership maps are then produced with a lookup table.
+"""
+import cv2
+import numpy as np
+
+EPSILON = 1e-9
+SPATIAL_GRID_SIDE = 512
+
+
+def _power(values, exponent):
+    # np.power with a float exponent is an order of magnitude slower than multiplication
+    if exponent == 2:
+        return values * values
+    if exponent == -2:
+        return 1 / (values * values)
+    return np.power(values, exponent)
+
+
+def _memberships(distances, fuzziness, axis=-1):
+    # u_ij = 1 / sum_k (d_ij / d_ik)^(2 / (m - 1)), computed without the explicit k loop.
+    # Distances are scaled by each pixel's nearest one first: near m = 1 the exponent is
+    # large enough (-20 at m = 1.1) that raw distances overflow float32 to inf
+    distances = distances + EPSILON
+    inverse = _power(distances / distances.min(axis=axis, keepdims=True), -2.0 / (fuzziness - 1.0))
+    return inverse / inverse.sum(axis=axis, keepdims=True)
+
+
+def _initial_centers(hist, clusters):
+    # Spread the starting centers over the intensity quantiles so no cluster starts empty
+    cdf = np.cumsum(hist) / max(hist.sum(), EPSILON)
+    quantiles = (np.arange(clusters) + 0.5) / clusters
+    return np.searchsorted(cdf, quantiles).astype(np.float64)
+
+
+def histogram_fcm(hist, clusters=3, fuzziness=2.0, max_iter=100, tol=1e-4):
+    """Cluster histogram bins. Returns (sorted centers, levels x clusters membership table)."""
+    hist = np.asarray(hist, dtype=np.float64).ravel()
+    levels = np.arange(hist.size, dtype=np.float64)
+    centers = _initial_centers(hist, clusters)
+    for _ in range(max_iter):
+        memberships = _memberships(np.abs(levels[:, None] - centers[None, :]), fuzziness)
+        weights = hist[:, None] * _power(memberships, fuzziness)
+        new_centers = (weights * levels[:, None]).sum(axis=0) / np.maximum(weights.sum(axis=0), EPSILON)
+        converged = np.abs(new_centers - centers).max() < tol
+        centers = new_centers
+        if converged:
+            break
+    order = np.argsort(centers)
+    centers = centers[order]
+    return centers, _memberships(np.abs(levels[:, None] - centers[None, :]), fuzziness)
+
+
+def _spatial_refine(image, centers, fuzziness, window=3, iterations=10, p=1, q=1):
+    """Spatially regularized FCM (Chuang et al.) on a downsampled grid; returns full-size memberships."""
+    height, width = image.shape
+    scale = min(1.0, SPATIAL_GRID_SIDE / max(height, width))
+    grid = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+    values = grid.astype(np.float32)[None]
+    centers = centers.astype(np.float32)[:, None, None]
+    # Cluster-first (k, H, W) layout keeps the per-pixel reductions contiguous
+    for _ in range(iterations):
+        memberships = _memberships(np.abs(values - centers), fuzziness, axis=0)
+        # Spatial function: how strongly the neighbourhood belongs to each cluster
+        spatial = np.stack([cv2.blur(plane, (window, window)) for plane in memberships])
+        memberships = _power(memberships, p) * _power(spatial, q) if (p, q) != (1, 1) else memberships * spatial
+        memberships /= np.maximum(memberships.sum(axis=0, keepdims=True), EPSILON)
+        weights = _power(memberships, fuzziness).reshape(len(memberships), -1)
+        centers = (weights @ values.ravel() / np.maximum(weights.sum(axis=1), EPSILON))[:, None, None]
+    return np.stack([cv2.resize(plane, (width, height), interpolation=cv2.INTER_LINEAR) for plane in memberships], axis=-1)
+
+
+def _histogram(image):
+    return cv2.calcHist([image], [0], None, [256], [0, 256]).ravel()
+
+
+def fuzzy_cmeans(image, clusters=3, fuzziness=2.0, spatial=False, with_memberships=True):
+    """Return (labels, membership maps) for a uint8 grayscale image.
+
+    Membership maps are uint8 (0-255) with one channel per cluster, ordered by
+    increasing center intensity, or None when with_memberships is False.
+    """
+    centers, table = histogram_fcm(_histogram(image), clusters, fuzziness)
+    if spatial:
+        memberships = _spatial_refine(image, centers, fuzziness)
+        labels = np.argmax(memberships, axis=-1).astype(np.uint8)
+        return labels, (memberships * 255).astype(np.uint8) if with_memberships else None
+    labels = np.take(np.argmax(table, axis=1).astype(np.uint8), image)
+    if not with_memberships:
+        return labels, None
+    return labels, np.take(np.rint(table * 255).astype(np.uint8), image, axis=0)
+
+
+def fuzzy_cmeans_segmentation(image, clusters=3, fuzziness=2.0, spatial=False):
+    """Label image spread over 0-255 for display."""
+    step = 255 // max(clusters - 1, 1)
+    if spatial:
+        labels, _ = fuzzy_cmeans(image, clusters, fuzziness, spatial, with_memberships=False)
+        return (labels * step).astype(np.uint8)
+    # Fold the display scaling into the label LUT so the image is touched once
+    _, table = histogram_fcm(_histogram(image), clusters, fuzziness)
+    return cv2.LUT(image, (np.argmax(table, axis=1) * step).astype(np.uint8))
@@ -0,0 +1,126 @@
+"""Import-time profile of the app's cold start and of each page.
+
+Every target is imported in a fresh interpreter with -X importtime, after
+streamlit, which the server has already loaded before any script runs. The
+report shows how long each target takes to import, how many modules it pulls
+in and which top-level packages account for the time, so the effect of lazy
+imports is easy to check:
+
+    python importprofile.py                     # app startup, then every page on first open
+    python importprofile.py page4 --top 15
+    python importprofile.py --eager             # all pages at once, as app.py used to import them
+    python importprofile.py --json imports.json
+
+The first open of a page is also timed inside the app (app.import.<page> on
+the diagnostics page).
+"""
+import argparse
+import ast
+import json
+import os
+import re
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(HERE, "app.py")
+PRELOADED = ("streamlit",)
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+_MARKER = "--- importprofile ---"
+
+
+def app_modules():
+    """(modules app.py imports at startup, page modules in its PAGES table)."""
+    with open(APP, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    startup, pages = [], []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            startup.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            startup.append(node.module)
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Assign):
+            continue
+        for target in node.targets:
+            if getattr(target, "id", None) == "PAGES":
+                pages.extend(module for module, _ in ast.literal_eval(node.value).values())
+            elif isinstance(target, ast.Subscript) and getattr(target.value, "id", None) == "PAGES":
+                pages.append(ast.literal_eval(node.value)[0])
+    return startup, pages
+
+
+def profile(modules, preload=PRELOADED):
+    """Import modules in a fresh interpreter after preload; return the time and where it went."""
+    code = "".join(f"import {module}\n" for module in preload)
+    code += f"import sys\nsys.stderr.write({_MARKER!r} + '\\n')\n"
+    code += "".join(f"import {module}\n" for module in modules)
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=HERE,
+                             capture_output=True, text=True)
+    if process.returncode:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+
+    total_us = 0
+    loaded = 0
+    by_package = {}
+    for line in process.stderr.split(_MARKER, 1)[1].splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match[1]), int(match[2]), match[3], match[4]
+        loaded += 1
+        if not indent:  # Imported directly by the profiled code, not by another module
+            total_us += cumulative_us
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+    packages = sorted(by_package.items(), key=lambda item: item[1], reverse=True)
+    return {
+        "seconds": total_us / 1e6,
+        "modules_loaded": loaded,
+        "packages": [{"package": package, "seconds": us / 1e6} for package, us in packages],
+    }
+
+
+def print_report(report, top):
+    print(f"{'target':12s} {'seconds':>8s} {'modules':>8s}  heaviest packages")
+    for target, result in report.items():
+        heaviest = ", ".join(f"{entry['package']} {entry['seconds']:.2f}" for entry in result["packages"][:3])
+        print(f"{target:12s} {result['seconds']:8.2f} {result['modules_loaded']:8d}  {heaviest}")
+    if top:
+        for target, result in report.items():
+            print(f"\n{target}:")
+            for entry in result["packages"][:top]:
+                print(f"  {entry['package']:28s} {entry['seconds']:8.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile DocSight import times with python -X importtime.")
+    parser.add_argument("targets", nargs="*", help="Modules to profile (default: app startup and every page)")
+    parser.add_argument("--eager", action="store_true", help="Also profile importing every page at startup")
+    parser.add_argument("--top", type=int, default=0, help="List the N heaviest packages per target")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    startup, pages = app_modules()
+    targets = {target: [target] for target in args.targets}
+    if not args.targets:
+        targets["app"] = [module for module in startup if module not in sys.builtin_module_names]
+        # A page is imported on top of the app's own imports
+        targets.update({page: [page] for page in pages})
+    if args.eager:
+        targets["eager"] = startup + pages
+
+    report = {}
+    for target, modules in targets.items():
+        preload = PRELOADED if target in ("app", "eager") or args.targets else PRELOADED + tuple(startup)
+        report[target] = profile(modules, preload)
+    print_report(report, args.top)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Decode-once ingest for uploaded files, shared by every page.
+
+An upload's bytes are read once, without copying, from the uploader's buffer.
+Its format is sniffed from the leading bytes and its content is hashed once.
+Size and pixel limits are checked before any decoding, and decoded variants
+(grayscale uint8 for the filters, an oriented PIL image for display and the
+model) go into the process-wide decoded_cache under the content hash, so
+opening the same file on another page, in another session or after a rerun
+reuses the earlier decode.
+
+    upload = ingest(uploaded_file)     # raises IngestError past the limits
+    upload.kind, upload.key, upload.data
+    upload.gray()                      # uint8 2-D array, EXIF orientation applied
+    upload.image()                     # PIL image in RGB or L, EXIF orientation applied
+"""
+import io
+import os
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+import streamlit as st
+from PIL import Image as PILImage
+from PIL import ImageOps
+
+from enhancement import content_hash, decode_grayscale, decoded_cache
+from model_input import _stretch_to_uint8
+
+MAX_UPLOAD_BYTES = int(os.environ.get("DOCSIGHT_MAX_UPLOAD_MB", "200")) * 1024 * 1024
+# Kept below PIL's own decompression-bomb error (2 x Image.MAX_IMAGE_PIXELS), which applies on top
+MAX_PIXELS = int(os.environ.get("DOCSIGHT_MAX_PIXELS", str(128 * 1024 * 1024)))
+SESSION_UPLOADS = 8
+
+# (offset, magic) -> kind; DICOM Part 10 files carry "DICM" after a 128-byte preamble
+_SIGNATURES = [
+    (0, b"\x89PNG\r\n\x1a\n", "png"),
+    (0, b"\xff\xd8\xff", "jpeg"),
+    (0, b"II*\x00", "tiff"),
+    (0, b"MM\x00*", "tiff"),
+    (0, b"%PDF-", "pdf"),
+    (0, b"BM", "bmp"),
+    (128, b"DICM", "dicom"),
+]
+_EXTENSIONS = {".dcm": "dicom", ".dicom": "dicom", ".pdf": "pdf"}
+_RASTER_KINDS = ("png", "jpeg", "tiff", "bmp")
+
+
+class IngestError(ValueError):
+    pass
+
+
+def _open_image(data, name):
+    """Lazily opened PIL image; the caller checks its size against MAX_PIXELS before decoding."""
+    try:
+        with warnings.catch_warnings():
+            # The warning fires below MAX_PIXELS, which is the limit enforced here
+            warnings.simplefilter("ignore", PILImage.DecompressionBombWarning)
+            return PILImage.open(io.BytesIO(data))
+    except PILImage.DecompressionBombError as e:
+        raise IngestError(f"{name or 'The image'} is over the limit of {MAX_PIXELS / 1e6:.0f} megapixels ({e})") from e
+
+
+def sniff(data, filename=""):
+    """Format of an upload from its leading bytes, falling back to the extension for bare DICOM datasets."""
+    head = bytes(data[:132])
+    for offset, magic, kind in _SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return kind
+    return _EXTENSIONS.get(os.path.splitext(filename.lower())[1], "unknown")
+
+
+class Upload:
+    """An uploaded file read once: its bytes, format, content hash and decoded variants."""
+
+    def __init__(self, data, name=""):
+        self.data = memoryview(data).cast("B")  # No copy of the upload buffer
+        self.name = name
+        self.kind = sniff(self.data, name)
+        self.key = content_hash(self.data)
+        self._size = None
+
+    @property
+    def size(self):
+        """(width, height) from the image header, without decoding pixels; None if PIL cannot read it."""
+        if self._size is None:
+            try:
+                with _open_image(self.data, self.name) as image:
+                    self._size = image.size
+            except OSError:
+                self._size = ()
+        return self._size or None
+
+    def check_pixels(self):
+        if self.size is None and self.kind in _RASTER_KINDS:
+            raise IngestError(f"Could not read the image header of {self.name or 'the upload'}")
+        if self.size and self.size[0] * self.size[1] > MAX_PIXELS:
+            width, height = self.size
+            raise IngestError(f"{self.name or 'The image'} is {width}×{height} pixels, "
+                              f"over the limit of {MAX_PIXELS / 1e6:.0f} megapixels")
+
+    def gray(self):
+        """uint8 grayscale decode; OpenCV applies the EXIF orientation itself."""
+        self.check_pixels()
+        return decode_grayscale(self.data, self.key)
+
+    def image(self):
+        """Oriented PIL image in RGB, or L for grayscale sources; shared, so treat it as read-only."""
+        cache_key = f"{self.key}:pil"
+        image = decoded_cache.get(cache_key)
+        if image is None:
+            self.check_pixels()
+            try:
+                image = ImageOps.exif_transpose(_open_image(self.data, self.name))
+            except OSError as e:
+                raise IngestError(f"Could not decode {self.name or 'the uploaded image'}: {e}") from e
+            if image.mode in ("I", "I;16", "F"):
+                # 16-bit and float images are stretched to 8 bits for display and the model
+                image = PILImage.fromarray(_stretch_to_uint8(np.asarray(image)))
+            image = image.convert("L" if image.mode in ("1", "L") else "RGB")
+            decoded_cache.put(cache_key, image, nbytes=image.width * image.height * len(image.getbands()))
+        return image
+
+
+def ingest(uploaded_file):
+    """Upload for a Streamlit UploadedFile, reused across reruns of this session."""
+    if uploaded_file.size > MAX_UPLOAD_BYTES:
+        raise IngestError(f"{uploaded_file.name} is {uploaded_file.size / 2 ** 20:.0f} MB, "
+                          f"over the upload limit of {MAX_UPLOAD_BYTES / 2 ** 20:.0f} MB")
+    uploads = st.session_state.setdefault("_ingested_uploads", OrderedDict())
+    upload = uploads.get(uploaded_file.file_id)
+    if upload is None:
+        upload = Upload(uploaded_file.getbuffer(), uploaded_file.name)
+        uploads[uploaded_file.file_id] = upload
+        while len(uploads) > SESSION_UPLOADS:
+            uploads.popitem(last=False)
+    else:
+        uploads.move_to_end(uploaded_file.file_id)
+    return upload
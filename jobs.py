@@ -0,0 +1,426 @@
+"""Background jobs for long-running analyses, run by one worker pool per process.
+
+Pages submit a job and keep only its id, so a slow analysis no longer ties up
+the script thread: the user can navigate away and the result is still there
+when they come back, and the number of model calls in flight is capped by the
+pool size (DOCSIGHT_JOB_WORKERS) however many sessions are open.
+
+- Jobs run in priority order (lower first), FIFO within a priority.
+- Each rate key (normally an API-key fingerprint) has its own token bucket;
+  a rate-limited job waits without holding a worker, so other keys proceed.
+- A job that raises a transient error (timeout, connection error, HTTP 408,
+  429 or 5xx) is retried with exponential backoff and jitter, up to
+  max_attempts times; any other error, such as a rejected API key or an
+  invalid request, fails the job at once.
+- Submitting a job with the dedup key and rate key of a queued, running or
+  recently finished job returns that job's id instead of starting another.
+
+A job function returns its text or yields it in chunks; followers see the
+chunks as they arrive (follow() is made for st.write_stream). Job state and
+results are kept in a SQLite file next to the analysis cache, while the
+function and its arguments (which can hold images and API keys) only live in
+memory. Each row records the process that owns it; jobs left queued or
+running by a server process on this host that has since exited are marked
+failed when the store is next opened.
+"""
+import heapq
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+import streamlit as st
+
+from metrics import registry
+from ratelimit import TokenBucket
+
+DEFAULT_PATH = os.path.join(
+    os.environ.get("DOCSIGHT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "docsight")),
+    "jobs.sqlite3",
+)
+WORKERS = int(os.environ.get("DOCSIGHT_JOB_WORKERS", "4"))
+JOBS_PER_SECOND_PER_KEY = float(os.environ.get("DOCSIGHT_JOB_RATE", "1"))
+JOB_BURST_PER_KEY = int(os.environ.get("DOCSIGHT_JOB_BURST", "3"))
+MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 2.0
+REUSE_SECONDS = 10 * 60  # A finished job is returned again for the same dedup key within this window
+RETENTION_SECONDS = 7 * 24 * 3600
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+RETRY_MARKER = "\n\n*Retrying…*\n\n"
+
+# Snapshot of a job; ahead is the number of queued jobs that will start before it
+Job = namedtuple("Job", "id kind status priority attempts result error created started finished ahead")
+
+
+class JobFailed(RuntimeError):
+    pass
+
+
+TRANSIENT_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+# Exception types of the Google and HTTP client libraries that mean "try again later"
+_TRANSIENT_NAMES = frozenset({
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "TooManyRequests",
+    "ServerError", "TimeoutException", "ConnectError", "ReadError", "RemoteProtocolError", "NetworkError",
+})
+
+
+def is_transient(error):
+    """Whether a failed job is worth retrying: timeouts, connection errors, rate limits and server errors."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in _TRANSIENT_NAMES:
+            return True
+        # google-genai and api_core errors carry the HTTP status in code, agno's in status_code
+        for attribute in ("status_code", "code"):
+            status = getattr(error, attribute, None)
+            if isinstance(status, int) and not isinstance(status, bool):
+                return status in TRANSIENT_STATUS or 500 <= status < 600
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _process_alive(pid):
+    if os.name == "nt":
+        return True  # os.kill(pid, 0) would send CTRL_C_EVENT there; leave the rows alone
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class _Task:
+    """In-memory side of a job: what to run, and its output so far."""
+
+    def __init__(self, job_id, kind, dedup_key, function, args, kwargs, rate_key, priority, max_attempts):
+        self.id = job_id
+        self.kind = kind
+        self.dedup_key = dedup_key
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.rate_key = rate_key
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.status = QUEUED
+        self.sequence = 0
+        self.attempts = 0
+        self.chunks = []
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    def snapshot(self, ahead=0):
+        result = "".join(self.chunks) if self.status == DONE else None
+        return Job(self.id, self.kind, self.status, self.priority, self.attempts, result, self.error,
+                   self.created, self.started, self.finished, ahead)
+
+
+class JobQueue:
+    def __init__(self, path=DEFAULT_PATH, workers=WORKERS, rate=JOBS_PER_SECOND_PER_KEY, burst=JOB_BURST_PER_KEY):
+        self.path = path
+        self.workers = workers
+        self.rate = rate
+        self.burst = burst
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks = {}
+        self._by_dedup = {}
+        self._ready = []  # (priority, sequence, job id)
+        self._delayed = []  # (retry time, sequence, job id)
+        self._sequence = 0
+        self._buckets = {}
+        self._busy = 0
+        self._threads = []
+        self._condition = threading.Condition()
+        self._db_lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, dedup_key TEXT, owner TEXT NOT NULL, "
+                "status TEXT NOT NULL, priority INTEGER NOT NULL, attempts INTEGER NOT NULL, "
+                "result TEXT, error TEXT, created REAL NOT NULL, started REAL, finished REAL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, status)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished)")
+            self._fail_orphans()
+        return self._connection
+
+    def _fail_orphans(self):
+        # Unfinished jobs of server processes on this host that have exited: their functions died with them
+        host = self.owner.split(":")[0]
+        owners = self._connection.execute(
+            "SELECT DISTINCT owner FROM jobs WHERE status IN (?, ?) AND (owner = ? OR owner LIKE ?)",
+            (QUEUED, RUNNING, host, f"{host}:%"),
+        ).fetchall()
+        for (owner,) in owners:
+            pid = owner.split(":")[1] if owner.count(":") == 2 else None
+            if owner != self.owner and not (pid and _process_alive(int(pid))):
+                self._connection.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE owner = ? AND status IN (?, ?)",
+                    (FAILED, "Interrupted by a server restart", time.time(), owner, QUEUED, RUNNING),
+                )
+
+    def _execute(self, sql, parameters=()):
+        with self._db_lock:
+            return self._connect().execute(sql, parameters).fetchall()
+
+    def _save(self, task):
+        self._execute(
+            "INSERT OR REPLACE INTO jobs (id, kind, dedup_key, owner, status, priority, attempts, result, error, "
+            "created, started, finished) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (task.id, task.kind, task.dedup_key, self.owner, task.status, task.priority, task.attempts,
+             "".join(task.chunks) if task.status == DONE else None, task.error,
+             task.created, task.started, task.finished),
+        )
+
+    def _start_workers(self):
+        # Called with the condition held
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"docsight-job-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def submit(self, kind, dedup_key, function, *args, rate_key=None, priority=PRIORITY_INTERACTIVE,
+               max_attempts=MAX_ATTEMPTS, **kwargs):
+        """Queue function(*args, **kwargs) and return its job id, or the id of an identical job."""
+        if dedup_key and rate_key:
+            # A job spends its submitter's key and quota, so identical requests under other keys run separately
+            dedup_key = f"{rate_key}:{dedup_key}"
+        with self._condition:
+            job_id = self._by_dedup.get(dedup_key) if dedup_key else None
+            if job_id is None and dedup_key:
+                rows = self._execute(
+                    "SELECT id FROM jobs WHERE dedup_key = ? AND status = ? AND finished >= ? "
+                    "ORDER BY finished DESC LIMIT 1",
+                    (dedup_key, DONE, time.time() - REUSE_SECONDS),
+                )
+                job_id = rows[0][0] if rows else None
+            if job_id is not None:
+                registry.increment("docsight_jobs_total", kind=kind, outcome="deduplicated")
+                return job_id
+
+            task = _Task(uuid.uuid4().hex, kind, dedup_key, function, args, kwargs, rate_key, priority, max_attempts)
+            self._save(task)
+            self._tasks[task.id] = task
+            if dedup_key:
+                self._by_dedup[dedup_key] = task.id
+            self._push(task)
+            self._start_workers()
+            return task.id
+
+    def _push(self, task, delay=0.0):
+        self._sequence += 1
+        task.sequence = self._sequence
+        if delay:
+            heapq.heappush(self._delayed, (time.monotonic() + delay, self._sequence, task.id))
+        else:
+            heapq.heappush(self._ready, (task.priority, self._sequence, task.id))
+        self._condition.notify_all()
+
+    def _bucket(self, rate_key):
+        bucket = self._buckets.get(rate_key)
+        if bucket is None:
+            bucket = self._buckets[rate_key] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    def _next_task(self):
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, _, job_id = heapq.heappop(self._delayed)
+                    self._push(self._tasks[job_id])
+                wait = self._delayed[0][0] - now if self._delayed else None
+                limited = []
+                chosen = None
+                while self._ready:
+                    entry = heapq.heappop(self._ready)
+                    task = self._tasks[entry[2]]
+                    delay = self._bucket(task.rate_key).try_acquire() if task.rate_key else 0.0
+                    if not delay:
+                        chosen = task
+                        break
+                    limited.append(entry)
+                    wait = delay if wait is None else min(wait, delay)
+                for entry in limited:
+                    heapq.heappush(self._ready, entry)
+                if chosen is not None:
+                    chosen.status = RUNNING
+                    chosen.attempts += 1
+                    chosen.started = time.time()
+                    chosen.chunks = []
+                    self._busy += 1
+                    return chosen
+                self._condition.wait(timeout=wait)
+
+    def _work(self):
+        while True:
+            task = self._next_task()
+            self._save(task)
+            if task.attempts == 1:
+                registry.observe("docsight_job_wait_seconds", task.started - task.created, kind=task.kind)
+            start = time.perf_counter()
+            try:
+                output = task.function(*task.args, **task.kwargs)
+                for chunk in [output] if isinstance(output, str) else output:
+                    with self._condition:
+                        task.chunks.append(chunk)
+                        self._condition.notify_all()
+            except Exception as e:
+                self._failed(task, e)
+            else:
+                self._finish(task, DONE)
+            finally:
+                registry.observe("docsight_job_run_seconds", time.perf_counter() - start, kind=task.kind)
+                with self._condition:
+                    self._busy -= 1
+
+    def _failed(self, task, error):
+        task.error = f"{type(error).__name__}: {error}"
+        if task.attempts >= task.max_attempts or not is_transient(error):
+            self._finish(task, FAILED)
+            return
+        delay = RETRY_BASE_SECONDS * 2 ** (task.attempts - 1) * random.uniform(0.5, 1.5)
+        registry.increment("docsight_jobs_total", kind=task.kind, outcome="retried")
+        with self._condition:
+            task.status = QUEUED
+            self._push(task, delay)
+        self._save(task)
+
+    def _finish(self, task, status):
+        task.finished = time.time()
+        task.status = status
+        if status == DONE:
+            task.error = None
+        self._save(task)
+        self._execute("DELETE FROM jobs WHERE finished < ?", (task.finished - RETENTION_SECONDS,))
+        registry.increment("docsight_jobs_total", kind=task.kind, outcome=status)
+        with self._condition:
+            if self._by_dedup.get(task.dedup_key) == task.id:
+                del self._by_dedup[task.dedup_key]
+            # Finished jobs are served from the store; keep only their output in memory until then
+            task.function = task.args = task.kwargs = None
+            self._tasks.pop(task.id, None)
+            self._condition.notify_all()
+
+    def get(self, job_id):
+        """Snapshot of a job, or None if it is unknown or expired."""
+        with self._condition:
+            task = self._tasks.get(job_id)
+            if task is not None:
+                ahead = 0
+                if task.status == QUEUED:
+                    ahead = sum(1 for priority, sequence, _ in self._ready
+                                if (priority, sequence) < (task.priority, task.sequence))
+                return task.snapshot(ahead)
+        rows = self._execute(
+            "SELECT id, kind, status, priority, attempts, result, error, created, started, finished FROM jobs WHERE id = ?",
+            (job_id,),
+        )
+        return Job(*rows[0], 0) if rows else None
+
+    def follow(self, job_id, poll_seconds=0.5):
+        """Yield a job's text as it is produced, until it finishes; raises JobFailed if it fails.
+
+        A retried job starts its output again, after a marker line.
+        """
+        shown = ""  # Output of the current attempt already yielded
+        attempt = None
+        while True:
+            with self._condition:
+                task = self._tasks.get(job_id)
+                if task is not None:
+                    restarted = task.attempts != attempt and bool(shown)
+                    if task.attempts != attempt:
+                        attempt = task.attempts
+                        shown = ""
+                    new = "".join(task.chunks)[len(shown):]
+                    if not new and not restarted:
+                        self._condition.wait(timeout=poll_seconds)
+                        continue
+            if task is not None:
+                if restarted:
+                    yield RETRY_MARKER
+                if new:
+                    shown += new
+                    yield new
+                continue
+            # Finished, or running in another process: poll the store
+            job = self.get(job_id)
+            if job is None:
+                raise JobFailed("Unknown job")
+            if job.status == DONE:
+                result = job.result or ""
+                if result.startswith(shown):
+                    if result[len(shown):]:
+                        yield result[len(shown):]
+                else:
+                    yield RETRY_MARKER + result
+                return
+            if job.status == FAILED:
+                raise JobFailed(job.error or "Job failed")
+            time.sleep(poll_seconds)
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finishes or timeout passes; return its snapshot."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while job_id in self._tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._condition.wait(timeout=remaining)
+        return self.get(job_id)
+
+    def stats(self):
+        with self._condition:
+            queued = len(self._ready) + len(self._delayed)
+            busy = self._busy
+        counts = dict(self._execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        return {"workers": self.workers, "busy": busy, "queued": queued,
+                "done": counts.get(DONE, 0), "failed": counts.get(FAILED, 0)}
+
+
+job_queue = JobQueue()
+
+
+def show_job(job_id):
+    """Render a job's output, streaming it while the job is still in progress; return its final snapshot."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return None
+    if job.status in (QUEUED, RUNNING):
+        live = st.empty()
+        with live.container():
+            if job.status == QUEUED and job.ahead:
+                st.caption(f"⏳ Queued behind {job.ahead} other analyses")
+            try:
+                st.write_stream(job_queue.follow(job_id))
+            except JobFailed:
+                pass
+        live.empty()
+        job = job_queue.get(job_id)
+    if job.status == DONE:
+        st.markdown(job.result)
+    elif job.status == FAILED:
+        st.error(f"Error: {job.error}")
+    return job
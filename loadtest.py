@@ -0,0 +1,281 @@
+"""Offline load test: N simulated users driving the page2/page3/page4 flows concurrently.
+
+Every user is a thread running Streamlit AppTest sessions in this process, so
+the sessions share the process-wide caches, pools and event loop exactly as
+they would on one server. Models are replaced with the local mock (see
+mock_model for the latency, streaming and error knobs), uploads are unique
+per session so the analysis caches do not hide model latency, and the
+persistent cache is redirected to a temporary directory.
+
+Failures the app shows (an exception or st.error in a session) are reported
+as errors; failures of the test harness itself are reported separately as
+harness errors, so they do not count against the app.
+
+    python loadtest.py --users 8 --sessions 3
+    python loadtest.py --users 32 --flows page4 --latency uniform:0.5:3 --error-rate 0.05 --json report.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+DEFAULT_FLOWS = ("page2", "page3", "page4")
+UPLOAD_SIDE = 1024
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Peak, not current, off Linux
+
+
+def _upload_png(seed):
+    from benchmark import synthetic_image
+    return cv2.imencode(".png", synthetic_image(UPLOAD_SIDE, seed))[1].tobytes()
+
+
+def _share_mock_runtime():
+    """Let concurrent AppTest runs survive each other's teardown.
+
+    AppTest installs a mock Runtime in a class attribute for each run and
+    clears it when the run ends, so with several sessions in flight a script
+    thread can find no Runtime at all. Fall back to the last mock installed.
+    """
+    from streamlit.runtime import Runtime
+    original = Runtime.instance.__func__
+    last = []
+
+    def instance(cls):
+        if cls._instance is not None:
+            last[:] = [cls._instance]
+            return cls._instance
+        return last[0] if last else original(cls)
+
+    Runtime.instance = classmethod(instance)
+
+
+def _keep_app_test_mode():
+    """Turn on global.appTest once for the whole load test.
+
+    AppTest patches config.get_option for the length of each run and restores
+    it afterwards. Overlapping runs restore each other's patches, so a script
+    could run with appTest off; its widgets then skip saving their values for
+    the test, and reading them raises KeyError('$$ID-...').
+    """
+    from contextlib import nullcontext
+
+    from streamlit import config
+    from streamlit.testing.v1 import app_test
+    config.set_option("global.appTest", True)
+    app_test.patch_config_options = lambda overrides: nullcontext()
+
+
+def _app(module, function, timeout):
+    from streamlit.testing.v1 import AppTest
+    return AppTest.from_string(f"from {module} import {function}\n{function}()\n", default_timeout=timeout)
+
+
+def _button(at, label):
+    return next(button for button in at.button if button.label == label)
+
+
+def _text_input(at, label):
+    return next(widget for widget in at.text_input if widget.label == label)
+
+
+class AppError(RuntimeError):
+    """The page itself failed: an uncaught exception or an st.error in the session."""
+
+
+def _check(at):
+    if at.exception:
+        raise AppError(at.exception[0].message)
+    if at.error:
+        raise AppError(at.error[0].value)
+
+
+def flow_page2(step, seed):
+    at = _app("page2", "medical_image_analysis", step.timeout)
+    at.session_state["GOOGLE_API_KEY"] = "load-test"
+    step("page2.open", at.run)
+    step("page2.upload", lambda: at.get("file_uploader")[0].upload("scan.png", _upload_png(seed), "image/png").run())
+    step("page2.analyze", lambda: _button(at, "🔍 Analyze Image").click().run())
+    return at
+
+
+def flow_page3(step, seed):
+    at = _app("page3", "medical_symptom_checker", step.timeout)
+    step("page3.open", at.run)
+    step("page3.api_key", lambda: _text_input(at, "Gemini API Key").input("load-test").run())
+    at.text_area[0].input(f"headache, fatigue, fever {seed}")
+    step("page3.check", lambda: _button(at, "🎯 Check Symptoms").click().run())
+    _text_input(at, "What would you like to know?").input("Should I see a doctor?")
+    step("page3.question", lambda: _button(at, "Get Answer").click().run())
+    return at
+
+
+def flow_page4(step, seed):
+    at = _app("page4", "lab_report_explainer", step.timeout)
+    at.session_state["GOOGLE_API_KEY"] = "load-test"
+    step("page4.open", at.run)
+    step("page4.upload", lambda: at.get("file_uploader")[0].upload("report.png", _upload_png(seed), "image/png").run())
+    step("page4.explain", lambda: _button(at, "📊 Explain Report").click().run())
+    step("page4.chat", lambda: at.chat_input[0].set_value("Is my creatinine level serious?").run())
+    return at
+
+
+FLOWS = {"page2": flow_page2, "page3": flow_page3, "page4": flow_page4}
+
+
+class Recorder:
+    """Times flow steps; flows call it as step(name, action) where action returns the AppTest."""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.samples = {}
+        self.errors = {}
+        self.harness_errors = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, name, action):
+        start = time.perf_counter()
+        at = action()
+        self.record(name, time.perf_counter() - start)
+        _check(at)
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.samples.setdefault(name, []).append(seconds)
+
+    def error(self, flow, message, harness=False):
+        with self._lock:
+            (self.harness_errors if harness else self.errors).setdefault(flow, []).append(message)
+
+
+def _percentiles(values):
+    values = np.asarray(values)
+    return {
+        "count": int(values.size),
+        "p50": float(np.percentile(values, 50)),
+        "p90": float(np.percentile(values, 90)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(values.max()),
+    }
+
+
+def run_load_test(users, sessions, flows, timeout=120):
+    recorder = Recorder(timeout)
+    live_sessions = []  # Kept alive until the end so memory per session includes their state
+    lock = threading.Lock()
+    completed = {flow: 0 for flow in flows}
+
+    def user(index):
+        for session in range(sessions):
+            flow = flows[(index + session) % len(flows)]
+            seed = index * 1000 + session
+            start = time.perf_counter()
+            try:
+                at = FLOWS[flow](recorder, seed)
+            except AppError as e:
+                recorder.error(flow, str(e))
+                continue
+            except Exception as e:
+                recorder.error(flow, f"{type(e).__name__}: {e}", harness=True)
+                continue
+            with lock:
+                live_sessions.append(at)
+                completed[flow] += 1
+            recorder.record(f"{flow}.total", time.perf_counter() - start)
+
+    _share_mock_runtime()
+    _keep_app_test_mode()
+    # Import the pages up front so one-off import cost is not counted as per-session memory
+    for flow in flows:
+        __import__(flow)
+    rss_before = _rss_bytes()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(index,), daemon=True) for index in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    rss_after = _rss_bytes()
+
+    total = sum(completed.values())
+    return {
+        "users": users,
+        "sessions_per_user": sessions,
+        "wall_seconds": wall,
+        "completed_flows": completed,
+        "flows_per_second": total / wall if wall else 0.0,
+        "errors": {flow: len(messages) for flow, messages in recorder.errors.items()},
+        "error_samples": {flow: messages[:3] for flow, messages in recorder.errors.items()},
+        "harness_errors": {flow: len(messages) for flow, messages in recorder.harness_errors.items()},
+        "harness_error_samples": {flow: messages[:3] for flow, messages in recorder.harness_errors.items()},
+        "rss_growth_bytes": rss_after - rss_before,
+        "rss_per_session_bytes": (rss_after - rss_before) / max(len(live_sessions), 1),
+        "latency_seconds": {name: _percentiles(values) for name, values in sorted(recorder.samples.items())},
+    }
+
+
+def print_report(report):
+    print(f"{report['users']} users x {report['sessions_per_user']} sessions in {report['wall_seconds']:.1f} s: "
+          f"{report['flows_per_second']:.2f} flows/s, completed {report['completed_flows']}")
+    print(f"errors {report['errors'] or 0}")
+    for flow, messages in report["error_samples"].items():
+        for message in messages:
+            print(f"  {flow}: {message}")
+    if report["harness_errors"]:
+        print(f"harness errors (not counted against the app) {report['harness_errors']}")
+        for flow, messages in report["harness_error_samples"].items():
+            for message in messages:
+                print(f"  {flow}: {message}")
+    print(f"memory: +{report['rss_growth_bytes'] / 2 ** 20:.1f} MiB RSS, "
+          f"{report['rss_per_session_bytes'] / 2 ** 20:.2f} MiB per session")
+    print(f"{'step':20s} {'n':>5s} {'p50':>8s} {'p90':>8s} {'p99':>8s} {'max':>8s}")
+    for name, stats in report["latency_seconds"].items():
+        print(f"{name:20s} {stats['count']:5d} {stats['p50']:8.2f} {stats['p90']:8.2f} {stats['p99']:8.2f} {stats['max']:8.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test DocSight pages offline against the mock model.")
+    parser.add_argument("--users", type=int, default=4, help="Concurrent simulated users")
+    parser.add_argument("--sessions", type=int, default=2, help="Sessions (flows) each user runs in sequence")
+    parser.add_argument("--flows", nargs="+", choices=sorted(FLOWS), default=list(DEFAULT_FLOWS))
+    parser.add_argument("--latency", default="lognormal:1.5:0.5", help="Mock time-to-first-token distribution")
+    parser.add_argument("--tokens-per-second", type=float, default=80)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120, help="Per-step AppTest timeout in seconds")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    # Must be set before the pages (and the mock behaviour) are first imported
+    os.environ["DOCSIGHT_MODEL_BACKEND"] = "mock"
+    os.environ["DOCSIGHT_MOCK_LATENCY"] = args.latency
+    os.environ["DOCSIGHT_MOCK_TOKENS_PER_SECOND"] = str(args.tokens_per_second)
+    os.environ["DOCSIGHT_MOCK_ERROR_RATE"] = str(args.error_rate)
+    os.environ["DOCSIGHT_MOCK_SEED"] = str(args.seed)
+    os.environ["DOCSIGHT_CACHE_DIR"] = tempfile.mkdtemp(prefix="docsight-loadtest-")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    report = run_load_test(args.users, args.sessions, args.flows, args.timeout)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if report["errors"] and not args.error_rate else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""Process-wide latency and cost instrumentation.
+
+Stages are timed with span(), which records into a summary per stage name.
+A summary keeps the total count and sum plus the most recent samples, and
+p50/p95/p99 are computed from those samples. Model calls add token and cost
+counters through record_usage(). Everything can be exported as JSON or in
+the Prometheus text format; the diagnostics page (page5) shows the same data.
+
+    with span("page2.decode"):
+        image = PILImage.open(uploaded_file)
+"""
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+SAMPLES_PER_SUMMARY = 4096
+QUANTILES = (0.5, 0.95, 0.99)
+
+# USD per million tokens (input, output), prompts up to 128k tokens
+MODEL_PRICES = {
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-1.5-flash": (0.075, 0.30),
+}
+
+
+class Summary:
+    def __init__(self, max_samples=SAMPLES_PER_SUMMARY):
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=max_samples)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+    def snapshot(self):
+        values = np.fromiter(self.samples, float, len(self.samples))
+        quantiles = np.quantile(values, QUANTILES) if values.size else [float("nan")] * len(QUANTILES)
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else float("nan"),
+            **{f"p{round(q * 100)}": float(value) for q, value in zip(QUANTILES, quantiles)},
+        }
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    """Summaries and counters keyed by (metric name, labels)."""
+
+    def __init__(self):
+        self._summaries = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def observe(self, name, value, **labels):
+        with self._lock:
+            key = (name, _label_key(labels))
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = Summary()
+            summary.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        with self._lock:
+            key = (name, _label_key(labels))
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._summaries.clear()
+            self._counters.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "started": self.started,
+                "summaries": [
+                    {"name": name, "labels": dict(labels), **summary.snapshot()}
+                    for (name, labels), summary in sorted(self._summaries.items())
+                ],
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        lines = []
+        typed = set()
+        for summary in snapshot["summaries"]:
+            name = summary["name"]
+            if name not in typed:
+                lines.append(f"# TYPE {name} summary")
+                typed.add(name)
+            for q in QUANTILES:
+                lines.append(f"{name}{_prometheus_labels(summary['labels'], quantile=q)} {summary[f'p{round(q * 100)}']}")
+            lines.append(f"{name}_sum{_prometheus_labels(summary['labels'])} {summary['sum']}")
+            lines.append(f"{name}_count{_prometheus_labels(summary['labels'])} {summary['count']}")
+        for counter in snapshot["counters"]:
+            name = counter["name"]
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_prometheus_labels(counter['labels'])} {counter['value']}")
+        return "\n".join(lines) + "\n"
+
+
+def _prometheus_labels(labels, **extra):
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def span(stage):
+    """Time a stage into docsight_stage_seconds; failures are also counted in docsight_stage_errors_total."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        # Streamlit reruns and stops unwind through spans too; they are not failures
+        if type(e).__name__ not in ("RerunException", "StopException", "GeneratorExit"):
+            registry.increment("docsight_stage_errors_total", stage=stage)
+        raise
+    finally:
+        registry.observe("docsight_stage_seconds", time.perf_counter() - start, stage=stage)
+
+
+def _token_count(metrics, field):
+    # agno 2+ returns a metrics object; agno 1.x a dict of per-message lists
+    value = metrics.get(field) if isinstance(metrics, dict) else getattr(metrics, field, None)
+    if isinstance(value, (list, tuple)):
+        value = sum(value)
+    return int(value or 0)
+
+
+def record_usage(model_id, metrics):
+    """Add token and estimated cost counters for one model run from its response metrics."""
+    registry.increment("docsight_model_calls_total", model=model_id)
+    if metrics is None:
+        return
+    input_tokens = _token_count(metrics, "input_tokens")
+    output_tokens = _token_count(metrics, "output_tokens")
+    registry.increment("docsight_model_tokens_total", input_tokens, model=model_id, direction="input")
+    registry.increment("docsight_model_tokens_total", output_tokens, model=model_id, direction="output")
+    input_price, output_price = MODEL_PRICES.get(model_id, (0.0, 0.0))
+    cost = (input_tokens * input_price + output_tokens * output_price) / 1e6
+    registry.increment("docsight_model_cost_usd_total", cost, model=model_id)
@@ -0,0 +1,185 @@
+"""Local stand-in for the Gemini agents, for load tests and offline development.
+
+Select it with DOCSIGHT_MODEL_BACKEND=mock. MockAgent answers with canned,
+templated responses after a configurable time-to-first-token, streams them
+at a configurable token rate, and fails a configurable fraction of calls.
+Search tools are never called.
+
+    DOCSIGHT_MOCK_LATENCY       fixed:S | uniform:LO:HI | lognormal:MEDIAN:SIGMA   (default lognormal:1.5:0.5)
+    DOCSIGHT_MOCK_TOKENS_PER_SECOND   streaming rate (default 80)
+    DOCSIGHT_MOCK_ERROR_RATE    fraction of calls that raise MockModelError (default 0)
+    DOCSIGHT_MOCK_SEED          seed for reproducible latencies and errors
+"""
+import asyncio
+import math
+import os
+import random
+import re
+import threading
+import time
+
+RESPONSES = {
+    "imaging": """### 1. Image Type & Region
+- Modality: plain radiograph (simulated)
+- Region: chest, PA projection; adequate inspiration and exposure
+
+### 2. Key Findings
+- Lungs are clear without focal consolidation
+- Cardiomediastinal silhouette within normal limits
+- No pleural effusion or pneumothorax
+- Severity: Normal
+
+### 3. Diagnostic Assessment
+- Primary: no acute cardiopulmonary abnormality (confidence: high)
+- Differentials: none significant
+
+### 4. Patient-Friendly Explanation
+Your chest image looks healthy. The lungs are clear and the heart is a normal size.
+
+### 5. Research Context
+- Simulated reference 1
+- Simulated reference 2
+""",
+    "symptoms": """Based on the symptoms provided, possible conditions include a common viral infection,
+tension-type headache, or mild dehydration. Risk level: low to moderate.
+Seek care promptly if symptoms worsen, a high fever develops, or new symptoms appear.
+""",
+    "transcript": """- Hemoglobin: 13.2 g/dL (12.0 - 15.5)
+- Creatinine: 1.4 mg/dL (0.6 - 1.2) HIGH
+- Glucose, fasting: 92 mg/dL (70 - 99)
+""",
+    "report": """### 1. Prescription/Lab Report Summary
+- Hemoglobin 13.2 g/dL: normal
+- Creatinine 1.4 mg/dL: slightly high
+
+### 2. Health Insights
+- Creatinine reflects kidney filtering. Urgency: Monitor.
+
+### 3. Patient-Friendly Explanation
+Think of your kidneys as a coffee filter; a slightly high creatinine means the filter is working a little harder.
+
+### 4. Patient Resources
+- [Creatinine test - MedlinePlus](https://medlineplus.gov/lab-tests/creatinine-test/)
+""",
+    "answer": """That value is slightly outside the reference range. On its own it is usually not urgent,
+but it is worth discussing with your doctor, who may repeat the test or check related values.
+""",
+}
+
+# First matching prompt fragment picks the response
+_ROUTES = [
+    ("medical imaging expert", "imaging"),
+    ("Transcribe its medical content", "transcript"),
+    ("User question:", "answer"),
+    ("lab report", "report"),
+    ("Symptoms:", "symptoms"),
+]
+
+
+class MockModelError(RuntimeError):
+    status_code = 503  # Simulates an overloaded model server, which the job queue retries
+
+
+class _Content:
+    def __init__(self, content, event="RunContent", metrics=None):
+        self.content = content
+        self.event = event
+        self.metrics = metrics
+
+
+def _usage(message, text):
+    # Rough token counts in agno's metrics shape, so cost accounting can be exercised offline
+    return {"input_tokens": len(message) // 4, "output_tokens": len(text.split())}
+
+
+def parse_latency(spec):
+    """Return a function rng -> seconds for a latency spec such as 'lognormal:1.5:0.5'."""
+    kind, *args = spec.split(":")
+    args = [float(arg) for arg in args]
+    if kind == "fixed":
+        return lambda rng: args[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(args[0], args[1])
+    if kind == "lognormal":
+        # Parameterized by the median, which is easier to reason about than mu
+        return lambda rng: rng.lognormvariate(math.log(args[0]), args[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class MockBehaviour:
+    def __init__(self):
+        self.latency = parse_latency(os.environ.get("DOCSIGHT_MOCK_LATENCY", "lognormal:1.5:0.5"))
+        self.tokens_per_second = float(os.environ.get("DOCSIGHT_MOCK_TOKENS_PER_SECOND", "80"))
+        self.error_rate = float(os.environ.get("DOCSIGHT_MOCK_ERROR_RATE", "0"))
+        seed = os.environ.get("DOCSIGHT_MOCK_SEED")
+        self._rng = random.Random(int(seed) if seed else None)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """(time to first token, whether the call fails) for one call."""
+        with self._lock:
+            return max(0.0, self.latency(self._rng)), self._rng.random() < self.error_rate
+
+
+_shared_behaviour = None
+
+
+def shared_behaviour():
+    """One behaviour (and random stream) for every mock agent in the process, read from the environment."""
+    global _shared_behaviour
+    if _shared_behaviour is None:
+        _shared_behaviour = MockBehaviour()
+    return _shared_behaviour
+
+
+def respond(message):
+    for fragment, name in _ROUTES:
+        if fragment in message:
+            return RESPONSES[name]
+    return RESPONSES["answer"]
+
+
+def _chunks(text, words_per_chunk=4):
+    # About one token per word; a few words per chunk keeps sleep overhead low
+    parts = re.findall(r"\S+\s*", text)
+    for start in range(0, len(parts), words_per_chunk):
+        yield "".join(parts[start:start + words_per_chunk]), min(words_per_chunk, len(parts) - start)
+
+
+class MockAgent:
+    """Drop-in for the subset of agno.agent.Agent that DocSight uses: run() and arun()."""
+
+    def __init__(self, model_id, tools=(), behaviour=None, **agent_options):
+        self.model_id = model_id
+        self.tools = tools
+        self.behaviour = behaviour or shared_behaviour()
+
+    def run(self, message, images=None, stream=False, **kwargs):
+        text = respond(message)
+        delay, fails = self.behaviour.draw()
+        if stream:
+            return self._stream(text, delay, fails, _usage(message, text))
+        time.sleep(delay + self._generation_seconds(text))
+        if fails:
+            raise MockModelError("Simulated model error")
+        return _Content(text, "RunCompleted", _usage(message, text))
+
+    async def arun(self, message, images=None, **kwargs):
+        text = respond(message)
+        delay, fails = self.behaviour.draw()
+        await asyncio.sleep(delay + self._generation_seconds(text))
+        if fails:
+            raise MockModelError("Simulated model error")
+        return _Content(text, "RunCompleted", _usage(message, text))
+
+    def _generation_seconds(self, text):
+        return len(text.split()) / self.behaviour.tokens_per_second
+
+    def _stream(self, text, delay, fails, usage):
+        time.sleep(delay)
+        if fails:
+            raise MockModelError("Simulated model error")
+        for chunk, tokens in _chunks(text):
+            yield _Content(chunk)
+            time.sleep(tokens / self.behaviour.tokens_per_second)
+        yield _Content(text, "RunCompleted", usage)
@@ -0,0 +1,88 @@
+"""In-memory image preparation for the vision model.
+
+Uploads used to be written to a fixed file and read back by AgnoImage, which
+cost a disk round trip and let concurrent sessions overwrite each other's
+images. Here the image is oriented, downscaled to the largest size the model
+makes use of, re-encoded without metadata (EXIF, ICC, text chunks), and
+handed over as bytes. Payloads are cached by content so re-analysing the same
+upload does not re-encode it.
+"""
+import io
+
+import numpy as np
+from PIL import Image as PILImage
+from PIL import ImageOps
+
+from enhancement import LRUByteCache, content_hash
+
+PAYLOAD_CACHE_BYTES = 64 * 1024 * 1024
+
+# Gemini scales anything larger than 3072 px down before tiling, so extra pixels are only upload cost
+PROFILES = {
+    # Lossless: JPEG block artifacts can look like fine findings on radiographs
+    "medical": {"max_side": 3072, "format": "png"},
+    # Photographed paper: text stays legible at 2048 px and q85, and JPEG is ~10x smaller than PNG
+    "report": {"max_side": 2048, "format": "jpeg", "quality": 85},
+}
+
+payload_cache = LRUByteCache(PAYLOAD_CACHE_BYTES)
+
+
+def _is_gray(image):
+    if image.mode in ("1", "L", "I", "I;16", "F"):
+        return True
+    if image.mode != "RGB":
+        return False
+    # Radiographs are often saved as RGB with identical channels; one channel is a third of the payload
+    pixels = np.asarray(image.reduce(8) if min(image.size) >= 64 else image)
+    return bool((pixels[..., 0] == pixels[..., 1]).all() and (pixels[..., 1] == pixels[..., 2]).all())
+
+
+def _normalize(image, fmt):
+    # Apply the EXIF orientation before the EXIF block is dropped, or phone photos arrive sideways
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("I", "I;16", "F"):
+        image = PILImage.fromarray(_stretch_to_uint8(np.asarray(image)))
+    if _is_gray(image):
+        return image.convert("L")
+    if image.mode in ("RGBA", "LA", "P") and fmt == "jpeg":
+        background = PILImage.new("RGB", image.size, "white")
+        rgba = image.convert("RGBA")
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def _stretch_to_uint8(array):
+    array = array.astype(np.float32)
+    low, high = float(array.min()), float(array.max())
+    if high <= low:
+        return np.zeros(array.shape, dtype=np.uint8)
+    return ((array - low) * (255.0 / (high - low))).astype(np.uint8)
+
+
+def encode_for_model(image, max_side, fmt, quality=None):
+    """Return encoded bytes of a PIL image, oriented, downscaled and stripped of metadata."""
+    image = _normalize(image, fmt)
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), PILImage.LANCZOS, reducing_gap=3.0)
+    buffer = io.BytesIO()
+    if fmt == "jpeg":
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    else:
+        image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def model_image(image, image_key=None, profile="medical"):
+    """AgnoImage carrying the prepared bytes of a PIL image, cached on (image_key, profile)."""
+    settings = PROFILES[profile]
+    if image_key is None:
+        image_key = content_hash(image.tobytes())
+    cache_key = (image_key, profile)
+    payload = payload_cache.get(cache_key)
+    if payload is None:
+        payload = encode_for_model(image, settings["max_side"], settings["format"], settings.get("quality"))
+        payload_cache.put(cache_key, payload, nbytes=len(payload))
+    from agno.media import Image as AgnoImage
+    return AgnoImage(content=payload, format=settings["format"], mime_type=f"image/{settings['format']}")
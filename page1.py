@@ -1,104 +1,208 @@
-import streamlit as st
+import os
 import cv2
 import numpy as np
-from skimage.filters import sobel
-from skimage.segmentation import watershed
-from skimage.segmentation import felzenszwalb
-from skimage.feature import canny
-from skimage.color import rgb2gray
-from scipy.ndimage import median_filter
+import streamlit as st
+from enhancement import (
+    TERMINAL_OPERATIONS,
+    _freeze,
+    decoded_cache,
+    enhance,
+    result_cache,
+    to_uint8,
+)
+from dicom import dicom_frame_picker, load_series
+from ingest import IngestError, ingest
+from metrics import span
+from pipeline import Pipeline, run_pipeline
+from rendering import show_image
+from preview import cached_full_resolution, iter_full_resolution, needs_preview, preview_enhance
+from tiling import decode_to_memmap, halo_for, process_tiled, spill_to_memmap
+
+ENHANCEMENT_OPTIONS = [
+    "Histogram Equalization",
+    "Gray Level Transformation",
+    "Image Inversion",
+    "Intensity Windowing",
+    "Image Smoothing",
+    "Image Sharpening",
+    "Low Pass Filter",
+    "High Pass Filter",
+    "Median Filter",
+    "Point Detection",
+    "Line Detection",
+    "Edge Detection",
+    "Image Segmentation"
+]
+
+
+def operation_params(operation, key="", levels=256):
+    """Render the parameter widgets for an operation and return its parameters."""
+    params = {}  # Parameters for the selected operation, part of the cache key
+
+    if operation == "Gray Level Transformation":
+        params["gamma"] = st.slider("Select gamma value:", 0.1, 3.0, 1.0, key=f"{key}gamma")
+
+    elif operation == "Intensity Windowing":
+        params["center"] = st.slider("Window center:", 0, levels - 1, levels // 2, key=f"{key}center")
+        params["width"] = st.slider("Window width:", 1, levels, levels, key=f"{key}width")
+
+    elif operation in ("Image Smoothing", "Median Filter"):
+        params["kernel_size"] = st.slider("Kernel size:", 3, 11, step=2, key=f"{key}kernel_size")
+
+    elif operation == "Edge Detection":
+        params["method"] = st.selectbox("Select edge detection method", ["Sobel", "Canny"], key=f"{key}edge")
+        if params["method"] == "Canny":
+            threshold1 = st.slider("Canny threshold1:", 0, 255, 100, key=f"{key}threshold1")
+            threshold2 = st.slider("Canny threshold2:", 0, 255, 200, key=f"{key}threshold2")
+
+    elif operation == "Image Segmentation":
+        params["method"] = st.selectbox("Select segmentation method", ["Watershed", "Fuzzy C-Means"], key=f"{key}segmentation")
+        if params["method"] == "Fuzzy C-Means":
+            params["clusters"] = st.slider("Number of clusters:", 2, 8, 3, key=f"{key}clusters")
+            params["fuzziness"] = st.slider("Fuzziness (m):", 1.1, 4.0, 2.0, key=f"{key}fuzziness")
+            params["spatial"] = st.checkbox("Spatial regularization", key=f"{key}spatial",
+                                            help="Smooths memberships using each pixel's neighbourhood")
+
+    return params
+
+
+def show_with_preview(image, image_key, operation, params):
+    """Show the proxy result at once, then replace it progressively with the full-resolution render."""
+    caption = f"Enhanced Image - {operation}"
+    refine = st.checkbox("Refine to full resolution automatically", value=True)
+    placeholder = st.empty()
+    full_image = cached_full_resolution(image_key, operation, params)
+
+    if full_image is None:
+        with span("page1.preview"):
+            preview_image = preview_enhance(image, image_key, operation, params)
+            show_image(preview_image, caption=f"{caption} (preview)", container=placeholder)
+        if refine:
+            # Any widget change reruns the script, which abandons the remaining bands
+            with span("page1.refine"):
+                for display in iter_full_resolution(image, image_key, operation, params, preview_image):
+                    show_image(display, caption=f"{caption} (refining…)", container=placeholder)
+            full_image = cached_full_resolution(image_key, operation, params)
+
+    if full_image is not None:
+        show_image(full_image, caption=caption, container=placeholder)
+
+    if st.button("⬇️ Export full resolution"):
+        full_image = enhance(image, operation, params, image_key=image_key)
+        st.download_button(
+            "Download PNG",
+            cv2.imencode(".png", to_uint8(full_image))[1].tobytes(),
+            file_name="enhanced.png",
+            mime="image/png"
+        )
 
 
 def medical_image_enhancement():
     st.title("Medical Image Enhancement")
 
-    uploaded_file = st.file_uploader("Upload a medical image", type=["png", "jpg", "jpeg"])
+    uploaded_file = st.file_uploader("Upload a medical image", type=["png", "jpg", "jpeg", "tif", "tiff", "dcm", "dicom"])
 
     if uploaded_file is not None:
-        # Convert uploaded file to OpenCV image
-        file_bytes = np.asarray(bytearray(uploaded_file.read()), dtype=np.uint8)
-        image = cv2.imdecode(file_bytes, cv2.IMREAD_GRAYSCALE)
-
-        st.image(image, caption="Original Image", use_container_width=True, channels="GRAY")
+        # Decode once per upload; reruns and other pages reuse the cached array
+        try:
+            upload = ingest(uploaded_file)
+        except IngestError as e:
+            st.error(str(e))
+            return
+        file_bytes = upload.data
+        series = None
+        if upload.kind == "dicom":
+            # Only the selected frame is decoded, then windowed to uint8 for the filters
+            with span("page1.decode"):
+                series = load_series([file_bytes])
+            frame_index, center, width = dicom_frame_picker(series)
+            image_key = series.key(frame_index, center, width)
+            with span("page1.decode"):
+                image = series.windowed(frame_index, center, width)
+                if image.ndim == 3:
+                    image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        else:
+            image_key = upload.key
+            try:
+                with span("page1.decode"):
+                    image = upload.gray()
+            except ValueError as e:
+                st.error(str(e))
+                return
+
+        with span("page1.render"):
+            show_image(image, caption="Original Image", image_key=image_key)
 
         st.subheader("Choose Enhancement Technique:")
 
-        enhancement_option = st.selectbox(
-            "Select an enhancement method",
-            [
-                "Histogram Equalization",
-                "Gray Level Transformation",
-                "Image Smoothing",
-                "Image Sharpening",
-                "Low Pass Filter",
-                "High Pass Filter",
-                "Median Filter",
-                "Point Detection",
-                "Line Detection",
-                "Edge Detection",
-                "Image Segmentation"
-            ]
-        )
-
-        enhanced_image = None  # Placeholder for processed image
-
-        if enhancement_option == "Histogram Equalization":
-            enhanced_image = cv2.equalizeHist(image)
-
-        elif enhancement_option == "Gray Level Transformation":
-            gamma = st.slider("Select gamma value:", 0.1, 3.0, 1.0)
-            enhanced_image = np.power(image / 255.0, gamma) * 255
-            enhanced_image = enhanced_image.astype(np.uint8)
-
-        elif enhancement_option == "Image Smoothing":
-            kernel_size = st.slider("Kernel size:", 3, 11, step=2)
-            enhanced_image = cv2.blur(image, (kernel_size, kernel_size))
-            enhanced_image = cv2.GaussianBlur(image, (kernel_size, kernel_size), 0)
-
-        elif enhancement_option == "Image Sharpening":
-            kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]])
-            enhanced_image = cv2.filter2D(image, -1, kernel)
-
-        elif enhancement_option == "Low Pass Filter":
-            kernel = np.ones((5, 5), np.float32) / 25
-            enhanced_image = cv2.filter2D(image, -1, kernel)
-
-        elif enhancement_option == "High Pass Filter":
-            kernel = np.array([[-1, -1, -1], [-1, 8, -1], [-1, -1, -1]])
-            enhanced_image = cv2.filter2D(image, -1, kernel)
-
-        elif enhancement_option == "Median Filter":
-            kernel_size = st.slider("Kernel size:", 3, 11, step=2)
-            enhanced_image = median_filter(image, size=kernel_size)
-
-        elif enhancement_option == "Point Detection":
-            kernel = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]])
-            enhanced_image = cv2.filter2D(image, -1, kernel)
-
-        elif enhancement_option == "Line Detection":
-            line_kernel = np.array([[-1, -1, 2], [-1, 2, -1], [2, -1, -1]])
-            enhanced_image = cv2.filter2D(image, -1, line_kernel)
-
-        elif enhancement_option == "Edge Detection":
-            edge_method = st.selectbox("Select edge detection method", ["Sobel", "Canny"])
-            if edge_method == "Sobel":
-                enhanced_image = sobel(image)
-            elif edge_method == "Canny":
-                threshold1 = st.slider("Canny threshold1:", 0, 255, 100)
-                threshold2 = st.slider("Canny threshold2:", 0, 255, 200)
-                enhanced_image = canny(image, sigma=1.0) * 255  # Convert to uint8 for display
-
-        elif enhancement_option == "Image Segmentation":
-            segmentation_method = st.selectbox("Select segmentation method", ["Watershed", "Fuzzy K-Means"])
-            if segmentation_method == "Watershed":
-                gradient = sobel(image)
-                markers = np.zeros_like(image)
-                markers[image < 50] = 1
-                markers[image > 150] = 2
-                enhanced_image = watershed(gradient, markers)
-            elif segmentation_method == "Fuzzy K-Means":
-                enhanced_image = felzenszwalb(image, scale=100)
+        mode = st.radio("Mode", ["Single technique", "Pipeline"], horizontal=True)
+
+        if mode == "Pipeline":
+            # Steps run in the order they are picked, e.g. median -> equalization -> gamma -> sharpen
+            chosen_steps = st.multiselect("Add steps in order", ENHANCEMENT_OPTIONS)
+            steps = []
+            for index, operation in enumerate(chosen_steps):
+                with st.expander(f"{index + 1}. {operation}", expanded=False):
+                    steps.append((operation, operation_params(operation, key=f"step{index}_")))
+
+            if any(operation in TERMINAL_OPERATIONS for operation, _ in steps[:-1]):
+                st.error("Edge detection and segmentation can only be the last step.")
+                return
+            if not steps:
+                return
+
+            enhancement_option = " → ".join(operation for operation, _ in steps)
+            st.caption(f"{len(steps)} steps fused into {Pipeline(steps).passes} passes over the image")
+            with span("page1.filter"):
+                enhanced_image = run_pipeline(image, steps, image_key=image_key)
+            result_key = f"{image_key}:{Pipeline(steps).key}"
+
+        else:
+            tiled = st.checkbox(
+                "Tiled mode for very large or 16-bit images",
+                help="Processes overlapping tiles through memory-mapped files and keeps 16-bit precision"
+            )
+            if tiled:
+                tileable_options = [option for option in ENHANCEMENT_OPTIONS if halo_for(option) is not None]
+                enhancement_option = st.selectbox("Select an enhancement method", tileable_options)
+                full_depth_image = decoded_cache.get(f"{image_key}:anydepth")
+                if full_depth_image is None:
+                    if series is not None:
+                        # Filter the stored 16-bit values rather than the windowed display frame
+                        raw_frame = series.raw_frame(frame_index)
+                        full_depth_image = image if raw_frame.ndim != 2 or raw_frame.dtype not in (np.uint8, np.uint16) else raw_frame
+                        full_depth_image = spill_to_memmap(full_depth_image)
+                    else:
+                        full_depth_image = decode_to_memmap(file_bytes)
+                    decoded_cache.put(f"{image_key}:anydepth", full_depth_image)
+                levels = 256 if full_depth_image.dtype.itemsize == 1 else 65536
+                params = operation_params(enhancement_option, levels=levels)
+                if halo_for(enhancement_option, params) is None:
+                    st.error(f"{enhancement_option} with these settings needs the whole image and cannot be tiled.")
+                    return
+                cache_key = (image_key, enhancement_option, tuple(sorted(params.items())), "tiled")
+                enhanced_image = result_cache.get(cache_key)
+                if enhanced_image is None:
+                    with span("page1.filter_tiled"):
+                        enhanced_image = _freeze(process_tiled(full_depth_image, enhancement_option, params, workers=os.cpu_count() or 1))
+                    result_cache.put(cache_key, enhanced_image)
+                result_key = str(cache_key)
+            else:
+                enhancement_option = st.selectbox("Select an enhancement method", ENHANCEMENT_OPTIONS)
+                params = operation_params(enhancement_option)
+                use_preview = needs_preview(image) and st.toggle(
+                    "Fast preview while adjusting", value=True,
+                    help="Shows a low-resolution result first, then refines it to full resolution"
+                )
+                if use_preview:
+                    show_with_preview(image, image_key, enhancement_option, params)
+                    enhanced_image = None
+                else:
+                    with span("page1.filter"):
+                        enhanced_image = enhance(image, enhancement_option, params, image_key=image_key)
+                    result_key = f"{image_key}:{enhancement_option}:{sorted(params.items())}"
 
         if enhanced_image is not None:
-            st.image(enhanced_image, caption=f"Enhanced Image - {enhancement_option}", use_container_width=True, channels="GRAY")
-
+            with span("page1.render"):
+                show_image(enhanced_image, caption=f"Enhanced Image - {enhancement_option}", image_key=result_key,
+                           download_name="enhanced.png")
@@ -1,10 +1,25 @@
-import os
 from PIL import Image as PILImage
-from agno.agent import Agent
-from agno.models.google import Gemini
 import streamlit as st
-from agno.tools.duckduckgo import DuckDuckGoTools
-from agno.media import Image as AgnoImage
+from analysis_cache import analysis_cache, analysis_key, cache_stream
+from clients import key_fingerprint, stream_agent
+from dicom import dicom_frame_picker, load_series
+from ingest import IngestError, ingest
+from jobs import job_queue, show_job
+from metrics import span
+from model_input import model_image
+from rendering import show_image
+
+MODEL_ID = "gemini-2.0-flash"
+
+
+def analyze_image(api_key, image, image_key, query, cache_key):
+    """Background job: stream the model's analysis of image and cache it when complete."""
+    with span("page2.encode"):
+        agno_image = model_image(image, image_key, profile="medical")
+    with span("page2.model_call"):
+        yield from cache_stream(cache_key, stream_agent(
+            api_key, MODEL_ID, query, tools=("duckduckgo",), images=[agno_image], markdown=True
+        ))
 
 
 def medical_image_analysis():
@@ -42,16 +57,10 @@ def medical_image_analysis():
 
         )
 
-    medical_agent = Agent(
-        model=Gemini(
-            api_key=st.session_state.GOOGLE_API_KEY,
-            id="gemini-2.0-flash"
-        ),
-        tools=[DuckDuckGoTools()],
-        markdown=True
-    ) if st.session_state.GOOGLE_API_KEY else None
+    # Agents are pooled process-wide and only checked out for the model call
+    medical_agent_ready = bool(st.session_state.GOOGLE_API_KEY)
 
-    if not medical_agent:
+    if not medical_agent_ready:
         st.warning("Please configure your API key in the sidebar to continue")
 
     st.title("🏥 Medical Imaging Diagnosis Agent")
@@ -59,19 +68,36 @@ def medical_image_analysis():
 
     uploaded_file = st.file_uploader(
         "Upload Medical Image",
-        type=["jpg", "jpeg", "png", "dicom"],
+        type=["jpg", "jpeg", "png", "dcm", "dicom"],
         help="Supported formats: JPG, JPEG, PNG, DICOM"
     )
 
-    if uploaded_file and medical_agent:
-        image = PILImage.open(uploaded_file)
-        st.image(image, caption="Uploaded Medical Image", use_container_width=True)
+    if uploaded_file and medical_agent_ready:
+        try:
+            upload = ingest(uploaded_file)
+        except IngestError as e:
+            st.error(str(e))
+            return
+        if upload.kind == "dicom":
+            # Decode only the frame being viewed; that frame is what gets analyzed
+            with span("page2.decode"):
+                series = load_series([upload.data])
+            frame_index, center, width = dicom_frame_picker(series)
+            with span("page2.decode"):
+                image = PILImage.fromarray(series.windowed(frame_index, center, width))
+            image_key = series.key(frame_index, center, width)
+        else:
+            image_key = upload.key
+            try:
+                with span("page2.decode"):
+                    image = upload.image()
+            except IngestError as e:
+                st.error(str(e))
+                return
+        with span("page2.render"):
+            show_image(image, caption="Uploaded Medical Image", image_key=image_key)
 
         if st.button("🔍 Analyze Image"):
-            image_path = "temp_medical_image.png"
-            with open(image_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-
             with st.spinner("🔄 Analyzing image... Please wait."):
                 try:
                     query = """
@@ -102,7 +128,7 @@ def medical_image_analysis():
                     - Address common patient concerns related to these findings
                     
                     ### 5. Research Context
-                    IMPORTANT: Use the DuckDuckGo search tool to:
+                    IMPORTANT: Use the DuckDuckGo search tool, with all your queries in one call, to:
                     - Find recent medical literature about similar cases
                     - Search for standard treatment protocols
                     - Provide a list of relevant medical links of them too
@@ -112,10 +138,26 @@ def medical_image_analysis():
                     Format your response using clear markdown headers and bullet points. Be concise yet thorough.
                     """
 
-                    agno_image = AgnoImage(filepath=image_path)
-                    response = medical_agent.run(query, images=[agno_image])
-                    st.markdown(response.content)
+                    cache_key = analysis_key(image_key, query, MODEL_ID)
+                    analysis = analysis_cache.get(cache_key)
+                    if analysis is not None:
+                        st.session_state.analysis_job = None
+                        st.caption("⚡ Loaded from the analysis cache")
+                        st.markdown(analysis)
+                    else:
+                        # Runs on the shared worker pool; identical in-flight analyses share one job
+                        job_id = job_queue.submit(
+                            "page2.analysis", cache_key, analyze_image,
+                            st.session_state.GOOGLE_API_KEY, image, image_key, query, cache_key,
+                            rate_key=key_fingerprint(st.session_state.GOOGLE_API_KEY),
+                        )
+                        st.session_state.analysis_job = (image_key, job_id)
                 except Exception as e:
                     st.error(f"Error: {e}")
-                finally:
-                    os.remove(image_path)
+
+        # The job outlives this script run, so its result is shown again on later reruns
+        analysis_job = st.session_state.get("analysis_job")
+        if analysis_job and analysis_job[0] == image_key:
+            with st.spinner("🔄 Analyzing image... Please wait."):
+                # Rendered token by token as the model generates it
+                show_job(analysis_job[1])
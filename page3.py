@@ -1,6 +1,21 @@
 import streamlit as st
-from agno.agent import Agent
-from agno.models.google import Gemini
+from answer_cache import answer_cache, cached_answer_caption, context_fingerprint
+from clients import stream_agent
+from metrics import span
+from symptom_index import triage
+
+MODEL_ID = "gemini-1.5-flash"
+
+SYMPTOM_CHECKER_OPTIONS = dict(
+    name="Symptom Checker",
+    role="Analyzes user symptoms and assesses risk",
+    instructions=[
+        "Analyze the user's symptoms and suggest potential medical conditions.",
+        "Provide a risk level (e.g., low, moderate, high) based on the symptoms provided.",
+        "Consider age, gender, lifestyle factors, and medical history in the assessment.",
+        "Be clear, concise, and informative."
+    ]
+)
 
 def medical_symptom_checker():
     if 'assessment_result' not in st.session_state:
@@ -64,19 +79,13 @@ def medical_symptom_checker():
 
     # Main function logic
     if gemini_api_key:
-        try:
-            gemini_model = Gemini(id="gemini-1.5-flash", api_key=gemini_api_key)
-        except Exception as e:
-            st.error(f"❌ Error initializing Gemini model: {e}")
-            return
-
         st.header("👤 Your Symptom Profile")
 
         col1, col2 = st.columns(2)
 
         with col1:
             symptoms_input = st.text_area("Symptoms (comma-separated)", help="Enter your symptoms")
-            age = st.number_input("Age", min_value=1, max_value=120, step=1, help="Enter your age")
+            age = st.number_input("Age", min_value=0, max_value=120, value=None, step=1, help="Enter your age")
             gender = st.selectbox("Gender", options=["Male", "Female", "Other"])
             lifestyle = st.text_input("Lifestyle Factors (e.g., smoking, alcohol consumption)",
                                       help="Enter relevant lifestyle factors")
@@ -86,25 +95,17 @@ def medical_symptom_checker():
             height = st.number_input("Height (cm)", min_value=100.0, max_value=250.0, step=0.1)
             medical_history = st.text_area("Medical History", help="Any previous conditions or treatments")
 
+        quick_triage = st.checkbox(
+            "⚡ Quick triage only",
+            help="Rank likely conditions and compute a risk level locally, without the AI assessment"
+        )
+
         if st.button("🎯 Check Symptoms", use_container_width=True):
             with st.spinner("Analyzing your symptoms..."):
                 try:
-                    # Create an agent for symptom checking
-                    symptom_checker_agent = Agent(
-                        name="Symptom Checker",
-                        role="Analyzes user symptoms and assesses risk",
-                        model=gemini_model,
-                        instructions=[
-                            "Analyze the user's symptoms and suggest potential medical conditions.",
-                            "Provide a risk level (e.g., low, moderate, high) based on the symptoms provided.",
-                            "Consider age, gender, lifestyle factors, and medical history in the assessment.",
-                            "Be clear, concise, and informative."
-                        ]
-                    )
-
                     user_profile = f"""
                     Symptoms: {symptoms_input}
-                    Age: {age}
+                    Age: {age if age is not None else "not given"}
                     Weight: {weight}kg
                     Height: {height}cm
                     Gender: {gender}
@@ -112,24 +113,37 @@ def medical_symptom_checker():
                     Medical History: {medical_history}
                     """
 
-                    # Get symptom assessment from the agent
-                    symptom_assessment_response = symptom_checker_agent.run(user_profile)
+                    # Local index: ranked candidates and a computed risk level in milliseconds
+                    with span("page3.triage"):
+                        triage_result = triage(symptoms_input, age)
+                    red_flags = "".join(f"\n- {flag}" for flag in triage_result.red_flags)
                     assessment_result = {
-                        "conditions": symptom_assessment_response.content,
-                        "risk_level": "Moderate (Based on age, symptoms, and medical history)",
-                        "important_considerations": """
+                        "conditions": triage_result.shortlist_markdown(),
+                        "risk_level": f"{triage_result.risk_level} (Based on age, symptoms, and red-flag rules)",
+                        "important_considerations": red_flags + """
                         - Consult a healthcare provider for further evaluation.
                         - Pay attention to any worsening symptoms or new developments.
                         - Stay hydrated and maintain a balanced diet.
                         """
                     }
 
+                    if quick_triage:
+                        display_symptom_assessment(assessment_result)
+                    else:
+                        # Stream the symptom assessment from the agent, which starts from the local shortlist
+                        with span("page3.model_call"):
+                            assessment_result["conditions"] = display_symptom_assessment(
+                                assessment_result,
+                                conditions_stream=stream_agent(
+                                    gemini_api_key, MODEL_ID, f"{user_profile}\n{triage_result.model_context()}",
+                                    **SYMPTOM_CHECKER_OPTIONS
+                                )
+                            )
+
                     st.session_state.assessment_result = assessment_result
                     st.session_state.assessment_done = True
                     st.session_state.qa_pairs = []
 
-                    display_symptom_assessment(assessment_result)
-
                 except Exception as e:
                     st.error(f"❌ An error occurred while analyzing symptoms: {e}")
 
@@ -146,13 +160,23 @@ def medical_symptom_checker():
                         full_context = f"{context}\nUser Question: {question_input}"
 
                         try:
-                            # Create an agent for answering questions
-                            agent = Agent(model=gemini_model, show_tool_calls=True, markdown=True)
-                            run_response = agent.run(full_context)
-
-                            if hasattr(run_response, 'content'):
-                                answer = run_response.content
+                            # Near-identical follow-ups about the same assessment reuse the earlier answer
+                            context_key = context_fingerprint(MODEL_ID, context)
+                            cached = answer_cache.lookup(context_key, question_input)
+                            if cached:
+                                answer, similarity, cached_question = cached
+                                st.caption(cached_answer_caption(similarity, cached_question))
                             else:
+                                # Stream the answer while it is generated; the Q&A history below shows it afterwards
+                                live_answer = st.empty()
+                                with live_answer.container(), span("page3.answer_model_call"):
+                                    answer = st.write_stream(stream_agent(
+                                        gemini_api_key, MODEL_ID, full_context, show_tool_calls=True, markdown=True
+                                    ))
+                                live_answer.empty()
+                                answer_cache.store(context_key, question_input, answer)
+
+                            if not answer:
                                 answer = "Sorry, I couldn't generate a response at this time."
 
                             st.session_state.qa_pairs.append((question_input, answer))
@@ -167,13 +191,17 @@ def medical_symptom_checker():
 
 
 # Function to display symptom assessment
-def display_symptom_assessment(assessment_content):
+def display_symptom_assessment(assessment_content, conditions_stream=None):
     with st.expander("🔍 Symptom Assessment Results", expanded=True):
         col1, col2 = st.columns([2, 1])
 
         with col1:
             st.markdown("### 🩺 Potential Conditions")
-            st.write(assessment_content.get("conditions", "No conditions found"))
+            if conditions_stream is not None:
+                conditions = st.write_stream(conditions_stream)
+            else:
+                conditions = assessment_content.get("conditions", "No conditions found")
+                st.write(conditions)
 
         with col2:
             st.markdown("### ⚠️ Risk Level & Recommendations")
@@ -184,6 +212,8 @@ def display_symptom_assessment(assessment_content):
                 if consideration.strip():
                     st.warning(consideration)
 
+    return conditions
+
 
 
 
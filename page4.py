@@ -1,10 +1,59 @@
-import os
-from PIL import Image as PILImage
-from agno.agent import Agent
-from agno.models.google import Gemini
 import streamlit as st
-from agno.tools.googlesearch import GoogleSearchTools
-from agno.media import Image as AgnoImage
+from analysis_cache import analysis_cache, analysis_key, cache_stream
+from answer_cache import answer_cache, cached_answer_caption, context_fingerprint
+from clients import key_fingerprint, stream_agent
+from enhancement import content_hash
+from ingest import IngestError, ingest
+from jobs import DONE, job_queue, show_job
+from metrics import span
+from model_input import model_image
+from pdf_ingest import extract_pages
+from rendering import show_image
+from report_context import compact_history, report_collection, retrieve
+from report_pages import ReportPage, known_transcripts, merge_prompt, transcribe_report
+
+MODEL_ID = "gemini-2.0-flash"
+
+
+def stream_report_agent(api_key, message, images=None):
+    return stream_agent(api_key, MODEL_ID, message, tools=("googlesearch",), images=images, markdown=True)
+
+
+def explain_report(api_key, pages, prompt, cache_key):
+    """Background job: stream the explanation of a report and cache it when complete."""
+    if len(pages) == 1 and pages[0].text is None:
+        with span("page4.encode"):
+            agno_image = model_image(pages[0].image, pages[0].key, profile="report")
+        stream = stream_report_agent(api_key, prompt, images=[agno_image])
+    else:
+        # Text pages are used as-is, image pages are transcribed concurrently,
+        # then everything is explained together in one call
+        with span("page4.transcribe"):
+            transcripts = transcribe_report(api_key, MODEL_ID, pages)
+        stream = stream_report_agent(api_key, merge_prompt(prompt, transcripts))
+    with span("page4.model_call"):
+        yield from cache_stream(cache_key, stream)
+
+
+def load_report_pages(uploaded_files):
+    """ReportPage per uploaded image and per PDF page, in upload order."""
+    pages = []
+    for uploaded_file in uploaded_files:
+        try:
+            upload = ingest(uploaded_file)
+            if upload.kind == "pdf":
+                pdf_pages = extract_pages(upload.data, upload.key)
+                sources = [page.source for page in pdf_pages]
+                st.caption(
+                    f"📄 {uploaded_file.name}: {len(pdf_pages)} pages — {sources.count('text')} with text, "
+                    f"{sources.count('ocr')} read by OCR, {sources.count('vision')} sent as images"
+                )
+                pages.extend(pdf_pages)
+            else:
+                pages.append(ReportPage(upload.key, upload.image(), None, "image"))
+        except IngestError as e:
+            st.warning(f"Skipped {uploaded_file.name}: {e}")
+    return pages
 
 
 def lab_report_explainer():
@@ -14,6 +63,8 @@ def lab_report_explainer():
         st.session_state.chat_history = []
     if "initial_summary" not in st.session_state:
         st.session_state.initial_summary = None
+    if "report_transcripts" not in st.session_state:
+        st.session_state.report_transcripts = []
 
     # Sidebar configuration
     with st.sidebar:
@@ -42,30 +93,37 @@ def lab_report_explainer():
             "⚠️ This tool is for educational purposes. Always consult a certified medical professional."
         )
 
-    agent = Agent(
-        model=Gemini(api_key=st.session_state.GOOGLE_API_KEY, id="gemini-2.0-flash"),
-        tools=[GoogleSearchTools()],
-        markdown=True
-    ) if st.session_state.GOOGLE_API_KEY else None
+    # Agents are pooled process-wide and only checked out for each model call
+    agent_ready = bool(st.session_state.GOOGLE_API_KEY)
 
     st.title("🧪 Lab Report and Doctor Prescription Interpreter")
     st.write("Upload a prescription or report and get a simplified, "
              "patient-friendly explanation in your preferred language.")
 
-    uploaded_file = st.file_uploader(
-        "📤 Upload Lab Report/ Prescription Image",
-        type=["jpg", "jpeg", "png"]
+    uploaded_files = st.file_uploader(
+        "📤 Upload Lab Report/ Prescription Images or PDFs",
+        type=["jpg", "jpeg", "png", "pdf"],
+        accept_multiple_files=True,
+        help="Add every page of a multi-page report, or several photos of one prescription"
     )
 
-    if uploaded_file and agent:
-        image = PILImage.open(uploaded_file)
-        st.image(image, caption="Uploaded Lab Report", use_container_width=True)
+    pages = []
+    if uploaded_files and agent_ready:
+        with span("page4.ingest"):
+            pages = load_report_pages(uploaded_files)
+    if uploaded_files and agent_ready and not pages:
+        st.warning("No readable pages were found in the uploaded files.")
+
+    if pages:
+        # The same pages in the same order make the same report
+        report_key = pages[0].key if len(pages) == 1 else content_hash(" ".join(page.key for page in pages).encode())
+        shown = [(number, page) for number, page in enumerate(pages, start=1) if page.image is not None]
+        columns = st.columns(min(len(shown), 3)) if shown else []
+        for index, (number, page) in enumerate(shown):
+            caption = "Uploaded Lab Report" if len(pages) == 1 else f"Page {number}"
+            show_image(page.image, caption=caption, image_key=page.key, container=columns[index % len(columns)])
 
         if st.button("📊 Explain Report"):
-            image_path = "temp_lab_report.png"
-            with open(image_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-
             with st.spinner("🧠 Analyzing your lab report..."):
                 try:
                     prompt = f"""
@@ -114,23 +172,43 @@ def lab_report_explainer():
                     Thank you.
                     """
 
-                    agno_image = AgnoImage(filepath=image_path)
-                    response = agent.run(prompt, images=[agno_image])
-
-                    if st.session_state.initial_summary != response.content:
-                        st.session_state.initial_summary = response.content
-                        st.session_state.chat_history = []  # reset chat history for new report
-
-                    st.subheader("🧾 Lab Report Summary")
-                    st.markdown(st.session_state.initial_summary)
-
+                    cache_key = analysis_key(report_key, prompt, MODEL_ID, st.session_state.selected_language)
+                    summary = analysis_cache.get(cache_key)
+                    if summary is not None:
+                        st.session_state.report_job = None
+                        st.subheader("🧾 Lab Report Summary")
+                        st.caption("⚡ Loaded from the analysis cache")
+                        st.markdown(summary)
+                        # Page text known without a model call, plus any transcripts still cached
+                        st.session_state.report_transcripts = known_transcripts(MODEL_ID, pages)
+                        if st.session_state.initial_summary != summary:
+                            st.session_state.initial_summary = summary
+                            st.session_state.chat_history = []  # reset chat history for new report
+                    else:
+                        # Runs on the shared worker pool; identical in-flight reports share one job
+                        job_id = job_queue.submit(
+                            "page4.explanation", cache_key, explain_report,
+                            st.session_state.GOOGLE_API_KEY, pages, prompt, cache_key,
+                            rate_key=key_fingerprint(st.session_state.GOOGLE_API_KEY),
+                        )
+                        st.session_state.report_job = (report_key, job_id)
                 except Exception as e:
                     st.error(f"Error: {e}")
-                finally:
-                    os.remove(image_path)
+
+        # The job outlives this script run, so its result is shown again on later reruns
+        report_job = st.session_state.get("report_job")
+        if report_job and report_job[0] == report_key:
+            st.subheader("🧾 Lab Report Summary")
+            with st.spinner("🧠 Analyzing your lab report..."):
+                # Rendered token by token as the model generates it
+                job = show_job(report_job[1])
+            if job is not None and job.status == DONE and st.session_state.initial_summary != job.result:
+                st.session_state.initial_summary = job.result
+                st.session_state.report_transcripts = known_transcripts(MODEL_ID, pages)
+                st.session_state.chat_history = []  # reset chat history for new report
 
     # 💬 Chat section
-    if agent and st.session_state.initial_summary:
+    if agent_ready and st.session_state.initial_summary:
         st.markdown("---")
         st.subheader("💬 Ask Questions About Your Report")
 
@@ -145,11 +223,22 @@ def lab_report_explainer():
 
             with st.spinner("🤖 Thinking..."):
                 try:
-                    # Combine previous report summary + new user question
+                    # Only the report excerpts relevant to the question and a budgeted chat history are sent
+                    with span("page4.retrieve"):
+                        collection = report_collection(st.session_state.initial_summary, st.session_state.report_transcripts)
+                        excerpts = "\n\n".join(retrieve(collection, user_input))
+                    history = "\n".join(
+                        f"{'User' if role == '🧑‍💻 You' else 'Assistant'}: {message}"
+                        for role, message in compact_history(st.session_state.chat_history)
+                    )
                     contextual_prompt = f"""
-                    You have the following lab report explanation:
+                    You have the following excerpts from a lab report and its explanation:
+
+                    {excerpts}
+
+                    Conversation so far:
 
-                    {st.session_state.initial_summary}
+                    {history or "(this is the first question)"}
 
                     User question: {user_input}
                     
@@ -160,12 +249,22 @@ def lab_report_explainer():
                     included in the lab report, you must use the Google Search tool to find relevant, up-to-date information.
                     """
 
-                    chat_response = agent.run(contextual_prompt)
+                    # Near-identical follow-ups about the same report and conversation reuse the earlier answer;
+                    # the history is part of the key because "what does that mean?" depends on it
+                    context_key = context_fingerprint(MODEL_ID, collection.name, history)
+                    cached = answer_cache.lookup(context_key, user_input)
+                    with st.chat_message("🤖 AI"):
+                        if cached:
+                            answer, similarity, cached_question = cached
+                            st.markdown(answer)
+                            st.caption(cached_answer_caption(similarity, cached_question))
+                        else:
+                            with span("page4.chat_model_call"):
+                                answer = st.write_stream(stream_report_agent(st.session_state.GOOGLE_API_KEY, contextual_prompt))
+                            answer_cache.store(context_key, user_input, answer)
                     st.session_state.chat_history.append(("🧑‍💻 You", user_input))
-                    if chat_response.content.strip():
-                        st.session_state.chat_history.append(("🤖 AI", chat_response.content))
-                        with st.chat_message("🤖 AI"):
-                            st.markdown(chat_response.content)
+                    if answer.strip():
+                        st.session_state.chat_history.append(("🤖 AI", answer))
                 except Exception as e:
                     st.error(f"Error during chat: {e}")
 
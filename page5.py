@@ -0,0 +1,76 @@
+import time
+
+import pandas as pd
+import streamlit as st
+from metrics import registry
+
+
+def _cache_stats():
+    from analysis_cache import analysis_cache
+    from answer_cache import answer_cache
+    from search_tools import search_cache
+    return {
+        "Analysis cache": analysis_cache.stats(),
+        "Answer cache": answer_cache.stats(),
+        "Search cache": search_cache.stats(),
+    }
+
+
+def diagnostics():
+    st.title("📈 Diagnostics")
+    st.write("Per-stage latency, model usage and cache statistics for this server process, across all sessions.")
+
+    snapshot = registry.snapshot()
+    st.caption(f"Collecting for {time.time() - snapshot['started']:.0f} s")
+
+    stages = [summary for summary in snapshot["summaries"] if summary["name"] == "docsight_stage_seconds"]
+    if stages:
+        st.subheader("⏱️ Stage latency (seconds)")
+        errors = {counter["labels"]["stage"]: counter["value"] for counter in snapshot["counters"]
+                  if counter["name"] == "docsight_stage_errors_total"}
+        st.dataframe(pd.DataFrame([
+            {"stage": summary["labels"]["stage"], "count": summary["count"], "errors": errors.get(summary["labels"]["stage"], 0),
+             "p50": summary["p50"], "p95": summary["p95"], "p99": summary["p99"], "total": summary["sum"]}
+            for summary in stages
+        ]).set_index("stage").style.format(precision=3), use_container_width=True)
+    else:
+        st.info("No stages recorded yet. Use the other pages and come back.")
+
+    first_token = [summary for summary in snapshot["summaries"] if summary["name"] == "docsight_model_first_token_seconds"]
+    if first_token:
+        st.subheader("🤖 Model calls")
+        usage = {}
+        for counter in snapshot["counters"]:
+            model = counter["labels"].get("model")
+            if model is None:
+                continue
+            row = usage.setdefault(model, {"calls": 0, "input tokens": 0, "output tokens": 0, "cost (USD)": 0.0})
+            if counter["name"] == "docsight_model_calls_total":
+                row["calls"] = counter["value"]
+            elif counter["name"] == "docsight_model_tokens_total":
+                row[f"{counter['labels']['direction']} tokens"] = counter["value"]
+            elif counter["name"] == "docsight_model_cost_usd_total":
+                row["cost (USD)"] = counter["value"]
+        for summary in first_token:
+            row = usage.setdefault(summary["labels"]["model"], {})
+            row["first token p50 (s)"] = summary["p50"]
+            row["first token p95 (s)"] = summary["p95"]
+        st.dataframe(pd.DataFrame.from_dict(usage, orient="index"), use_container_width=True)
+
+    from jobs import job_queue
+    st.subheader("🧵 Background jobs")
+    st.dataframe(pd.DataFrame([job_queue.stats()]), hide_index=True, use_container_width=True)
+
+    st.subheader("🗄️ Caches")
+    st.dataframe(pd.DataFrame.from_dict(_cache_stats(), orient="index"), use_container_width=True)
+
+    st.subheader("⬇️ Export")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button("JSON", registry.to_json(), file_name="docsight-metrics.json", mime="application/json")
+    with col2:
+        st.download_button("Prometheus", registry.to_prometheus(), file_name="docsight-metrics.prom", mime="text/plain")
+    with col3:
+        if st.button("🔄 Reset metrics"):
+            registry.reset()
+            st.rerun()
@@ -0,0 +1,140 @@
+"""Text-first ingestion of PDF lab reports.
+
+Born-digital PDFs carry a text layer, which is read directly and sent to the
+model as compact text instead of pixels. Pages without one (scans) fall back
+to their embedded page image: a local Tesseract OCR pass is tried first, and
+only pages where OCR recovers too little, or Tesseract is not installed, are
+left for the vision model.
+
+pypdf has no renderer, so "rasterizing" a scanned page means taking its
+largest embedded image, which for scanner output is the page itself.
+
+Unreadable, damaged and password-protected PDFs raise IngestError, so the
+page can skip the file and keep the rest of the upload.
+"""
+import io
+import re
+
+from enhancement import LRUByteCache
+from ingest import MAX_PIXELS, IngestError
+from report_pages import ReportPage
+
+MIN_TEXT_CHARS = 40  # Less than this is a header, page number or watermark, not content
+MIN_OCR_CONFIDENCE = 60
+PDF_CACHE_BYTES = 128 * 1024 * 1024
+
+pdf_cache = LRUByteCache(PDF_CACHE_BYTES)
+
+
+def compact_text(text):
+    """Strip layout padding but keep column gaps, so table rows stay readable."""
+    lines = (re.sub(r" {2,}", "  ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _text_layer(page):
+    try:
+        text = page.extract_text(extraction_mode="layout")
+    except Exception:
+        # Layout mode is stricter about malformed content streams
+        text = page.extract_text()
+    return compact_text(text or "")
+
+
+def _image_area(page, image_id):
+    """Pixel count of an image XObject from its /Width and /Height, without decoding it."""
+    if isinstance(image_id, str):
+        if image_id.startswith("~"):
+            return 0  # Inline image: small by definition, and only decoding reveals its size
+        image_id = [image_id]
+    obj = page
+    for name in image_id:
+        obj = obj["/Resources"]["/XObject"][name].get_object()
+    return int(obj.get("/Width", 0)) * int(obj.get("/Height", 0))
+
+
+def _page_image(page):
+    """Largest embedded image that decodes; sizes come from the headers, so only that one is decoded."""
+    candidates = []
+    for image_id in page.images.keys():
+        try:
+            area = _image_area(page, image_id)
+        except (KeyError, TypeError, ValueError):
+            area = 0
+        if area <= MAX_PIXELS:
+            candidates.append((area, image_id))
+    for _, image_id in sorted(candidates, key=lambda candidate: candidate[0], reverse=True):
+        try:
+            image = page.images[image_id].image
+        except Exception:
+            continue  # Unsupported filter (JBIG2, JPEG 2000 without a decoder) or a damaged stream
+        if image is not None:
+            return image
+    return None
+
+
+def ocr_text(image):
+    """(text, mean word confidence) from Tesseract, or (None, 0) when it is not installed."""
+    try:
+        import pytesseract
+    except ImportError:
+        return None, 0
+    try:
+        data = pytesseract.image_to_data(image.convert("L"), output_type=pytesseract.Output.DICT)
+    except pytesseract.TesseractNotFoundError:
+        return None, 0
+    lines = {}
+    confidences = []
+    for index, word in enumerate(data["text"]):
+        confidence = float(data["conf"][index])
+        if not word.strip() or confidence < 0:
+            continue
+        line = (data["block_num"][index], data["par_num"][index], data["line_num"][index])
+        lines.setdefault(line, []).append(word)
+        confidences.append(confidence)
+    text = "\n".join(" ".join(words) for _, words in sorted(lines.items()))
+    return text, sum(confidences) / len(confidences) if confidences else 0
+
+
+def _read_pages(pdf_bytes, pdf_key):
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    # Many "encrypted" PDFs only restrict editing and open with an empty password
+    if reader.is_encrypted and not reader.decrypt(""):
+        raise IngestError("the PDF is password-protected")
+    pages = []
+    nbytes = 0
+    for number, page in enumerate(reader.pages, start=1):
+        key = f"{pdf_key}:p{number}"
+        text = _text_layer(page)
+        if len(text) >= MIN_TEXT_CHARS:
+            pages.append(ReportPage(key, None, text, "text"))
+            nbytes += len(text)
+            continue
+        image = _page_image(page)
+        if image is None:
+            continue  # Blank page, or no image that could be decoded
+        text, confidence = ocr_text(image)
+        if text and len(text) >= MIN_TEXT_CHARS and confidence >= MIN_OCR_CONFIDENCE:
+            pages.append(ReportPage(key, image, text, "ocr"))
+            nbytes += len(text)
+        else:
+            pages.append(ReportPage(key, image, None, "vision"))
+        nbytes += image.width * image.height * len(image.getbands())
+    return pages, nbytes
+
+
+def extract_pages(pdf_bytes, pdf_key):
+    """ReportPage per PDF page, with text when it could be recovered and the page image otherwise."""
+    pages = pdf_cache.get(pdf_key)
+    if pages is not None:
+        return pages
+    from pypdf.errors import DependencyError, PyPdfError
+
+    try:
+        pages, nbytes = _read_pages(pdf_bytes, pdf_key)
+    except (PyPdfError, DependencyError, NotImplementedError) as e:
+        raise IngestError(f"the PDF could not be read ({e})") from e
+    pdf_cache.put(pdf_key, pages, nbytes=nbytes)
+    return pages
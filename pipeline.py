@@ -0,0 +1,123 @@
+import cv2
+import numpy as np
+
+from enhancement import (
+    LINEAR_OPERATIONS,
+    OPERATIONS,
+    POINT_OPERATIONS,
+    TERMINAL_OPERATIONS,
+    _freeze,
+    apply_operation,
+    array_hash,
+    result_cache,
+)
+
+
+def _is_smoothing(kernel):
+    # Non-negative kernels that sum to one keep values inside [0, 255], so the
+    # uint8 round trip between two such filters can be skipped without clipping
+    return bool((kernel >= 0).all()) and abs(float(kernel.sum()) - 1.0) < 1e-4
+
+
+def _separate(kernel):
+    """Return (column, row) vectors when the kernel has rank one, otherwise None."""
+    u, s, vt = np.linalg.svd(kernel.astype(np.float64))
+    if s.size > 1 and s[1] > 1e-6 * s[0]:
+        return None
+    scale = np.sqrt(s[0])
+    return u[:, 0] * scale, vt[0] * scale
+
+
+class Pipeline:
+    """A chain of enhancement steps compiled into as few passes over the image as possible.
+
+    Consecutive point operations collapse into one 256-entry lookup table and
+    consecutive linear filters collapse into one kernel, as long as every filter
+    but the last is a smoothing kernel.
+    """
+
+    def __init__(self, steps):
+        self.steps = [(operation, dict(params or {})) for operation, params in steps]
+        for index, (operation, _) in enumerate(self.steps):
+            if operation not in OPERATIONS:
+                raise ValueError(f"Unknown enhancement operation: {operation}")
+            if operation in TERMINAL_OPERATIONS and index != len(self.steps) - 1:
+                raise ValueError(f"{operation} must be the last step of a pipeline")
+        self.stages = self._compile()
+
+    @property
+    def key(self):
+        return tuple((operation, tuple(sorted(params.items()))) for operation, params in self.steps)
+
+    @property
+    def passes(self):
+        return len(self.stages)
+
+    def _compile(self):
+        stages = []
+        for operation, params in self.steps:
+            kind = "lut" if operation in POINT_OPERATIONS else "kernel" if operation in LINEAR_OPERATIONS else "op"
+            previous = stages[-1] if stages else None
+            if previous and previous[0] == kind == "lut":
+                previous[1].append((operation, params))
+            elif previous and previous[0] == kind == "kernel" and _is_smoothing(previous[2][-1]):
+                previous[1].append((operation, params))
+                previous[2].append(LINEAR_OPERATIONS[operation](**params))
+            elif kind == "kernel":
+                stages.append([kind, [(operation, params)], [LINEAR_OPERATIONS[operation](**params)]])
+            else:
+                stages.append([kind, [(operation, params)], None])
+        return stages
+
+    def run(self, image):
+        for kind, steps, kernels in self.stages:
+            if kind == "lut":
+                image = cv2.LUT(image, self._stage_lut(image, steps))
+            elif kind == "kernel" and len(kernels) > 1:
+                image = self._apply_kernels(image, kernels)
+            else:
+                operation, params = steps[0]
+                image = apply_operation(image, operation, params)
+        return image
+
+    @staticmethod
+    def _stage_lut(image, steps):
+        lut = np.arange(256, dtype=np.uint8)
+        hist = None
+        if any(operation == "Histogram Equalization" for operation, _ in steps):
+            hist = cv2.calcHist([image], [0], None, [256], [0, 256]).ravel()
+        for operation, params in steps:
+            step_lut = POINT_OPERATIONS[operation](hist, **params)
+            lut = step_lut[lut]
+            if hist is not None:
+                # Histogram after this step, so a later equalization sees the right input
+                hist = np.bincount(step_lut, weights=hist, minlength=256)
+        return lut
+
+    @staticmethod
+    def _apply_kernels(image, kernels):
+        separable = [_separate(kernel) for kernel in kernels]
+        if all(parts is not None for parts in separable):
+            column, row = separable[0]
+            for next_column, next_row in separable[1:]:
+                column = np.convolve(column, next_column)
+                row = np.convolve(row, next_row)
+            return cv2.sepFilter2D(image, -1, row.astype(np.float32), column.astype(np.float32))
+        combined = kernels[0].astype(np.float64)
+        for kernel in kernels[1:]:
+            from scipy.signal import convolve2d  # SciPy's signal package alone takes over a second to import
+            combined = convolve2d(combined, kernel)
+        return cv2.filter2D(image, -1, combined.astype(np.float32))
+
+
+def run_pipeline(image, steps, image_key=None):
+    """Run a pipeline, memoized in the enhancement result cache."""
+    pipeline = Pipeline(steps)
+    if image_key is None:
+        image_key = array_hash(image)
+    cache_key = (image_key, "Pipeline", pipeline.key)
+    result = result_cache.get(cache_key)
+    if result is None:
+        result = _freeze(np.asarray(pipeline.run(image)))
+        result_cache.put(cache_key, result)
+    return result
@@ -0,0 +1,84 @@
+"""Low-resolution proxy previews for the enhancement page.
+
+While parameters are being adjusted the chosen operation runs on a downsampled
+proxy with its spatial parameters rescaled, so feedback is near-instant. The
+full-resolution result is then rendered band by band and replaces the preview
+progressively; a new widget interaction interrupts it between bands.
+"""
+import cv2
+import numpy as np
+
+from enhancement import POINT_OPERATIONS, _freeze, apply_operation, decoded_cache, enhance, result_cache, to_uint8
+from tiling import halo_for, iter_tiles
+
+PREVIEW_MAX_SIDE = 768
+FULL_RESOLUTION_BANDS = 4
+
+# Parameters measured in pixels, which shrink with the proxy
+SPATIAL_PARAMS = ("kernel_size",)
+
+
+def needs_preview(image, max_side=PREVIEW_MAX_SIDE):
+    return max(image.shape[:2]) > max_side
+
+
+def proxy_image(image, image_key, max_side=PREVIEW_MAX_SIDE):
+    """Return (proxy, scale) where the proxy's longest side is at most max_side."""
+    scale = min(1.0, max_side / max(image.shape[:2]))
+    if scale == 1.0:
+        return image, scale
+    proxy_key = f"{image_key}:proxy{max_side}"
+    proxy = decoded_cache.get(proxy_key)
+    if proxy is None:
+        size = (max(1, round(image.shape[1] * scale)), max(1, round(image.shape[0] * scale)))
+        proxy = decoded_cache.put(proxy_key, _freeze(cv2.resize(image, size, interpolation=cv2.INTER_AREA)))
+    return proxy, scale
+
+
+def scale_params(params, scale):
+    """Rescale pixel-sized parameters to the proxy, keeping kernel sizes odd and at least 3."""
+    scaled = dict(params)
+    for name in SPATIAL_PARAMS:
+        if name in scaled:
+            size = max(3, int(round(scaled[name] * scale)))
+            scaled[name] = size if size % 2 else size + 1
+    return scaled
+
+
+def preview_enhance(image, image_key, operation, params, max_side=PREVIEW_MAX_SIDE):
+    proxy, scale = proxy_image(image, image_key, max_side)
+    return enhance(proxy, operation, scale_params(params, scale), image_key=f"{image_key}:proxy{max_side}")
+
+
+def cached_full_resolution(image_key, operation, params):
+    return result_cache.get((image_key, operation, tuple(sorted(params.items()))))
+
+
+def iter_full_resolution(image, image_key, operation, params, preview=None, bands=FULL_RESOLUTION_BANDS):
+    """Yield progressively refined uint8 displays, ending with the full-resolution result.
+
+    Tileable operations are computed in horizontal bands (with a halo, so the
+    result matches whole-image processing) and pasted over the upscaled
+    preview; point operations (cheap, and equalization is global) and
+    whole-image operations are computed in one go.
+    """
+    halo = halo_for(operation, params)
+    if halo is None or operation in POINT_OPERATIONS:
+        yield to_uint8(enhance(image, operation, params, image_key=image_key))
+        return
+
+    height, width = image.shape[:2]
+    if preview is not None:
+        canvas = cv2.resize(to_uint8(preview), (width, height), interpolation=cv2.INTER_LINEAR)
+    else:
+        canvas = np.zeros((height, width), dtype=np.uint8)
+    band_height = -(-height // bands)
+    result = None
+    for read, core, out in iter_tiles(image.shape, (band_height, width), halo):
+        band = np.asarray(apply_operation(np.ascontiguousarray(image[read]), operation, params))[core]
+        if result is None:
+            result = np.empty(image.shape[:2], dtype=band.dtype)
+        result[out] = band
+        canvas[out] = to_uint8(band)
+        yield canvas
+    result_cache.put((image_key, operation, tuple(sorted(params.items()))), _freeze(result))
@@ -0,0 +1,102 @@
+"""Display-aware image rendering for Streamlit.
+
+st.image ships whatever it is given and re-encodes it as PNG on every rerun.
+show_image instead normalizes the image to uint8 once, downsamples it to the
+width it is actually displayed at, encodes it as JPEG or WebP, and caches the
+encoded bytes by content hash so unchanged reruns reuse the same payload.
+Full resolution is only encoded when the user asks to download it.
+"""
+import cv2
+import numpy as np
+import streamlit as st
+from PIL import Image as PILImage
+
+from enhancement import LRUByteCache, array_hash, to_uint8
+
+DISPLAY_WIDTH = 1400  # Wide layout on a typical HiDPI screen; larger images are never shown 1:1
+DEFAULT_FORMAT = "jpeg"
+DEFAULT_QUALITY = 85
+ENCODED_CACHE_BYTES = 64 * 1024 * 1024
+
+encoded_cache = LRUByteCache(ENCODED_CACHE_BYTES)
+
+_RESIZABLE_DTYPES = (np.uint8, np.uint16, np.int16, np.float32, np.float64)
+
+_ENCODE_PARAMS = {
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+}
+
+
+def as_display_array(image, width=None):
+    """uint8 grayscale or RGB array for a NumPy array or PIL image, optionally downscaled to width."""
+    if isinstance(image, PILImage.Image):
+        image = image.convert("L" if image.mode in ("1", "L", "I", "I;16", "F") else "RGB")
+    image = np.asarray(image)
+    if image.ndim == 3 and image.shape[2] == 4:
+        image = image[..., :3]
+    if width and image.dtype in _RESIZABLE_DTYPES:
+        # Shrink before normalizing so large 16-bit or float results are never copied at full size
+        image = downscale(image, width)
+    image = to_uint8(image)
+    return downscale(image, width) if width else image
+
+
+def downscale(image, width):
+    if image.shape[1] <= width:
+        return image
+    height = max(1, round(image.shape[0] * width / image.shape[1]))
+    return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def encode(image, fmt=DEFAULT_FORMAT, quality=DEFAULT_QUALITY):
+    extension, quality_flag = _ENCODE_PARAMS[fmt]
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    ok, buffer = cv2.imencode(extension, image, [quality_flag, quality])
+    if not ok:
+        raise ValueError(f"Could not encode image as {fmt}")
+    return buffer.tobytes()
+
+
+def display_bytes(image, image_key=None, width=DISPLAY_WIDTH, fmt=DEFAULT_FORMAT, quality=DEFAULT_QUALITY):
+    """Encoded display payload for image, cached on (content, width, format, quality)."""
+    if image_key is None:
+        image_key = array_hash(np.asarray(image))
+    cache_key = (image_key, width, fmt, quality)
+    payload = encoded_cache.get(cache_key)
+    if payload is None:
+        payload = encode(as_display_array(image, width), fmt, quality)
+        encoded_cache.put(cache_key, payload, nbytes=len(payload))
+    return payload
+
+
+def full_resolution_png(image):
+    array = np.asarray(image)
+    if array.ndim == 2 and array.dtype == np.uint16:
+        array = np.ascontiguousarray(array)  # PNG keeps 16-bit depth
+    else:
+        array = _to_bgr(as_display_array(image))
+    ok, buffer = cv2.imencode(".png", array)
+    return buffer.tobytes()
+
+
+def _to_bgr(image):
+    return cv2.cvtColor(image, cv2.COLOR_RGB2BGR) if image.ndim == 3 else image
+
+
+def show_image(image, caption=None, image_key=None, container=None, width=DISPLAY_WIDTH,
+               fmt=DEFAULT_FORMAT, quality=DEFAULT_QUALITY, download_name=None):
+    """Render image at display resolution; optionally add a full-resolution PNG download."""
+    container = container or st
+    container.image(display_bytes(image, image_key, width, fmt, quality), caption=caption, use_container_width=True)
+    if download_name:
+        # Deferred: the full-resolution PNG is only encoded when the button is clicked
+        st.download_button(
+            "⬇️ Download full resolution",
+            data=lambda: full_resolution_png(image),
+            file_name=download_name,
+            mime="image/png",
+            on_click="ignore",
+            key=f"download_{download_name}",
+        )
@@ -0,0 +1,126 @@
+"""Retrieval-backed, token-budgeted context for the lab report follow-up chat.
+
+The report explanation and the extracted page text are split into chunks and
+indexed in an in-memory Chroma collection. Each follow-up question is then
+sent with only the most relevant chunks and a compacted tail of the
+conversation, each capped by a token budget, so the prompt stays the same
+size however long the chat gets.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from embeddings import embed
+from enhancement import content_hash
+
+RETRIEVED_CHUNKS = int(os.environ.get("DOCSIGHT_CHAT_CHUNKS", "4"))
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("DOCSIGHT_CHAT_CONTEXT_TOKENS", "1200"))
+HISTORY_TOKEN_BUDGET = int(os.environ.get("DOCSIGHT_CHAT_HISTORY_TOKENS", "800"))
+CHUNK_CHARS = 800
+HISTORY_ANSWER_CHARS = 600  # Older answers are clipped to this before they count against the budget
+ASSISTANT_ROLE = "🤖 AI"  # Role of the model's turns in page4's chat history
+MAX_INDEXED_REPORTS = 64
+
+_chroma = None
+_collections = OrderedDict()
+_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English and for Gemini's tokenizer
+    return len(text) // 4 + 1
+
+
+def chunk_text(text, max_chars=CHUNK_CHARS):
+    """Split on blank lines and Markdown headers, packing paragraphs into chunks of up to max_chars."""
+    paragraphs = [part.strip() for part in re.split(r"\n\s*\n|\n(?=#)", text) if part.strip()]
+    chunks = []
+    current = ""
+    for paragraph in paragraphs:
+        while len(paragraph) > max_chars:
+            split = paragraph.rfind("\n", 0, max_chars)
+            split = split if split > 0 else max_chars
+            paragraph_head, paragraph = paragraph[:split].strip(), paragraph[split:].strip()
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph_head)
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _client():
+    global _chroma
+    if _chroma is None:
+        # Chroma is imported with the first chat question, not with the page
+        import chromadb
+        from chromadb.config import Settings
+        _chroma = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+    return _chroma
+
+
+def report_collection(summary, transcripts=()):
+    """Chroma collection indexing a report's explanation and page text, built once per content."""
+    documents = [("summary", chunk) for chunk in chunk_text(summary)]
+    for number, transcript in enumerate(transcripts, start=1):
+        documents.extend((f"page {number}", chunk) for chunk in chunk_text(transcript))
+    name = "report-" + content_hash("\0".join(text for _, text in documents).encode())
+    with _lock:
+        collection = _collections.get(name)
+        if collection is not None:
+            _collections.move_to_end(name)
+            return collection
+        collection = _client().get_or_create_collection(name)
+        if documents:
+            collection.add(
+                ids=[str(index) for index in range(len(documents))],
+                documents=[text for _, text in documents],
+                embeddings=embed([text for _, text in documents]),
+                metadatas=[{"source": source} for source, _ in documents],
+            )
+        _collections[name] = collection
+        while len(_collections) > MAX_INDEXED_REPORTS:
+            evicted, _ = _collections.popitem(last=False)
+            _client().delete_collection(evicted)
+        return collection
+
+
+def retrieve(collection, question, k=RETRIEVED_CHUNKS, token_budget=CONTEXT_TOKEN_BUDGET):
+    """Most relevant chunks for question, best first, within token_budget."""
+    count = collection.count()
+    if not count:
+        return []
+    result = collection.query(query_embeddings=embed([question]), n_results=min(k, count))
+    chunks = []
+    used = 0
+    for text, metadata in zip(result["documents"][0], result["metadatas"][0]):
+        tokens = estimate_tokens(text)
+        if chunks and used + tokens > token_budget:
+            break
+        chunks.append(f"[{metadata['source']}]\n{text}")
+        used += tokens
+    return chunks
+
+
+def compact_history(history, token_budget=HISTORY_TOKEN_BUDGET, answer_chars=HISTORY_ANSWER_CHARS):
+    """The most recent (role, message) turns that fit token_budget, oldest first, with answers clipped.
+
+    Only the assistant's answers are clipped to answer_chars; the user's questions are kept whole.
+    """
+    kept = []
+    used = 0
+    for role, message in reversed(history):
+        if role == ASSISTANT_ROLE and len(message) > answer_chars:
+            message = message[:answer_chars].rsplit(" ", 1)[0] + " …"
+        tokens = estimate_tokens(message)
+        if used + tokens > token_budget:
+            break
+        kept.append((role, message))
+        used += tokens
+    return kept[::-1]
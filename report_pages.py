@@ -0,0 +1,86 @@
+"""Concurrent analysis of multi-page lab reports and prescription photos.
+
+Every page is transcribed by its own agent call, all running concurrently on
+the shared event loop. A semaphore caps the calls in flight per report and a
+process-wide token bucket caps the request rate across sessions. The page
+transcripts are then explained together in one text-only call, so a report
+takes about as long as its slowest page plus that final call. Pages whose
+text is already known (PDF text layers, OCR) skip the vision call entirely.
+"""
+import asyncio
+import os
+from collections import namedtuple
+
+from clients import lease_agent, run_coroutine
+from enhancement import LRUByteCache
+from metrics import record_usage, span
+from model_input import model_image
+from ratelimit import TokenBucket
+
+MAX_CONCURRENT_PAGES = int(os.environ.get("DOCSIGHT_PAGE_CONCURRENCY", "6"))
+REQUESTS_PER_SECOND = float(os.environ.get("DOCSIGHT_REQUESTS_PER_SECOND", "2"))
+REQUEST_BURST = int(os.environ.get("DOCSIGHT_REQUEST_BURST", "6"))
+
+request_bucket = TokenBucket(REQUESTS_PER_SECOND, REQUEST_BURST)
+# Vision transcripts by (model id, page key), for the follow-up chat once the explanation job is done
+transcript_cache = LRUByteCache(16 * 1024 * 1024)
+
+# One page of a report: text is None when only the vision model can read the image.
+# source is "image", "text" (PDF text layer), "ocr" or "vision" (scanned PDF page)
+ReportPage = namedtuple("ReportPage", "key image text source")
+
+PAGE_PROMPT = """
+You are reading one page of a medical lab report or doctor's prescription.
+Transcribe its medical content faithfully, without interpreting it:
+- Every test with its result, unit, reference range and any abnormal flag.
+- Every medication with strength, dose, frequency and duration.
+- Diagnoses, doctor's notes, and the report or prescription date if present.
+Use concise Markdown bullet points in English. If the page has no medical content, reply "No medical content".
+"""
+
+
+def merge_prompt(prompt, transcripts):
+    """Prompt for explaining all pages at once, given the per-page transcripts."""
+    pages = "\n\n".join(f"### Page {index}\n{text}" for index, text in enumerate(transcripts, start=1))
+    return f"""{prompt}
+
+The report has {len(transcripts)} pages. Instead of an image, here is the transcribed content of every page;
+treat them as a single report and combine duplicate entries:
+
+{pages}
+"""
+
+
+async def _transcribe_page(api_key, model_id, image, semaphore):
+    async with semaphore:
+        await request_bucket.acquire_async()
+        with lease_agent(api_key, model_id, markdown=True) as agent:
+            with span("report.transcribe_page"):
+                response = await agent.arun(PAGE_PROMPT, images=[image])
+        record_usage(model_id, getattr(response, "metrics", None))
+        return response.content or ""
+
+
+async def _transcribe_pages(api_key, model_id, images, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*(_transcribe_page(api_key, model_id, image, semaphore) for image in images))
+
+
+def transcribe_pages(api_key, model_id, images, concurrency=MAX_CONCURRENT_PAGES):
+    """Transcripts of every page image, in page order."""
+    return run_coroutine(_transcribe_pages(api_key, model_id, images, concurrency))
+
+
+def transcribe_report(api_key, model_id, pages, concurrency=MAX_CONCURRENT_PAGES):
+    """Transcript of every ReportPage: its recovered text, or a vision transcription of its image."""
+    missing = [page for page in pages if page.text is None and transcript_cache.get((model_id, page.key)) is None]
+    images = [model_image(page.image, page.key, profile="report") for page in missing]
+    for page, transcript in zip(missing, transcribe_pages(api_key, model_id, images, concurrency) if images else []):
+        transcript_cache.put((model_id, page.key), transcript, nbytes=len(transcript))
+    return known_transcripts(model_id, pages)
+
+
+def known_transcripts(model_id, pages):
+    """Transcripts of the pages whose text is known without calling the model."""
+    transcripts = (page.text if page.text is not None else transcript_cache.get((model_id, page.key)) for page in pages)
+    return [transcript for transcript in transcripts if transcript is not None]
@@ -0,0 +1,194 @@
+"""Cached, time-budgeted web search tools for the analysis agents.
+
+The stock DuckDuckGo and Google toolkits run one search at a time inside the
+agent loop with no deadline, so one slow search stalls the whole answer.
+CachedSearchTools gives the agent a single web_search tool that takes several
+queries at once and runs them concurrently. Each query gets a hard latency
+budget, after which whatever is available is returned: a fresh cached result,
+a stale one, or a note that the search timed out. Searches that miss the
+budget keep running in the background and fill the cache for next time.
+
+Results are cached process-wide by (provider, normalized query, result count)
+for CACHE_TTL_SECONDS and kept as stale fallbacks for STALE_SECONDS.
+DOCSIGHT_SEARCH_BACKEND=local (implied by DOCSIGHT_MODEL_BACKEND=mock) swaps
+every provider for a canned offline stand-in.
+"""
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from agno.tools import Toolkit
+
+from metrics import registry, span
+
+SEARCH_BUDGET_SECONDS = float(os.environ.get("DOCSIGHT_SEARCH_BUDGET", "4"))
+CACHE_TTL_SECONDS = float(os.environ.get("DOCSIGHT_SEARCH_TTL", str(6 * 3600)))
+STALE_SECONDS = 7 * 24 * 3600
+MAX_CACHED_QUERIES = 2048
+MAX_QUERIES_PER_CALL = 5
+SEARCH_WORKERS = 8
+
+_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="docsight-search")
+
+
+def _duckduckgo(query, max_results):
+    try:
+        from ddgs import DDGS
+    except ImportError:
+        from duckduckgo_search import DDGS  # Name of the package before its 2025 rename
+    return [
+        {"title": hit.get("title", ""), "url": hit.get("href", ""), "snippet": hit.get("body", "")}
+        for hit in DDGS(timeout=SEARCH_BUDGET_SECONDS * 2).text(query, max_results=max_results)
+    ]
+
+
+def _google(query, max_results):
+    from googlesearch import search
+    return [
+        {"title": hit.title, "url": hit.url, "snippet": hit.description}
+        for hit in search(query, num_results=max_results, advanced=True, timeout=SEARCH_BUDGET_SECONDS * 2)
+    ]
+
+
+def _local(query, max_results):
+    # Offline stand-in: deterministic results shaped like the real ones, with a small delay
+    time.sleep(float(os.environ.get("DOCSIGHT_LOCAL_SEARCH_LATENCY", "0.05")))
+    slug = re.sub(r"\W+", "-", query.lower()).strip("-")
+    return [
+        {"title": f"{query} — reference {rank}", "url": f"https://example.org/{slug}/{rank}",
+         "snippet": f"Simulated search result {rank} for '{query}'."}
+        for rank in range(1, max_results + 1)
+    ]
+
+
+PROVIDERS = {"duckduckgo": _duckduckgo, "google": _google, "local": _local}
+
+
+def normalize_query(query):
+    """Case, punctuation and spacing do not change what a search engine returns."""
+    return " ".join(re.findall(r"[^\W_]+(?:[.'][^\W_]+)*", query.lower()))
+
+
+class SearchCache:
+    def __init__(self, ttl_seconds=CACHE_TTL_SECONDS, stale_seconds=STALE_SECONDS, max_entries=MAX_CACHED_QUERIES):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.timeouts = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, allow_stale=False):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        age = time.time() - entry[0]
+        if age <= self.ttl_seconds or (allow_stale and age <= self.stale_seconds):
+            return entry[1]
+        return None
+
+    def put(self, key, results):
+        with self._lock:
+            self._entries[key] = (time.time(), results)
+            if len(self._entries) > self.max_entries:
+                # Oldest first; dicts keep insertion order and put() re-inserts on refresh
+                for old in list(self._entries)[: len(self._entries) - self.max_entries]:
+                    del self._entries[old]
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "stale_hits": self.stale_hits,
+                "misses": self.misses, "timeouts": self.timeouts}
+
+
+search_cache = SearchCache()
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def _search_future(provider, key, query, max_results):
+    """One background search per key; concurrent callers share it."""
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        if future is not None:
+            return future
+        future = _executor.submit(PROVIDERS[provider], query, max_results)
+        _in_flight[key] = future
+
+    def done(finished):
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+        if finished.exception() is None:
+            search_cache.put(key, finished.result())
+
+    # Registered outside the lock: a search that has already finished runs done() right here
+    future.add_done_callback(done)
+    return future
+
+
+def search_many(queries, provider, max_results=5, budget=SEARCH_BUDGET_SECONDS):
+    """{query: {"results": [...], "source": "cache" | "live" | "stale" | "timeout" | "error"}} within budget seconds."""
+    if os.environ.get("DOCSIGHT_SEARCH_BACKEND") == "local" or os.environ.get("DOCSIGHT_MODEL_BACKEND") == "mock":
+        provider = "local"
+    answers = {}
+    pending = {}
+    for query in queries[:MAX_QUERIES_PER_CALL]:
+        key = (provider, normalize_query(query), max_results)
+        cached = search_cache.get(key)
+        if cached is not None:
+            search_cache.hits += 1
+            answers[query] = {"results": cached, "source": "cache"}
+        else:
+            search_cache.misses += 1
+            pending[query] = (key, _search_future(provider, key, query, max_results))
+
+    # One shared deadline: the whole call never takes longer than the budget
+    wait([future for _, future in pending.values()], timeout=budget)
+    for query, (key, future) in pending.items():
+        if future.done() and future.exception() is None:
+            answers[query] = {"results": future.result(), "source": "live"}
+            continue
+        stale = search_cache.get(key, allow_stale=True)
+        if stale is not None:
+            search_cache.stale_hits += 1
+            answers[query] = {"results": stale, "source": "stale"}
+        elif future.done():
+            answers[query] = {"results": [], "source": "error", "error": str(future.exception())}
+        else:
+            search_cache.timeouts += 1
+            answers[query] = {"results": [], "source": "timeout"}
+    return answers
+
+
+class CachedSearchTools(Toolkit):
+    """A web_search tool over one provider, with concurrent queries, caching and a latency budget."""
+
+    def __init__(self, provider="duckduckgo", max_results=5, budget=SEARCH_BUDGET_SECONDS, **kwargs):
+        self.provider = provider
+        self.max_results = max_results
+        self.budget = budget
+        super().__init__(name=f"{provider}_search", tools=[self.web_search], **kwargs)
+
+    def web_search(self, queries: list[str]) -> str:
+        """Search the web for up to five queries at once; send all related queries in one call.
+
+        Args:
+            queries: Search queries, for example ["pneumonia chest x-ray findings", "pneumonia treatment guidelines"].
+
+        Returns:
+            JSON mapping each query to its results (title, url, snippet). Queries that exceed the
+            time budget return cached results if available, otherwise an empty list.
+        """
+        if isinstance(queries, str):
+            queries = [queries]
+        with span(f"tool.{self.name}"):
+            answers = search_many(queries, self.provider, self.max_results, self.budget)
+        for answer in answers.values():
+            registry.increment("docsight_search_queries_total", provider=self.provider, source=answer["source"])
+        return json.dumps(answers)
@@ -0,0 +1,282 @@
+"""Local symptom-to-condition index for instant triage.
+
+Free-text symptoms are normalized to canonical symptoms through a synonym
+table, then scored against every condition at once with one sparse
+matrix-vector product. Red-flag rules and age adjust the computed risk level.
+The whole thing runs in well under a millisecond, so the symptom checker can
+show a triage result immediately and hand the model a shortlist instead of a
+blank slate, or skip the model entirely.
+
+This is a screening aid built from common textbook presentations, not a
+diagnostic tool; the UI keeps the "consult a professional" framing.
+"""
+import re
+from functools import lru_cache
+
+import numpy as np
+
+RISK_LEVELS = ("Low", "Moderate", "High", "Emergency")
+
+# Canonical symptom -> phrases users write for it
+SYNONYMS = {
+    "fever": ["fever", "high temperature", "temperature", "pyrexia", "feverish", "chills", "shivering"],
+    "cough": ["cough", "coughing", "dry cough", "wet cough"],
+    "productive cough": ["productive cough", "coughing up phlegm", "phlegm", "mucus", "sputum"],
+    "coughing blood": ["coughing blood", "coughing up blood", "blood in sputum", "hemoptysis", "haemoptysis"],
+    "sore throat": ["sore throat", "throat pain", "painful swallowing", "scratchy throat"],
+    "runny nose": ["runny nose", "stuffy nose", "blocked nose", "nasal congestion", "congestion", "sneezing"],
+    "headache": ["headache", "head ache", "head pain", "migraine"],
+    "severe headache": ["severe headache", "worst headache", "thunderclap headache", "sudden headache"],
+    "stiff neck": ["stiff neck", "neck stiffness"],
+    "fatigue": ["fatigue", "tired", "tiredness", "exhaustion", "exhausted", "weakness", "lethargy", "low energy"],
+    "body aches": ["body aches", "body ache", "muscle aches", "muscle pain", "myalgia", "aching"],
+    "shortness of breath": ["shortness of breath", "short of breath", "breathlessness", "breathless",
+                            "difficulty breathing", "trouble breathing", "dyspnea", "dyspnoea"],
+    "wheezing": ["wheezing", "wheeze"],
+    "chest pain": ["chest pain", "chest tightness", "chest pressure", "tight chest", "pain in chest"],
+    "palpitations": ["palpitations", "racing heart", "heart racing", "pounding heart", "irregular heartbeat"],
+    "dizziness": ["dizziness", "dizzy", "lightheaded", "light headed", "vertigo"],
+    "fainting": ["fainting", "fainted", "passed out", "blackout", "loss of consciousness", "syncope"],
+    "nausea": ["nausea", "nauseous", "queasy", "feeling sick"],
+    "vomiting": ["vomiting", "vomit", "throwing up", "threw up"],
+    "vomiting blood": ["vomiting blood", "blood in vomit", "hematemesis"],
+    "diarrhea": ["diarrhea", "diarrhoea", "loose stools", "watery stools"],
+    "constipation": ["constipation", "constipated"],
+    "abdominal pain": ["abdominal pain", "stomach pain", "stomach ache", "stomachache", "belly pain", "tummy pain",
+                       "cramps", "abdominal cramps"],
+    "severe abdominal pain": ["severe abdominal pain", "severe stomach pain", "sharp abdominal pain"],
+    "lower right abdominal pain": ["lower right abdominal pain", "right lower quadrant pain", "pain lower right"],
+    "blood in stool": ["blood in stool", "bloody stool", "black stool", "rectal bleeding", "melena"],
+    "heartburn": ["heartburn", "acid reflux", "indigestion", "burning in chest"],
+    "loss of appetite": ["loss of appetite", "no appetite", "not eating"],
+    "painful urination": ["painful urination", "burning urination", "burning when peeing", "dysuria"],
+    "frequent urination": ["frequent urination", "urinating often", "peeing a lot", "urgency"],
+    "excessive thirst": ["excessive thirst", "always thirsty", "very thirsty", "polydipsia"],
+    "back pain": ["back pain", "backache", "lower back pain"],
+    "flank pain": ["flank pain", "side pain", "kidney pain"],
+    "joint pain": ["joint pain", "painful joints", "arthralgia", "swollen joints"],
+    "rash": ["rash", "skin rash", "hives", "red spots", "itchy skin", "itching"],
+    "swelling of face or lips": ["swelling of face", "swollen lips", "swollen face", "swollen tongue", "lip swelling"],
+    "leg swelling": ["leg swelling", "swollen legs", "swollen ankles", "ankle swelling", "edema", "oedema"],
+    "calf pain": ["calf pain", "painful calf", "leg pain"],
+    "weight loss": ["weight loss", "losing weight", "unintentional weight loss"],
+    "night sweats": ["night sweats", "sweating at night"],
+    "confusion": ["confusion", "confused", "disoriented", "disorientation"],
+    "one-sided weakness": ["one-sided weakness", "weakness on one side", "numbness on one side", "arm weakness",
+                           "facial droop", "face drooping"],
+    "slurred speech": ["slurred speech", "difficulty speaking", "trouble speaking"],
+    "vision changes": ["vision changes", "blurred vision", "blurry vision", "double vision", "loss of vision"],
+    "ear pain": ["ear pain", "earache", "ear ache"],
+    "sinus pressure": ["sinus pressure", "sinus pain", "facial pain", "facial pressure"],
+    "loss of smell or taste": ["loss of smell", "loss of taste", "can't smell", "cannot smell"],
+    "anxiety": ["anxiety", "anxious", "panic", "nervousness", "worry"],
+    "low mood": ["low mood", "depressed", "depression", "sadness", "hopeless", "hopelessness"],
+    "suicidal thoughts": ["suicidal thoughts", "suicidal", "thoughts of self harm", "self harm", "want to die"],
+    "insomnia": ["insomnia", "can't sleep", "cannot sleep", "trouble sleeping", "sleeplessness"],
+    "sensitivity to light": ["sensitivity to light", "light sensitivity", "photophobia"],
+    "jaundice": ["jaundice", "yellow skin", "yellow eyes"],
+    "pale skin": ["pale skin", "pallor", "pale"],
+}
+
+# Condition -> (symptom weights, baseline risk level index into RISK_LEVELS)
+CONDITIONS = {
+    "Common cold": ({"runny nose": 3, "sore throat": 2, "cough": 2, "headache": 1, "fatigue": 1, "fever": 1}, 0),
+    "Influenza": ({"fever": 3, "body aches": 3, "fatigue": 2, "cough": 2, "headache": 2, "sore throat": 1}, 1),
+    "COVID-19": ({"fever": 2, "cough": 2, "fatigue": 2, "loss of smell or taste": 4, "shortness of breath": 2,
+                  "body aches": 1, "sore throat": 1}, 1),
+    "Strep throat": ({"sore throat": 4, "fever": 2, "headache": 1, "loss of appetite": 1}, 1),
+    "Sinusitis": ({"sinus pressure": 4, "runny nose": 2, "headache": 2, "fever": 1, "cough": 1}, 0),
+    "Ear infection": ({"ear pain": 4, "fever": 2, "headache": 1}, 0),
+    "Bronchitis": ({"productive cough": 4, "cough": 3, "fatigue": 1, "wheezing": 1, "chest pain": 1, "fever": 1}, 1),
+    "Pneumonia": ({"productive cough": 3, "fever": 3, "shortness of breath": 3, "chest pain": 2, "fatigue": 1,
+                   "confusion": 1}, 2),
+    "Asthma flare": ({"wheezing": 4, "shortness of breath": 3, "cough": 2, "chest pain": 1}, 1),
+    "Migraine": ({"headache": 3, "severe headache": 2, "nausea": 2, "sensitivity to light": 3, "vision changes": 2,
+                  "vomiting": 1}, 0),
+    "Tension headache": ({"headache": 4, "fatigue": 1, "insomnia": 1, "anxiety": 1}, 0),
+    "Meningitis": ({"severe headache": 3, "stiff neck": 4, "fever": 3, "sensitivity to light": 2, "confusion": 2,
+                    "vomiting": 1, "rash": 1}, 3),
+    "Gastroenteritis": ({"diarrhea": 4, "vomiting": 3, "nausea": 3, "abdominal pain": 2, "fever": 1}, 0),
+    "Food poisoning": ({"vomiting": 3, "diarrhea": 3, "nausea": 3, "abdominal pain": 2}, 0),
+    "Gastroesophageal reflux": ({"heartburn": 4, "chest pain": 1, "nausea": 1, "cough": 1}, 0),
+    "Appendicitis": ({"lower right abdominal pain": 5, "abdominal pain": 2, "fever": 2, "nausea": 2, "vomiting": 1,
+                      "loss of appetite": 2}, 2),
+    "Irritable bowel syndrome": ({"abdominal pain": 3, "diarrhea": 2, "constipation": 2}, 0),
+    "Urinary tract infection": ({"painful urination": 5, "frequent urination": 3, "abdominal pain": 1, "fever": 1}, 0),
+    "Kidney infection": ({"flank pain": 4, "fever": 3, "painful urination": 2, "nausea": 1, "vomiting": 1,
+                          "back pain": 1}, 2),
+    "Kidney stones": ({"flank pain": 5, "abdominal pain": 2, "nausea": 2, "vomiting": 1, "painful urination": 1}, 1),
+    "Type 2 diabetes": ({"excessive thirst": 4, "frequent urination": 4, "fatigue": 2, "vision changes": 1,
+                         "weight loss": 1}, 1),
+    "Anemia": ({"fatigue": 3, "pale skin": 3, "dizziness": 2, "shortness of breath": 1, "palpitations": 1}, 1),
+    "Hypertension": ({"headache": 1, "dizziness": 1, "vision changes": 1, "chest pain": 1}, 1),
+    "Heart attack": ({"chest pain": 5, "shortness of breath": 3, "nausea": 1, "dizziness": 1, "fainting": 1,
+                      "palpitations": 1}, 3),
+    "Heart failure": ({"shortness of breath": 3, "leg swelling": 4, "fatigue": 2, "cough": 1}, 2),
+    "Arrhythmia": ({"palpitations": 5, "dizziness": 2, "fainting": 2, "shortness of breath": 1, "chest pain": 1}, 2),
+    "Deep vein thrombosis": ({"calf pain": 4, "leg swelling": 4}, 2),
+    "Pulmonary embolism": ({"shortness of breath": 4, "chest pain": 3, "calf pain": 2, "coughing blood": 2,
+                            "palpitations": 1}, 3),
+    "Stroke": ({"one-sided weakness": 5, "slurred speech": 5, "confusion": 2, "vision changes": 2,
+                "severe headache": 2, "dizziness": 1}, 3),
+    "Allergic reaction": ({"rash": 3, "swelling of face or lips": 4, "shortness of breath": 2, "wheezing": 2}, 2),
+    "Viral rash illness": ({"rash": 4, "fever": 2, "fatigue": 1, "joint pain": 1}, 0),
+    "Arthritis": ({"joint pain": 5, "fatigue": 1}, 0),
+    "Muscle strain": ({"back pain": 4, "body aches": 2}, 0),
+    "Hepatitis": ({"jaundice": 5, "fatigue": 2, "abdominal pain": 2, "nausea": 2, "loss of appetite": 1}, 2),
+    "Tuberculosis": ({"productive cough": 3, "coughing blood": 3, "night sweats": 3, "weight loss": 3, "fever": 2}, 2),
+    "Gastrointestinal bleeding": ({"blood in stool": 5, "vomiting blood": 5, "dizziness": 1, "fatigue": 1,
+                                   "pale skin": 1}, 3),
+    "Anxiety disorder": ({"anxiety": 4, "palpitations": 2, "insomnia": 2, "dizziness": 1, "chest pain": 1}, 0),
+    "Depression": ({"low mood": 5, "insomnia": 2, "fatigue": 2, "loss of appetite": 1, "suicidal thoughts": 2}, 1),
+}
+
+# (all of these symptoms, minimum age or None, risk level, message)
+RED_FLAGS = [
+    (("suicidal thoughts",), None, 3, "Thoughts of self-harm: contact emergency services or a crisis line now."),
+    (("chest pain", "shortness of breath"), None, 3, "Chest pain with breathlessness needs emergency assessment."),
+    (("one-sided weakness",), None, 3, "One-sided weakness can be a stroke: call emergency services immediately."),
+    (("slurred speech",), None, 3, "Sudden speech difficulty can be a stroke: call emergency services immediately."),
+    (("stiff neck", "fever"), None, 3, "Fever with a stiff neck needs urgent assessment for meningitis."),
+    (("swelling of face or lips", "shortness of breath"), None, 3,
+     "Facial swelling with breathing difficulty can be anaphylaxis: call emergency services."),
+    (("severe headache",), None, 2, "A sudden or worst-ever headache should be assessed urgently."),
+    (("chest pain",), 40, 2, "Chest pain over age 40 should be assessed promptly."),
+    (("shortness of breath",), None, 2, "Difficulty breathing should be assessed promptly."),
+    (("coughing blood",), None, 2, "Coughing up blood should be assessed promptly."),
+    (("vomiting blood",), None, 3, "Vomiting blood needs emergency assessment."),
+    (("blood in stool",), None, 2, "Blood in the stool should be assessed promptly."),
+    (("fainting",), None, 2, "Fainting should be assessed promptly."),
+    (("confusion",), None, 2, "New confusion should be assessed promptly."),
+    (("severe abdominal pain",), None, 2, "Severe abdominal pain should be assessed promptly."),
+    (("lower right abdominal pain", "fever"), None, 2, "Right-sided abdominal pain with fever can be appendicitis."),
+    (("calf pain", "leg swelling"), None, 2, "A painful swollen leg can be a blood clot and should be checked promptly."),
+    (("jaundice",), None, 2, "Yellowing of the skin or eyes should be assessed promptly."),
+]
+
+_NEGATION = re.compile(r"\b(no|not|without|denies|never|neither)\s+(\w+\s+)?$")
+# "no chest pain or shortness of breath": the negation runs on through an or/nor list
+_NEGATED_LIST = re.compile(r"\b(no|not|without|denies|never|neither|nor)\b[\w\s'-]*\b(or|nor)\s+$")
+# A negation only covers its own clause: "no fever, chest pain" still reports chest pain
+_CLAUSE_BREAK = re.compile(r"[,;.!?:()\n]|\b(?:but|and)\b")
+
+
+class SymptomIndex:
+    """Condition x symptom weights as a CSR matrix, with the synonym matcher and red-flag rules compiled."""
+
+    def __init__(self, synonyms=SYNONYMS, conditions=CONDITIONS, red_flags=RED_FLAGS):
+        self.symptoms = sorted(synonyms)
+        self.column = {symptom: index for index, symptom in enumerate(self.symptoms)}
+        self.conditions = list(conditions)
+        self.baseline_risk = np.array([risk for _, risk in conditions.values()], dtype=np.int8)
+
+        phrases = {phrase: symptom for symptom, names in synonyms.items() for phrase in names}
+        self._phrase_to_symptom = phrases
+        # Longest phrases first so "severe abdominal pain" wins over "abdominal pain"
+        alternation = "|".join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True))
+        self._matcher = re.compile(rf"\b({alternation})\b")
+
+        from scipy import sparse
+
+        rows, cols, weights = [], [], []
+        for row, (symptom_weights, _) in enumerate(conditions.values()):
+            for symptom, weight in symptom_weights.items():
+                rows.append(row)
+                cols.append(self.column[symptom])
+                weights.append(weight)
+        matrix = sparse.csr_matrix(
+            (np.asarray(weights, dtype=np.float32), (rows, cols)), shape=(len(self.conditions), len(self.symptoms))
+        )
+        # Row-normalized, so matrix @ x is the fraction of a condition's presentation that is present
+        self.weights = sparse.diags(1 / np.asarray(matrix.sum(axis=1)).ravel()).dot(matrix).tocsr().astype(np.float32)
+        self.present = (matrix > 0).astype(np.float32).tocsr()
+
+        self.red_flag_rules = sparse.csr_matrix(
+            ([1.0] * sum(len(rule[0]) for rule in red_flags),
+             ([index for index, rule in enumerate(red_flags) for _ in rule[0]],
+              [self.column[symptom] for rule in red_flags for symptom in rule[0]])),
+            shape=(len(red_flags), len(self.symptoms)), dtype=np.float32,
+        )
+        self.red_flag_sizes = np.array([len(rule[0]) for rule in red_flags], dtype=np.float32)
+        self.red_flag_min_age = np.array([rule[1] or 0 for rule in red_flags])
+        self.red_flag_risk = np.array([rule[2] for rule in red_flags], dtype=np.int8)
+        self.red_flag_messages = [rule[3] for rule in red_flags]
+
+    def normalize(self, text):
+        """Canonical symptoms mentioned in free text, skipping negated mentions ("no fever")."""
+        found = []
+        for clause in _CLAUSE_BREAK.split(text.lower()):
+            clause = re.sub(r"[^\w\s'-]", " ", clause)
+            clause = re.sub(r"\s+", " ", clause)
+            for match in self._matcher.finditer(clause):
+                before = clause[:match.start()]
+                if _NEGATION.search(before) or _NEGATED_LIST.search(before):
+                    continue
+                symptom = self._phrase_to_symptom[match.group(1)]
+                if symptom not in found:
+                    found.append(symptom)
+        return found
+
+    def vector(self, symptoms):
+        x = np.zeros(len(self.symptoms), dtype=np.float32)
+        x[[self.column[symptom] for symptom in symptoms]] = 1
+        return x
+
+    def triage(self, text, age=None, top=5):
+        symptoms = self.normalize(text)
+        if not symptoms:
+            return Triage(symptoms, [], RISK_LEVELS[0], [], matched=False)
+        x = self.vector(symptoms)
+
+        coverage = self.weights @ x                         # Share of each condition's presentation present
+        precision = (self.present @ x) / len(symptoms)      # Share of the user's symptoms each condition explains
+        scores = 2 * coverage * precision / np.maximum(coverage + precision, 1e-9)
+        ranked = np.argsort(-scores)[:top]
+        candidates = [(self.conditions[i], float(scores[i])) for i in ranked if scores[i] > 0]
+
+        # Age-gated red flags still fire when no age was given
+        fired = (self.red_flag_rules @ x >= self.red_flag_sizes) & (self.red_flag_min_age <= (120 if age is None else age))
+        risk = int(self.red_flag_risk[fired].max()) if fired.any() else 0
+        # Good matches raise the level to their condition's baseline, fair matches to one step below it
+        likely = scores >= 0.4
+        if likely.any():
+            levels = self.baseline_risk[likely] - (scores[likely] < 0.6)
+            risk = max(risk, int(levels.max()))
+        if age is not None and (age >= 65 or age < 2) and risk < 2 and len(symptoms) >= 2:
+            risk += 1
+        flags = [self.red_flag_messages[i] for i in np.flatnonzero(fired)]
+        return Triage(symptoms, candidates, RISK_LEVELS[risk], flags, matched=True)
+
+
+class Triage:
+    def __init__(self, symptoms, candidates, risk_level, red_flags, matched):
+        self.symptoms = symptoms
+        self.candidates = candidates
+        self.risk_level = risk_level
+        self.red_flags = red_flags
+        self.matched = matched
+
+    def shortlist_markdown(self):
+        if not self.matched:
+            return "No recognized symptoms. Try common terms such as *fever, cough, headache*."
+        lines = [f"**Recognized symptoms:** {', '.join(self.symptoms)}", ""]
+        lines += [f"{rank}. {name} — match {score:.0%}" for rank, (name, score) in enumerate(self.candidates, start=1)]
+        return "\n".join(lines)
+
+    def model_context(self):
+        """Shortlist text for the model prompt."""
+        if not self.matched:
+            return ""
+        candidates = "; ".join(f"{name} ({score:.0%})" for name, score in self.candidates)
+        flags = " ".join(self.red_flags) or "none"
+        return (f"Local triage (rule-based, may be incomplete): recognized symptoms: {', '.join(self.symptoms)}. "
+                f"Candidate conditions: {candidates}. Computed risk level: {self.risk_level}. Red flags: {flags}")
+
+
+@lru_cache(maxsize=1)
+def symptom_index():
+    return SymptomIndex()
+
+
+def triage(text, age=None, top=5):
+    return symptom_index().triage(text, age, top)
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def mock_backend(monkeypatch):
+    """Route agents to an instant mock model and give the test its own agent pool."""
+    import clients
+    import mock_model
+
+    monkeypatch.setenv("DOCSIGHT_MODEL_BACKEND", "mock")
+    monkeypatch.setenv("DOCSIGHT_MOCK_LATENCY", "fixed:0")
+    monkeypatch.setenv("DOCSIGHT_MOCK_TOKENS_PER_SECOND", "1000000")
+    monkeypatch.setattr(mock_model, "_shared_behaviour", mock_model.MockBehaviour())
+    monkeypatch.setattr(clients, "agent_pool", clients.ResourcePool())
+    return clients.agent_pool
@@ -0,0 +1,64 @@
+import pytest
+
+import analysis_cache
+from analysis_cache import AnalysisCache, analysis_key, cache_stream
+
+
+def test_keys_change_with_prompt_model_and_variant():
+    key = analysis_key("image", "Describe the scan", "gemini-2.0-flash", "en")
+    assert key == analysis_key("image", "Describe the scan", "gemini-2.0-flash", "en")
+    assert key != analysis_key("image", "Describe the scan.", "gemini-2.0-flash", "en")
+    assert key != analysis_key("image", "Describe the scan", "gemini-1.5-flash", "en")
+    assert key != analysis_key("image", "Describe the scan", "gemini-2.0-flash", "de")
+    assert key != analysis_key("other", "Describe the scan", "gemini-2.0-flash", "en")
+
+
+def test_entries_survive_a_new_connection(tmp_path):
+    path = str(tmp_path / "cache" / "analyses.sqlite3")
+    AnalysisCache(path).put("key", "answer")
+    cache = AnalysisCache(path)
+    assert cache.get("key") == "answer"
+    assert cache.get("missing") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_expired_entries_are_not_served():
+    cache = AnalysisCache(":memory:", ttl_seconds=-1)
+    cache.put("key", "answer")
+    assert cache.get("key") is None
+
+
+def test_least_recently_used_entries_are_evicted_over_budget():
+    cache = AnalysisCache(":memory:", max_bytes=10)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    cache.get("a")
+    cache.put("c", "cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa" and cache.get("c") == "cccc"
+    assert cache.stats()["bytes"] <= 10
+
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    cache = AnalysisCache(":memory:")
+    monkeypatch.setattr(analysis_cache, "analysis_cache", cache)
+    return cache
+
+
+def test_streams_are_stored_only_once_complete(memory_cache):
+    stream = cache_stream("key", iter(["Hello", " world"]))
+    assert next(stream) == "Hello"
+    assert memory_cache.get("key") is None
+    assert "".join(stream) == " world"
+    assert memory_cache.get("key") == "Hello world"
+
+
+def test_failed_streams_are_not_stored(memory_cache):
+    def failing():
+        yield "partial"
+        raise RuntimeError("model error")
+
+    with pytest.raises(RuntimeError):
+        list(cache_stream("key", failing()))
+    assert memory_cache.get("key") is None
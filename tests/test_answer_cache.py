@@ -0,0 +1,41 @@
+import pytest
+
+from answer_cache import SemanticAnswerCache
+
+
+@pytest.mark.parametrize("first, second", [
+    ("My blood sugar of 180, is that bad?", "My blood sugar of 80, is that bad?"),
+    ("Do I need to go to the hospital right now?", "Do I not need to go to the hospital right now?"),
+    ("Should I see a doctor?", "Should I not see a doctor?"),
+    ("Should I see a doctor?", "Shouldn't I see a doctor?"),
+    ("Is this serious?", "Is this not serious?"),
+    ("Can I take ibuprofen for the headache while on my blood pressure medication?",
+     "Can I take paracetamol for the headache while on my blood pressure medication?"),
+    ("Should I keep taking my metformin before the follow-up blood test next week?",
+     "Should I keep taking my lisinopril before the follow-up blood test next week?"),
+    ("What do elevated liver enzymes in my report mean?", "What do low liver enzymes in my report mean?"),
+    ("Is aspirin safer than ibuprofen for me?", "Is ibuprofen safer than aspirin for me?"),
+])
+def test_different_meaning_is_a_miss(first, second):
+    cache = SemanticAnswerCache()
+    cache.store("report", first, "answer")
+    assert cache.lookup("report", second) is None
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Is this serious?", "is it serious"),
+    ("Should I see a doctor?", "should I go see a doctor"),
+    ("What does a sugar of 180 mean?", "what does sugar of 180 mean"),
+    ("Is my creatinine level serious?", "is my creatinine serious"),
+])
+def test_paraphrase_is_a_hit(first, second):
+    cache = SemanticAnswerCache()
+    cache.store("report", first, "answer")
+    hit = cache.lookup("report", second)
+    assert hit is not None and hit[0] == "answer"
+
+
+def test_contexts_are_separate():
+    cache = SemanticAnswerCache()
+    cache.store("report-a", "Is this serious?", "answer")
+    assert cache.lookup("report-b", "Is this serious?") is None
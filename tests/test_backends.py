@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+import backends
+
+CASES = [
+    (operation, backend, dtype, side)
+    for operation, implementations in backends.REGISTRY.items()
+    for backend in implementations
+    for dtype in (np.uint8, np.uint16)
+    for side in (64, 257)
+]
+
+
+@pytest.mark.parametrize("operation, backend, dtype, side", CASES)
+def test_backend_matches_reference(operation, backend, dtype, side):
+    image = backends._synthetic_image(side, dtype)
+    reference_function = backends.REGISTRY[operation][backends.REFERENCE[operation]][0]
+    function, supports, tolerance = backends.REGISTRY[operation][backend]
+    for params in backends._sample_params(operation):
+        if not supports(image, params):
+            continue
+        result = function(image, **params)
+        assert backends.equivalent(result, reference_function(image, **params), tolerance), params
+
+
+def test_verify_reports_no_mismatches():
+    assert backends.verify() == []
+
+
+def _recording_calibrate(timed):
+    def calibrate(operation, image, params, repeats=3):
+        timed.append(image)
+        return backends.REFERENCE[operation], {}
+    return calibrate
+
+
+@pytest.fixture
+def no_pins(monkeypatch):
+    monkeypatch.delenv("DOCSIGHT_BACKEND", raising=False)
+    monkeypatch.delenv("DOCSIGHT_BACKEND_GAUSSIAN", raising=False)
+    monkeypatch.setattr(backends, "_nearest", {})
+
+
+@pytest.mark.parametrize("shape", [(100, 100), (3000, 4000), (600, 800, 3)])
+def test_first_use_times_a_small_crop_and_keys_it_by_the_crop(shape, monkeypatch, no_pins):
+    timed = []
+    monkeypatch.setattr(backends, "calibrate", _recording_calibrate(timed))
+    monkeypatch.setattr(backends, "_choices", {})
+    image = np.zeros(shape, np.uint8)
+    backends.dispatch("gaussian", image, kernel_size=3)
+    backends.dispatch("gaussian", image, kernel_size=3)
+    assert len(timed) == 1
+    assert max(timed[0].shape[:2]) <= backends.FIRST_USE_SAMPLE
+    assert list(backends._choices) == [backends._key("gaussian", timed[0], {"kernel_size": 3})]
+
+
+def test_calibrated_parameters_use_the_nearest_measured_bucket(monkeypatch, no_pins):
+    timed = []
+    monkeypatch.setattr(backends, "calibrate", _recording_calibrate(timed))
+    small, large = np.zeros((256, 256), np.uint8), np.zeros((2048, 2048), np.uint8)
+    monkeypatch.setattr(backends, "_choices", {
+        backends._key("gaussian", small, {"kernel_size": 3}): "scipy",
+        backends._key("gaussian", large, {"kernel_size": 3}): "opencv",
+    })
+    assert backends._nearest_choice(backends._key("gaussian", np.zeros((3000, 4000), np.uint8), {"kernel_size": 3})) == "opencv"
+    assert backends._nearest_choice(backends._key("gaussian", np.zeros((300, 300), np.uint8), {"kernel_size": 3})) == "scipy"
+    backends.dispatch("gaussian", np.zeros((1500, 1500), np.uint8), kernel_size=3)
+    assert timed == []
+
+
+def test_calibration_file_covers_page1_parameters():
+    for operation in backends.REGISTRY:
+        for dtype in (np.uint8, np.uint16):
+            for params in backends._sample_params(operation):
+                key = backends._key(operation, np.zeros((1024, 1024), dtype), params)
+                assert key in backends._choices, key
@@ -0,0 +1,48 @@
+import os
+
+import cv2
+import numpy as np
+
+from batch import find_inputs, main, parse_param, run_batch
+from enhancement import image_inversion
+
+
+def _write_images(root, names):
+    for index, name in enumerate(names):
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        cv2.imwrite(str(path), np.full((16, 16), index * 40, np.uint8))
+
+
+def test_parse_param_evaluates_literals_and_keeps_strings():
+    assert parse_param("kernel_size=5") == ("kernel_size", 5)
+    assert parse_param("method=Canny") == ("method", "Canny")
+
+
+def test_glob_outputs_mirror_the_layout_below_the_wildcard(tmp_path):
+    _write_images(tmp_path, ["a.png", "nested/b.png"])
+    (tmp_path / "notes.txt").write_text("skip me")
+    pattern = os.path.join(str(tmp_path), "**", "*")
+    assert sorted(relative for _, relative in find_inputs(pattern)) == ["a.png", os.path.join("nested", "b.png")]
+
+
+def test_run_batch_writes_outputs_and_resumes(tmp_path):
+    source, output = tmp_path / "in", tmp_path / "out"
+    _write_images(source, ["a.png", "nested/b.jpg"])
+    stats = run_batch(str(source), str(output), "Image Inversion", {}, workers=2)
+    assert (stats["processed"], stats["skipped"], stats["failed"]) == (2, 0, 0)
+    original = cv2.imread(str(source / "a.png"), cv2.IMREAD_GRAYSCALE)
+    np.testing.assert_array_equal(cv2.imread(str(output / "a.png"), cv2.IMREAD_GRAYSCALE), image_inversion(original))
+    assert (output / "nested" / "b.png").exists()
+
+    stats = run_batch(str(source), str(output), "Image Inversion", {}, workers=2)
+    assert (stats["processed"], stats["skipped"]) == (0, 2)
+
+
+def test_unreadable_files_fail_without_stopping_the_batch(tmp_path):
+    source, output = tmp_path / "in", tmp_path / "out"
+    _write_images(source, ["a.png"])
+    (source / "broken.png").write_bytes(b"not an image")
+    assert main([str(source), str(output), "--operation", "Image Inversion", "--workers", "1"]) == 1
+    assert (output / "a.png").exists()
+    assert not list(output.glob("*.tmp.png"))
@@ -0,0 +1,33 @@
+import json
+
+import numpy as np
+
+from benchmark import compare, main, synthetic_image
+
+
+def test_synthetic_images_are_deterministic():
+    np.testing.assert_array_equal(synthetic_image(128), synthetic_image(128))
+    assert synthetic_image(128).dtype == np.uint8
+
+
+def test_compare_flags_slowdowns_and_memory_growth_over_threshold():
+    baseline = {"a@512": {"seconds": 1.0, "peak_bytes": 100}, "b@512": {"seconds": 1.0, "peak_bytes": 100}}
+    results = {
+        "a@512": {"seconds": 1.2, "peak_bytes": 200},
+        "b@512": {"seconds": 1.5, "peak_bytes": 110},
+        "new@512": {"seconds": 9.0, "peak_bytes": 900},
+    }
+    regressions = compare(results, baseline, 0.25, 0.25)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("a@512: peak") and regressions[1].startswith("b@512:")
+
+
+def test_baseline_round_trip(tmp_path, capsys):
+    path = str(tmp_path / "baseline.json")
+    arguments = ["--sizes", "64", "--repeats", "1", "--cases", "invert", "median_k3", "--baseline", path]
+    assert main(arguments + ["--update-baseline"]) == 0
+    with open(path) as f:
+        assert sorted(json.load(f)["results"]) == ["invert@64", "median_k3@64"]
+    # A huge threshold keeps timing noise on a loaded machine from failing the check
+    assert main(arguments + ["--threshold", "1000", "--memory-threshold", "1000"]) == 0
+    assert main(["--sizes", "64", "--cases", "invert", "--baseline", str(tmp_path / "missing.json")]) == 2
@@ -0,0 +1,83 @@
+import threading
+
+import mock_model
+from clients import ResourcePool, key_fingerprint, lease_agent, stream_agent
+from metrics import registry
+
+
+def test_pool_reuses_released_resources_per_key():
+    pool = ResourcePool()
+    with pool.lease("a", object) as first:
+        pass
+    with pool.lease("a", object) as second:
+        assert second is first
+        with pool.lease("a", object) as concurrent:
+            assert concurrent is not first
+    with pool.lease("b", object) as other:
+        assert other is not first
+    assert (pool.created, pool.reused) == (3, 1)
+
+
+def test_pool_drops_idle_entries_and_caps_idle_per_key():
+    pool = ResourcePool(idle_seconds=0, max_idle_per_key=1)
+    pool.release("a", object())
+    pool.release("a", object())
+    assert len(pool) == 1
+    pool.acquire("a", object)
+    assert pool.created == 1 and len(pool) == 0
+
+
+def test_key_fingerprint_hides_the_key():
+    fingerprint = key_fingerprint("secret-api-key")
+    assert fingerprint == key_fingerprint("secret-api-key") and "secret" not in fingerprint
+
+
+def test_agents_are_pooled_per_key_model_and_tools(mock_backend):
+    with lease_agent("key-1", "gemini-2.0-flash", ("duckduckgo",), markdown=True) as agent:
+        pass
+    with lease_agent("key-1", "gemini-2.0-flash", ("duckduckgo",), markdown=True) as again:
+        assert again is agent
+    with lease_agent("key-2", "gemini-2.0-flash", ("duckduckgo",), markdown=True) as other_key:
+        assert other_key is not agent
+    with lease_agent("key-1", "gemini-2.0-flash", (), markdown=True) as other_tools:
+        assert other_tools is not agent
+
+
+def test_concurrent_sessions_never_share_an_agent(mock_backend):
+    leased, barrier = [], threading.Barrier(4)
+
+    def session():
+        with lease_agent("key", "gemini-2.0-flash") as agent:
+            leased.append(agent)
+            barrier.wait()
+
+    threads = [threading.Thread(target=session) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(agent) for agent in leased}) == 4
+    assert len(mock_backend) == 4
+
+
+def _counter(name, **labels):
+    for counter in registry.snapshot()["counters"]:
+        if counter["name"] == name and counter["labels"] == labels:
+            return counter["value"]
+    return 0
+
+
+def test_stream_yields_deltas_that_add_up_to_the_answer(mock_backend):
+    calls = _counter("docsight_model_calls_total", model="mock-model")
+    chunks = list(stream_agent("key", "mock-model", "User question: is this high?"))
+    assert len(chunks) > 1
+    assert "".join(chunks) == mock_model.RESPONSES["answer"]
+    assert _counter("docsight_model_calls_total", model="mock-model") == calls + 1
+
+
+def test_agent_stays_leased_until_the_stream_is_closed(mock_backend):
+    stream = stream_agent("key", "mock-model", "Symptoms: headache")
+    next(stream)
+    assert len(mock_backend) == 0
+    stream.close()
+    assert len(mock_backend) == 1
@@ -0,0 +1,81 @@
+import io
+
+import numpy as np
+import pytest
+from pydicom.data import get_testdata_file
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+from dicom import DicomSeries, window_lut
+
+
+def _read(name):
+    with open(get_testdata_file(name), "rb") as f:
+        return f.read()
+
+
+def _dataset(pixels, bits_stored=12, signed=False, photometric="MONOCHROME2", **attributes):
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.file_meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.7"
+    ds.file_meta.MediaStorageSOPInstanceUID = generate_uid()
+    ds.SOPClassUID = ds.file_meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = ds.file_meta.MediaStorageSOPInstanceUID
+    ds.Rows, ds.Columns = pixels.shape
+    ds.BitsAllocated = pixels.dtype.itemsize * 8
+    ds.BitsStored = bits_stored
+    ds.HighBit = bits_stored - 1
+    ds.PixelRepresentation = int(signed)
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = photometric
+    for name, value in attributes.items():
+        setattr(ds, name, value)
+    ds.PixelData = pixels.tobytes()
+    buffer = io.BytesIO()
+    ds.save_as(buffer, enforce_file_format=True)
+    return buffer.getvalue()
+
+
+def test_default_window_spans_the_data_without_a_header_window():
+    series = DicomSeries([_read("CT_small.dcm")])
+    assert "WindowCenter" not in series.header
+    image = series.windowed(0)
+    assert image.min() == 0 and image.max() == 255
+    assert len(np.unique(image)) > 100
+
+
+def test_default_window_uses_smallest_and_largest_pixel_values():
+    pixels = np.array([[1000, 1100], [1200, 1300]], np.uint16)
+    series = DicomSeries([_dataset(pixels, SmallestImagePixelValue=1000, LargestImagePixelValue=2000,
+                                   RescaleSlope=1, RescaleIntercept=-1024)])
+    assert series.default_window() == (476.0, 1000.0)
+
+
+def test_header_window_maps_its_edges_to_black_and_white():
+    pixels = np.array([[0, 50], [300, 4095]], np.uint16)
+    series = DicomSeries([_dataset(pixels, WindowCenter=150, WindowWidth=101)])
+    assert series.windowed(0).tolist() == [[0, 0], [255, 255]]
+
+
+def test_monochrome1_is_inverted():
+    pixels = np.array([[0, 4095]], np.uint16)
+    series = DicomSeries([_dataset(pixels, photometric="MONOCHROME1")])
+    assert series.windowed(0).tolist() == [[255, 0]]
+
+
+def test_32_bit_data_is_windowed_without_a_lut():
+    window_lut.cache_clear()
+    series = DicomSeries([_read("rtdose.dcm")])
+    assert int(series.header.BitsStored) == 32
+    image = series.windowed(0)
+    assert image.dtype == np.uint8 and image.max() > image.min()
+    assert window_lut.cache_info().currsize == 0
+
+
+@pytest.mark.parametrize("signed", [False, True])
+def test_32_bit_synthetic_dataset(signed):
+    dtype = np.int32 if signed else np.uint32
+    pixels = np.array([[0, 50_000], [100_000, 3_000_000]], dtype)
+    series = DicomSeries([_dataset(pixels, bits_stored=32, signed=signed, WindowCenter=50_000, WindowWidth=100_001)])
+    assert series.windowed(0).tolist() == [[0, 128], [255, 255]]
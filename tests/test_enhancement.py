@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+import enhancement
+from enhancement import LRUByteCache, enhance, equalization_lut, histogram_equalization
+
+
+@pytest.fixture
+def result_cache(monkeypatch):
+    cache = LRUByteCache(1 << 20)
+    monkeypatch.setattr(enhancement, "result_cache", cache)
+    return cache
+
+
+def _image():
+    return np.random.default_rng(0).integers(0, 256, (64, 64), dtype=np.uint8)
+
+
+def test_cache_evicts_least_recently_used_entries_over_budget():
+    cache = LRUByteCache(300)
+    for key in "abc":
+        cache.put(key, np.zeros(100, np.uint8))
+    cache.get("a")
+    cache.put("d", np.zeros(100, np.uint8))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.current_bytes == 300
+
+
+def test_cache_skips_values_larger_than_its_budget():
+    cache = LRUByteCache(10)
+    cache.put("big", np.zeros(100, np.uint8))
+    assert len(cache) == 0
+
+
+def test_enhance_memoizes_on_content_operation_and_parameters(result_cache):
+    image = _image()
+    first = enhance(image, "Gray Level Transformation", {"gamma": 0.5})
+    assert enhance(image.copy(), "Gray Level Transformation", {"gamma": 0.5}) is first
+    assert enhance(image, "Gray Level Transformation", {"gamma": 2.0}) is not first
+    assert result_cache.hits == 1 and result_cache.misses == 2
+
+
+def test_cached_results_are_read_only(result_cache):
+    result = enhance(_image(), "Image Inversion")
+    with pytest.raises(ValueError):
+        result[0, 0] = 0
+
+
+def test_equalization_lut_matches_opencv():
+    image = _image() // 4 + 40
+    hist = np.bincount(image.ravel(), minlength=256)
+    np.testing.assert_array_equal(equalization_lut(hist)[image], histogram_equalization(image))
+
+
+def test_unknown_operation_is_rejected():
+    with pytest.raises(ValueError):
+        enhance(_image(), "Sepia")
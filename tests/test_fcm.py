@@ -0,0 +1,32 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from fcm import fuzzy_cmeans, fuzzy_cmeans_segmentation
+
+
+def _three_regions():
+    image = np.full((96, 96), 30, np.uint8)
+    image[:, 32:64] = 120
+    image[:, 64:] = 220
+    noise = np.random.default_rng(0).integers(-10, 11, image.shape)
+    return np.clip(image + noise, 0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize("fuzziness", [1.1, 2.0, 3.0])
+@pytest.mark.parametrize("spatial", [False, True])
+def test_segments_three_regions(fuzziness, spatial):
+    image = _three_regions()
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", RuntimeWarning)
+        segmented = fuzzy_cmeans_segmentation(image, 3, fuzziness, spatial=spatial)
+    for column, value in ((16, 0), (48, 127), (80, 254)):
+        assert np.mean(segmented[:, column] == value) > 0.95
+
+
+@pytest.mark.parametrize("spatial", [False, True])
+def test_memberships_are_finite_at_low_fuzziness(spatial):
+    _, memberships = fuzzy_cmeans(_three_regions(), 3, 1.1, spatial=spatial)
+    assert memberships.max() == 255
+    assert np.all(memberships.astype(int).sum(axis=-1) >= 252)
@@ -0,0 +1,24 @@
+import subprocess
+import sys
+
+import pytest
+
+from importprofile import HERE, app_modules
+
+# Libraries that take a second or more to import and are only needed once a page does real work
+DEFERRED = ("agno", "google.genai", "skimage", "scipy", "pypdf")
+
+
+def test_app_starts_without_importing_any_page():
+    startup, pages = app_modules()
+    assert {"page1", "page2", "page3", "page4"} <= set(pages)
+    assert not set(startup) & set(pages)
+
+
+@pytest.mark.parametrize("page", ["page1", "page2", "page3", "page4"])
+def test_opening_a_page_defers_heavy_libraries(page):
+    code = f"import sys, {page}; print(' '.join(sorted(sys.modules)))"
+    process = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True)
+    assert process.returncode == 0, process.stderr
+    loaded = set(process.stdout.split())
+    assert not [name for name in DEFERRED if name in loaded]
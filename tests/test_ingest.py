@@ -0,0 +1,57 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import ingest
+from ingest import IngestError, Upload, sniff
+
+
+def _encode(image, format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, format, **options)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("format, kind", [("PNG", "png"), ("JPEG", "jpeg"), ("TIFF", "tiff"), ("BMP", "bmp"), ("PDF", "pdf")])
+def test_sniff_reads_the_format_from_the_bytes(format, kind):
+    assert sniff(_encode(Image.new("RGB", (8, 8)), format), "upload.bin") == kind
+
+
+def test_sniff_falls_back_to_the_extension():
+    assert sniff(b"\x00" * 200, "slice.DCM") == "dicom"
+    assert sniff(b"\x00" * 200, "notes.txt") == "unknown"
+    assert sniff(b"\x00" * 128 + b"DICM" + b"\x00" * 16) == "dicom"
+
+
+def test_exif_orientation_is_applied():
+    image = Image.fromarray(np.zeros((100, 200, 3), np.uint8))
+    exif = image.getexif()
+    exif[0x0112] = 6  # Rotated 90 degrees clockwise
+    upload = Upload(_encode(image, "JPEG", exif=exif), "photo.jpg")
+    assert upload.image().size == (100, 200)
+    assert upload.gray().shape == (200, 100)
+
+
+def test_sixteen_bit_images_are_stretched_to_eight():
+    pixels = np.linspace(0, 4095, 64 * 64).reshape(64, 64).astype(np.uint16)
+    image = Upload(_encode(Image.fromarray(pixels), "PNG"), "scan.png").image()
+    assert image.mode == "L"
+    assert np.asarray(image).min() == 0 and np.asarray(image).max() == 255
+
+
+@pytest.mark.parametrize("side", [4000, 14000])
+def test_pixel_limit_applies_before_decoding(side, monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_PIXELS", 10_000_000)
+    upload = Upload(_encode(Image.new("1", (side, side)), "PNG"), "huge.png")
+    with pytest.raises(IngestError, match="over the limit"):
+        upload.image()
+    with pytest.raises(IngestError, match="over the limit"):
+        upload.gray()
+    assert Image.MAX_IMAGE_PIXELS is not None
+
+
+def test_unreadable_image_header_is_rejected():
+    with pytest.raises(IngestError):
+        Upload(b"\x89PNG\r\n\x1a\n" + b"\x00" * 32, "broken.png").gray()
@@ -0,0 +1,108 @@
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+import jobs
+from jobs import DONE, FAILED, JobQueue, is_transient
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "RETRY_BASE_SECONDS", 0.01)
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), workers=2, rate=1000, burst=1000)
+
+
+def _flaky(failures, error):
+    calls = []
+
+    def run():
+        calls.append(time.time())
+        if len(calls) <= failures:
+            raise error
+        return "ok"
+    return run, calls
+
+
+@pytest.mark.parametrize("error", [TimeoutError("slow"), ConnectionError("reset"), StatusError(429), StatusError(503)])
+def test_transient_errors_are_retried(queue, error):
+    run, calls = _flaky(2, error)
+    job = queue.wait(queue.submit("test", None, run), timeout=10)
+    assert job.status == DONE and job.result == "ok"
+    assert len(calls) == 3
+
+
+@pytest.mark.parametrize("error", [StatusError(400), StatusError(401), StatusError(403), ValueError("bad input")])
+def test_permanent_errors_fail_at_once(queue, error):
+    run, calls = _flaky(1, error)
+    job = queue.wait(queue.submit("test", None, run), timeout=10)
+    assert job.status == FAILED
+    assert len(calls) == 1
+
+
+def test_transient_cause_is_found():
+    try:
+        try:
+            raise StatusError(429)
+        except StatusError as e:
+            raise RuntimeError("model call failed") from e
+    except RuntimeError as e:
+        assert is_transient(e)
+
+
+def test_chunks_are_joined_and_streamed(queue):
+    job_id = queue.submit("test", None, lambda: iter(["a", "b", "c"]))
+    assert "".join(queue.follow(job_id, poll_seconds=0.01)) == "abc"
+    assert queue.get(job_id).result == "abc"
+
+
+def test_dedup_is_per_rate_key(queue):
+    gate = threading.Event()
+    first = queue.submit("test", "same", gate.wait, 5, rate_key="user-a")
+    assert queue.submit("test", "same", gate.wait, 5, rate_key="user-a") == first
+    assert queue.submit("test", "same", gate.wait, 5, rate_key="user-b") != first
+    gate.set()
+
+
+def test_finished_jobs_are_reused(queue):
+    first = queue.submit("test", "key", lambda: "answer")
+    queue.wait(first, timeout=5)
+    assert queue.submit("test", "key", lambda: "other") == first
+
+
+def test_priority_orders_queued_jobs(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1, rate=1000, burst=1000)
+    gate = threading.Event()
+    order = []
+    queue.submit("test", None, gate.wait, 5)
+    low = queue.submit("test", None, lambda: order.append("background") or "", priority=jobs.PRIORITY_BACKGROUND)
+    high = queue.submit("test", None, lambda: order.append("interactive") or "")
+    gate.set()
+    queue.wait(low, timeout=5)
+    queue.wait(high, timeout=5)
+    assert order == ["interactive", "background"]
+
+
+def test_only_jobs_of_exited_processes_are_marked_failed(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    live = JobQueue(path)
+    gate = threading.Event()
+    running = live.submit("test", None, gate.wait, 5)
+    host = socket.gethostname()
+    for owner in (f"{host}:999999999:dead", f"{host}:{os.getppid()}:other", "elsewhere:1:x"):
+        live._execute("INSERT INTO jobs (id, kind, owner, status, priority, attempts, created) "
+                      "VALUES (?, 'test', ?, 'running', 0, 1, ?)", (owner, owner, time.time()))
+    JobQueue(path).stats()  # A second server process opening the same store
+    statuses = {job_id: live.get(job_id).status for job_id in
+                (running, f"{host}:999999999:dead", f"{host}:{os.getppid()}:other", "elsewhere:1:x")}
+    gate.set()
+    assert statuses == {running: "running", f"{host}:999999999:dead": FAILED,
+                        f"{host}:{os.getppid()}:other": "running", "elsewhere:1:x": "running"}
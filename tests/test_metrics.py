@@ -0,0 +1,61 @@
+import math
+
+import pytest
+
+from metrics import MetricsRegistry, Summary, record_usage, registry, span
+
+
+@pytest.fixture
+def fresh_registry():
+    registry.reset()
+    yield registry
+    registry.reset()
+
+
+def _summary(snapshot, name, **labels):
+    return next(s for s in snapshot["summaries"] if s["name"] == name and s["labels"] == labels)
+
+
+def _counter(snapshot, name, **labels):
+    return next(c["value"] for c in snapshot["counters"] if c["name"] == name and c["labels"] == labels)
+
+
+def test_summary_quantiles_use_recent_samples_and_total_counts():
+    summary = Summary(max_samples=100)
+    for value in range(1000):
+        summary.observe(value)
+    snapshot = summary.snapshot()
+    assert snapshot["count"] == 1000 and snapshot["mean"] == 499.5
+    assert 940 < snapshot["p50"] < 960
+    assert math.isnan(Summary().snapshot()["p99"])
+
+
+def test_span_times_stages_and_counts_failures(fresh_registry):
+    with span("page2.decode"):
+        pass
+    with pytest.raises(ValueError):
+        with span("page2.decode"):
+            raise ValueError("bad image")
+    snapshot = fresh_registry.snapshot()
+    assert _summary(snapshot, "docsight_stage_seconds", stage="page2.decode")["count"] == 2
+    assert _counter(snapshot, "docsight_stage_errors_total", stage="page2.decode") == 1
+
+
+def test_usage_is_priced_per_model(fresh_registry):
+    record_usage("gemini-2.0-flash", {"input_tokens": [600_000, 400_000], "output_tokens": [500_000]})
+    record_usage("gemini-2.0-flash", None)
+    snapshot = fresh_registry.snapshot()
+    assert _counter(snapshot, "docsight_model_calls_total", model="gemini-2.0-flash") == 2
+    assert _counter(snapshot, "docsight_model_tokens_total", model="gemini-2.0-flash", direction="input") == 1_000_000
+    assert _counter(snapshot, "docsight_model_cost_usd_total", model="gemini-2.0-flash") == pytest.approx(0.30)
+
+
+def test_prometheus_export_escapes_labels():
+    metrics = MetricsRegistry()
+    metrics.observe("docsight_stage_seconds", 0.5, stage='say "hi"')
+    metrics.increment("docsight_model_calls_total", model="m")
+    text = metrics.to_prometheus()
+    assert "# TYPE docsight_stage_seconds summary" in text
+    assert 'docsight_stage_seconds{stage="say \\"hi\\"",quantile="0.5"} 0.5' in text
+    assert 'docsight_stage_seconds_count{stage="say \\"hi\\""} 1' in text
+    assert 'docsight_model_calls_total{model="m"} 1' in text
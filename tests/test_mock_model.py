@@ -0,0 +1,52 @@
+import asyncio
+import random
+
+import pytest
+
+from loadtest import _percentiles
+from mock_model import RESPONSES, MockAgent, MockBehaviour, MockModelError, parse_latency, respond
+
+
+def _behaviour(monkeypatch, error_rate=0.0):
+    monkeypatch.setenv("DOCSIGHT_MOCK_LATENCY", "fixed:0")
+    monkeypatch.setenv("DOCSIGHT_MOCK_TOKENS_PER_SECOND", "1000000")
+    monkeypatch.setenv("DOCSIGHT_MOCK_ERROR_RATE", str(error_rate))
+    monkeypatch.setenv("DOCSIGHT_MOCK_SEED", "7")
+    return MockBehaviour()
+
+
+def test_latency_specs():
+    rng = random.Random(0)
+    assert parse_latency("fixed:1.5")(rng) == 1.5
+    assert 2 <= parse_latency("uniform:2:3")(rng) <= 3
+    draws = sorted(parse_latency("lognormal:1.5:0.5")(rng) for _ in range(2001))
+    assert 1.3 < draws[1000] < 1.7
+    with pytest.raises(ValueError):
+        parse_latency("normal:1:1")
+
+
+def test_prompts_are_routed_to_matching_responses():
+    assert respond("You are a medical imaging expert.") == RESPONSES["imaging"]
+    assert respond("Symptoms: cough") == RESPONSES["symptoms"]
+    assert respond("Explain this lab report") == RESPONSES["report"]
+    assert respond("anything else") == RESPONSES["answer"]
+
+
+def test_stream_ends_with_usage_metrics(monkeypatch):
+    events = list(MockAgent("mock", behaviour=_behaviour(monkeypatch)).run("Symptoms: cough", stream=True))
+    assert "".join(event.content for event in events[:-1]) == RESPONSES["symptoms"]
+    assert events[-1].event == "RunCompleted" and events[-1].metrics["output_tokens"] > 0
+
+
+def test_error_rate_one_fails_every_call_with_a_retryable_error(monkeypatch):
+    agent = MockAgent("mock", behaviour=_behaviour(monkeypatch, error_rate=1.0))
+    with pytest.raises(MockModelError) as error:
+        agent.run("Symptoms: cough")
+    assert error.value.status_code == 503
+    with pytest.raises(MockModelError):
+        asyncio.run(agent.arun("Symptoms: cough"))
+
+
+def test_load_test_percentiles():
+    stats = _percentiles(list(range(1, 101)))
+    assert stats["count"] == 100 and stats["max"] == 100 and 50 <= stats["p50"] <= 51
@@ -0,0 +1,55 @@
+import io
+
+import numpy as np
+from PIL import Image as PILImage
+
+import model_input
+from enhancement import LRUByteCache
+from model_input import encode_for_model, model_image
+
+
+def _decode(payload):
+    return PILImage.open(io.BytesIO(payload))
+
+
+def test_large_images_are_downscaled_to_the_model_side():
+    image = PILImage.new("RGB", (4000, 1000), (10, 80, 200))
+    decoded = _decode(encode_for_model(image, 2048, "jpeg", 85))
+    assert decoded.format == "JPEG" and decoded.size == (2048, 512)
+
+
+def test_rgb_images_with_identical_channels_are_sent_as_grayscale():
+    gray = np.random.default_rng(6).integers(0, 256, (80, 80), dtype=np.uint8)
+    image = PILImage.fromarray(np.stack([gray] * 3, axis=-1))
+    assert _decode(encode_for_model(image, 3072, "png")).mode == "L"
+
+
+def test_orientation_is_applied_and_metadata_dropped():
+    image = PILImage.new("RGB", (40, 20), (200, 10, 10))
+    exif = image.getexif()
+    exif[0x0112] = 6  # Rotated 90 degrees clockwise
+    exif[0x010F] = "Camera maker"
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", exif=exif)
+    decoded = _decode(encode_for_model(_decode(buffer.getvalue()), 3072, "jpeg", 85))
+    assert decoded.size == (20, 40)
+    assert not decoded.getexif()
+
+
+def test_transparent_images_get_a_white_background_for_jpeg():
+    image = PILImage.new("RGBA", (10, 10), (0, 0, 0, 0))
+    assert _decode(encode_for_model(image, 3072, "jpeg", 85)).convert("L").getpixel((5, 5)) > 250
+
+
+def test_16_bit_images_are_stretched_to_8_bit():
+    image = PILImage.fromarray(np.array([[1000, 3000]], dtype=np.uint16))
+    assert np.asarray(_decode(encode_for_model(image, 3072, "png"))).tolist() == [[0, 255]]
+
+
+def test_payloads_are_cached_per_profile(monkeypatch):
+    monkeypatch.setattr(model_input, "payload_cache", LRUByteCache(1 << 20))
+    image = PILImage.new("RGB", (30, 30), (1, 2, 3))
+    first = model_image(image, "key", "report")
+    assert first.mime_type == "image/jpeg"
+    assert model_image(image, "key", "report").content is first.content
+    assert model_image(image, "key", "medical").mime_type == "image/png"
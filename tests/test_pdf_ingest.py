@@ -0,0 +1,82 @@
+import io
+
+import pytest
+from PIL import Image as PILImage
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+import pdf_ingest
+from enhancement import LRUByteCache
+from ingest import IngestError
+from pdf_ingest import compact_text, extract_pages
+
+LAB_LINES = ["Hemoglobin      13.2 g/dL      12.0 - 15.5", "Creatinine      1.4 mg/dL      0.6 - 1.2   HIGH"]
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(pdf_ingest, "pdf_cache", LRUByteCache(1 << 24))
+    # Keep the result independent of whether Tesseract happens to be installed
+    monkeypatch.setattr(pdf_ingest, "ocr_text", lambda image: (None, 0))
+
+
+def _text_page(writer, lines):
+    page = writer.add_blank_page(612, 792)
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Courier"),
+    })
+    page[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)}),
+    })
+    body = "".join(f"BT /F1 10 Tf 50 {700 - 14 * index} Td ({line}) Tj ET\n" for index, line in enumerate(lines))
+    content = DecodedStreamObject()
+    content.set_data(body.encode())
+    page[NameObject("/Contents")] = writer._add_object(content)
+
+
+def _pdf(writer):
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def _scanned_pdf():
+    buffer = io.BytesIO()
+    PILImage.new("L", (300, 400), 200).save(buffer, format="PDF")
+    return buffer.getvalue()
+
+
+def test_text_layer_pages_skip_the_image():
+    writer = PdfWriter()
+    _text_page(writer, LAB_LINES)
+    [page] = extract_pages(_pdf(writer), "report")
+    assert page.source == "text" and page.image is None
+    assert "Creatinine" in page.text and "HIGH" in page.text
+
+
+def test_scanned_pages_fall_back_to_their_image():
+    [page] = extract_pages(_scanned_pdf(), "scan")
+    assert page.source == "vision" and page.text is None
+    assert page.image.size == (300, 400)
+
+
+def test_legible_ocr_replaces_the_vision_call(monkeypatch):
+    monkeypatch.setattr(pdf_ingest, "ocr_text", lambda image: ("\n".join(LAB_LINES), 90.0))
+    [page] = extract_pages(_scanned_pdf(), "scan")
+    assert page.source == "ocr" and page.text.startswith("Hemoglobin")
+
+
+def test_password_protected_and_damaged_pdfs_raise_ingest_error():
+    writer = PdfWriter()
+    _text_page(writer, LAB_LINES)
+    writer.encrypt("secret")
+    with pytest.raises(IngestError, match="password"):
+        extract_pages(_pdf(writer), "locked")
+    with pytest.raises(IngestError):
+        extract_pages(b"%PDF-1.4\nnot really a pdf", "damaged")
+
+
+def test_compact_text_keeps_column_gaps():
+    assert compact_text("  Glucose        92 mg/dL   \n\n\n  page 1  ") == "Glucose  92 mg/dL\npage 1"
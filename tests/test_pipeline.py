@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+import enhancement
+from enhancement import LRUByteCache, apply_operation
+from pipeline import Pipeline, run_pipeline
+
+
+def _image():
+    image = np.random.default_rng(1).integers(0, 256, (80, 96), dtype=np.uint8)
+    image[20:60, 30:70] //= 3
+    return image
+
+
+def _stepwise(image, steps):
+    for operation, params in steps:
+        image = apply_operation(image, operation, params)
+    return image
+
+
+@pytest.mark.parametrize("steps", [
+    [("Histogram Equalization", {}), ("Image Inversion", {})],
+    [("Image Inversion", {}), ("Histogram Equalization", {})],
+    [("Gray Level Transformation", {"gamma": 0.6}), ("Intensity Windowing", {"center": 100, "width": 120}),
+     ("Histogram Equalization", {})],
+])
+def test_point_operations_fuse_into_one_exact_lut(steps):
+    pipeline = Pipeline(steps)
+    assert pipeline.passes == 1
+    np.testing.assert_array_equal(pipeline.run(_image()), _stepwise(_image(), steps))
+
+
+def test_smoothing_filters_fuse_within_rounding():
+    steps = [("Image Smoothing", {"kernel_size": 5}), ("Low Pass Filter", {})]
+    pipeline = Pipeline(steps)
+    assert pipeline.passes == 1
+    # The fused kernel skips the intermediate uint8 rounding, so allow one level
+    difference = pipeline.run(_image()).astype(int) - _stepwise(_image(), steps)
+    assert np.abs(difference).max() <= 1
+
+
+def test_smoothing_fuses_with_a_final_sharpening():
+    steps = [("Image Smoothing", {"kernel_size": 3}), ("Image Sharpening", {})]
+    assert Pipeline(steps).passes == 1
+
+
+def test_sharpening_is_not_fused_with_a_following_filter():
+    assert Pipeline([("Image Sharpening", {}), ("Image Smoothing", {"kernel_size": 3})]).passes == 2
+
+
+def test_terminal_operation_must_be_last():
+    with pytest.raises(ValueError):
+        Pipeline([("Edge Detection", {}), ("Image Inversion", {})])
+
+
+def test_run_pipeline_is_memoized(monkeypatch):
+    monkeypatch.setattr(enhancement, "result_cache", LRUByteCache(1 << 20))
+    monkeypatch.setattr("pipeline.result_cache", enhancement.result_cache)
+    steps = [("Image Inversion", {}), ("Median Filter", {"kernel_size": 3})]
+    assert run_pipeline(_image(), steps) is run_pipeline(_image(), steps)
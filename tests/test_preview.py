@@ -0,0 +1,49 @@
+import numpy as np
+
+import enhancement
+from enhancement import LRUByteCache, apply_operation
+from preview import iter_full_resolution, needs_preview, preview_enhance, proxy_image, scale_params
+
+
+def _image():
+    return np.random.default_rng(3).integers(0, 256, (300, 200), dtype=np.uint8)
+
+
+def _fresh_caches(monkeypatch):
+    for name in ("decoded_cache", "result_cache"):
+        cache = LRUByteCache(1 << 24)
+        monkeypatch.setattr(enhancement, name, cache)
+        monkeypatch.setattr(f"preview.{name}", cache)
+
+
+def test_proxy_fits_the_preview_side():
+    proxy, scale = proxy_image(_image(), "key", max_side=100)
+    assert max(proxy.shape) == 100 and scale == 100 / 300
+    assert needs_preview(_image(), max_side=100) and not needs_preview(_image(), max_side=300)
+
+
+def test_kernel_sizes_shrink_but_stay_odd_and_at_least_three():
+    assert scale_params({"kernel_size": 15, "gamma": 2.0}, 0.5) == {"kernel_size": 9, "gamma": 2.0}
+    assert scale_params({"kernel_size": 5}, 0.1) == {"kernel_size": 3}
+
+
+def test_preview_runs_on_the_proxy(monkeypatch):
+    _fresh_caches(monkeypatch)
+    assert preview_enhance(_image(), "key", "Median Filter", {"kernel_size": 5}, max_side=100).shape == (100, 67)
+
+
+def test_banded_full_resolution_matches_whole_image_and_is_cached(monkeypatch):
+    _fresh_caches(monkeypatch)
+    image = _image()
+    params = {"kernel_size": 5}
+    frames = list(iter_full_resolution(image, "key", "Median Filter", params, bands=4))
+    assert len(frames) == 4
+    np.testing.assert_array_equal(frames[-1], apply_operation(image, "Median Filter", params))
+    assert enhancement.enhance(image, "Median Filter", params, image_key="key") is not None
+    assert enhancement.result_cache.hits == 1
+
+
+def test_point_operations_render_in_one_step(monkeypatch):
+    _fresh_caches(monkeypatch)
+    frames = list(iter_full_resolution(_image(), "key", "Histogram Equalization", {}))
+    assert len(frames) == 1
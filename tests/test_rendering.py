@@ -0,0 +1,34 @@
+import cv2
+import numpy as np
+from PIL import Image as PILImage
+
+import rendering
+from enhancement import LRUByteCache
+from rendering import as_display_array, display_bytes, full_resolution_png
+
+
+def test_display_array_is_downscaled_uint8():
+    image = np.random.default_rng(4).random((1000, 3000))
+    display = as_display_array(image, width=1400)
+    assert display.dtype == np.uint8 and display.shape == (467, 1400)
+
+
+def test_rgba_and_16_bit_pil_images_become_displayable():
+    assert as_display_array(PILImage.new("RGBA", (20, 10))).shape == (10, 20, 3)
+    assert as_display_array(np.zeros((10, 20, 4), np.uint8)).shape == (10, 20, 3)
+    assert as_display_array(PILImage.new("I;16", (20, 10))).dtype == np.uint8
+
+
+def test_display_payload_is_a_cached_jpeg(monkeypatch):
+    monkeypatch.setattr(rendering, "encoded_cache", LRUByteCache(1 << 20))
+    image = np.random.default_rng(5).integers(0, 256, (50, 60), dtype=np.uint8)
+    payload = display_bytes(image)
+    assert payload[:2] == b"\xff\xd8"
+    assert display_bytes(image.copy()) is payload
+    assert display_bytes(image, fmt="webp")[8:12] == b"WEBP"
+
+
+def test_full_resolution_png_keeps_16_bit_depth():
+    image = np.arange(12, dtype=np.uint16).reshape(3, 4) * 5000
+    decoded = cv2.imdecode(np.frombuffer(full_resolution_png(image), np.uint8), cv2.IMREAD_UNCHANGED)
+    np.testing.assert_array_equal(decoded, image)
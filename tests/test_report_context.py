@@ -0,0 +1,36 @@
+from report_context import chunk_text, compact_history, estimate_tokens, report_collection, retrieve
+
+USER, AI = "🧑‍💻 You", "🤖 AI"
+
+
+def test_only_answers_are_clipped():
+    question = "Is my creatinine of 1.4 mg/dL serious given that my eGFR " + "was also lower " * 40
+    history = [(USER, question), (AI, "word " * 400)]
+    (_, kept_question), (_, kept_answer) = compact_history(history, token_budget=10_000, answer_chars=100)
+    assert kept_question == question
+    assert len(kept_answer) <= 102 and kept_answer.endswith(" …")
+
+
+def test_history_keeps_the_most_recent_turns_within_budget():
+    history = [(USER, f"question {index} " * 10) for index in range(20)]
+    kept = compact_history(history, token_budget=100)
+    assert kept == history[-len(kept):]
+    assert sum(estimate_tokens(message) for _, message in kept) <= 100
+    assert len(kept) < len(history)
+
+
+def test_chunks_respect_the_size_limit():
+    text = "\n\n".join(f"## Test {index}\n" + "value " * 50 for index in range(10)) + "\n\n" + "x" * 2000
+    chunks = chunk_text(text, max_chars=400)
+    assert all(len(chunk) <= 400 for chunk in chunks)
+    assert "".join(chunks).count("## Test") == 10
+
+
+def test_retrieval_finds_the_page_about_the_question():
+    summary = "## Summary\nMost results are within the reference range."
+    pages = ["Hemoglobin 13.5 g/dL normal. White cells 6.1 normal.",
+             "Creatinine 1.9 mg/dL high. eGFR 41 low, suggesting reduced kidney function."]
+    collection = report_collection(summary, pages)
+    assert report_collection(summary, pages) is collection
+    best = retrieve(collection, "Is my creatinine high?", k=1)
+    assert len(best) == 1 and best[0].startswith("[page 2]")
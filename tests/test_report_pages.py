@@ -0,0 +1,50 @@
+import time
+
+import pytest
+from PIL import Image as PILImage
+
+import mock_model
+import report_pages
+from enhancement import LRUByteCache
+from ratelimit import TokenBucket
+from report_pages import ReportPage, merge_prompt, transcribe_report
+
+
+@pytest.fixture
+def slow_pages(mock_backend, monkeypatch):
+    mock_model.shared_behaviour().latency = mock_model.parse_latency("fixed:0.2")
+    monkeypatch.setattr(report_pages, "request_bucket", TokenBucket(1000, 100))
+    monkeypatch.setattr(report_pages, "transcript_cache", LRUByteCache(1 << 20))
+
+
+def _pages(count):
+    return [ReportPage(f"page{index}", PILImage.new("RGB", (40, 40), (index, 0, 0)), None, "image")
+            for index in range(count)]
+
+
+def test_pages_are_transcribed_concurrently_in_page_order(slow_pages):
+    start = time.perf_counter()
+    transcripts = transcribe_report("key", "mock-model", _pages(4), concurrency=4)
+    assert time.perf_counter() - start < 0.6
+    assert transcripts == [mock_model.RESPONSES["transcript"]] * 4
+
+
+def test_concurrency_limit_is_respected(slow_pages):
+    start = time.perf_counter()
+    transcribe_report("key", "mock-model", _pages(3), concurrency=1)
+    assert time.perf_counter() - start >= 0.6
+
+
+def test_known_text_and_cached_transcripts_skip_the_model(slow_pages):
+    pages = _pages(2)
+    transcribe_report("key", "mock-model", pages, concurrency=2)
+    pages.append(ReportPage("text", None, "Glucose 92 mg/dL", "text"))
+    start = time.perf_counter()
+    transcripts = transcribe_report("key", "mock-model", pages)
+    assert time.perf_counter() - start < 0.1
+    assert transcripts[-1] == "Glucose 92 mg/dL"
+
+
+def test_merge_prompt_numbers_every_page():
+    prompt = merge_prompt("Explain the report.", ["first", "second"])
+    assert "2 pages" in prompt and "### Page 1\nfirst" in prompt and "### Page 2\nsecond" in prompt
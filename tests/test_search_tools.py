@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+
+import pytest
+
+import search_tools
+from search_tools import CachedSearchTools, SearchCache, normalize_query, search_many
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    monkeypatch.delenv("DOCSIGHT_MODEL_BACKEND", raising=False)
+    monkeypatch.delenv("DOCSIGHT_SEARCH_BACKEND", raising=False)
+    monkeypatch.setattr(search_tools, "search_cache", SearchCache())
+    calls = []
+    release = threading.Event()
+    release.set()
+
+    def search(query, max_results):
+        calls.append(query)
+        release.wait(5)
+        if "broken" in query:
+            raise RuntimeError("provider down")
+        return [{"title": query, "url": "https://example.org", "snippet": ""}][:max_results]
+
+    monkeypatch.setitem(search_tools.PROVIDERS, "fake", search)
+    search.calls, search.release = calls, release
+    return search
+
+
+def test_queries_differing_in_case_and_punctuation_share_a_cache_entry(provider):
+    assert normalize_query("  Pneumonia, chest X-ray?") == "pneumonia chest x ray"
+    assert search_many(["Pneumonia treatment"], "fake")["Pneumonia treatment"]["source"] == "live"
+    assert search_many(["pneumonia  treatment!"], "fake")["pneumonia  treatment!"]["source"] == "cache"
+    assert provider.calls == ["Pneumonia treatment"]
+
+
+def test_slow_searches_time_out_and_fill_the_cache_later(provider):
+    provider.release.clear()
+    start = time.perf_counter()
+    answers = search_many(["slow query", "other query"], "fake", budget=0.1)
+    assert time.perf_counter() - start < 1
+    assert {answer["source"] for answer in answers.values()} == {"timeout"}
+    provider.release.set()
+    deadline = time.monotonic() + 5
+    while search_tools.search_cache.get(("fake", "slow query", 5)) is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert search_many(["slow query"], "fake")["slow query"]["source"] == "cache"
+
+
+def test_stale_results_are_served_when_a_refresh_misses_the_budget(provider):
+    search_tools.search_cache.ttl_seconds = 0
+    search_many(["query"], "fake")
+    time.sleep(0.01)
+    provider.release.clear()
+    assert search_many(["query"], "fake", budget=0.05)["query"]["source"] == "stale"
+    provider.release.set()
+
+
+def test_provider_errors_are_reported_per_query(provider):
+    answers = search_many(["broken query", "fine query"], "fake")
+    assert answers["broken query"]["source"] == "error" and "provider down" in answers["broken query"]["error"]
+    assert answers["fine query"]["source"] == "live"
+
+
+def test_tool_accepts_a_single_query_string(provider):
+    answers = json.loads(CachedSearchTools("fake").web_search("kidney function"))
+    assert answers["kidney function"]["results"][0]["title"] == "kidney function"
+
+
+def test_mock_model_backend_uses_the_local_provider(provider, monkeypatch):
+    monkeypatch.setenv("DOCSIGHT_MODEL_BACKEND", "mock")
+    monkeypatch.setenv("DOCSIGHT_LOCAL_SEARCH_LATENCY", "0")
+    answers = search_many(["anemia"], "fake")
+    assert answers["anemia"]["results"][0]["url"].startswith("https://example.org/anemia/")
+    assert not provider.calls
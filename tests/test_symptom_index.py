@@ -0,0 +1,50 @@
+import pytest
+
+from symptom_index import triage
+
+
+@pytest.mark.parametrize("text, symptoms", [
+    ("no fever", []),
+    ("no fever, chest pain, shortness of breath", ["chest pain", "shortness of breath"]),
+    ("not coughing, vomiting blood", ["vomiting blood"]),
+    ("no fever; chest pain", ["chest pain"]),
+    ("no fever. Chest pain", ["chest pain"]),
+    ("denies chest pain but short of breath", ["shortness of breath"]),
+    ("no headache and vomiting blood", ["vomiting blood"]),
+])
+def test_negation_ends_at_clause_boundary(text, symptoms):
+    assert triage(text).symptoms == symptoms
+
+
+def test_negated_clause_keeps_red_flags_of_the_next():
+    result = triage("no fever, chest pain, shortness of breath")
+    assert result.risk_level == "Emergency"
+    assert any("Chest pain with breathlessness" in flag for flag in result.red_flags)
+    assert triage("not coughing, vomiting blood").risk_level == "Emergency"
+
+
+@pytest.mark.parametrize("text, symptoms", [
+    ("no chest pain or shortness of breath", []),
+    ("neither fever nor cough", []),
+    ("no fever or chills, but cough", ["cough"]),
+    ("fever or cough", ["fever", "cough"]),
+])
+def test_negation_carries_through_or_lists(text, symptoms):
+    assert triage(text).symptoms == symptoms
+
+
+def test_negated_or_list_is_low_risk():
+    assert triage("no chest pain or shortness of breath").risk_level == "Low"
+
+
+def test_age_adjusts_risk_only_when_given():
+    assert triage("runny nose, sore throat").risk_level == "Low"
+    assert triage("runny nose, sore throat", age=30).risk_level == "Low"
+    assert triage("runny nose, sore throat", age=1).risk_level == "Moderate"
+    assert triage("runny nose, sore throat", age=80).risk_level == "Moderate"
+
+
+def test_age_gated_red_flags_fire_without_an_age():
+    assert any("over age 40" in flag for flag in triage("chest pain").red_flags)
+    assert not any("over age 40" in flag for flag in triage("chest pain", age=30).red_flags)
+    assert any("over age 40" in flag for flag in triage("chest pain", age=55).red_flags)
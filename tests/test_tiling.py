@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from enhancement import apply_operation
+from tiling import halo_for, iter_tiles, process_tiled, spill_to_memmap
+
+
+def _image(dtype=np.uint8, shape=(150, 170)):
+    high = np.iinfo(dtype).max
+    return np.random.default_rng(2).integers(0, high // 4, shape).astype(dtype)
+
+
+@pytest.mark.parametrize("operation, params", [
+    ("Median Filter", {"kernel_size": 5}),
+    ("Image Smoothing", {"kernel_size": 7}),
+    ("Low Pass Filter", {}),
+    ("Edge Detection", {"method": "Sobel"}),
+])
+def test_tiled_filters_match_the_whole_image(operation, params):
+    image = _image()
+    tiled = process_tiled(image, operation, params, tile_size=64, workers=2)
+    whole = np.asarray(apply_operation(image, operation, params))
+    # Tiles may dispatch to another backend, which is equivalent only within its tolerance
+    np.testing.assert_allclose(np.asarray(tiled, np.float64), whole, atol=1)
+
+
+def test_equalization_of_16_bit_images_uses_the_global_histogram():
+    image = _image(np.uint16)
+    image[:50] += 10000
+    tiled = np.asarray(process_tiled(image, "Histogram Equalization", tile_size=(40, 60)))
+    assert tiled.dtype == np.uint16
+    # Equalization keeps the order of gray levels across every tile
+    order = np.argsort(image.ravel(), kind="stable")
+    assert (np.diff(tiled.ravel()[order].astype(np.int64)) >= 0).all()
+    assert tiled.max() == 65535
+
+
+def test_memmapped_sources_are_processed_without_copying(tmp_path):
+    mapped = spill_to_memmap(_image(), str(tmp_path / "source.npy"))
+    assert isinstance(mapped, np.memmap)
+    output = process_tiled(str(tmp_path / "source.npy"), "Image Inversion", tile_size=64,
+                           output_path=str(tmp_path / "out.npy"))
+    np.testing.assert_array_equal(np.load(tmp_path / "out.npy"), 255 - np.asarray(mapped))
+    assert output.shape == mapped.shape
+
+
+def test_tiles_cover_every_pixel_once():
+    covered = np.zeros((100, 130), np.int64)
+    for read, core, out in iter_tiles(covered.shape, 32, 3):
+        assert [c.stop - c.start for c in core] == [o.stop - o.start for o in out]
+        assert [r.start + c.start for r, c in zip(read, core)] == [o.start for o in out]
+        covered[out] += 1
+    assert (covered == 1).all()
+
+
+def test_whole_image_operations_cannot_be_tiled():
+    assert halo_for("Edge Detection", {"method": "Canny"}) is None
+    with pytest.raises(ValueError):
+        process_tiled(_image(), "Image Segmentation", tile_size=64)
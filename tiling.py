@@ -0,0 +1,168 @@
+"""Tiled, memory-mapped execution of the enhancement filters for very large or 16-bit images.
+
+Each tile is read from the source with a halo wide enough for the filter's
+neighbourhood, filtered, and only its core is written to the output memmap.
+Tiles at the image border have no halo on that side, so the filter's own
+border handling applies exactly as it would on the whole image. Tiles fall in
+a smaller size bucket than the whole image, so backends.dispatch may pick a
+different (equivalent within tolerance) implementation for them.
+"""
+import contextlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from enhancement import POINT_OPERATIONS, apply_operation
+
+DEFAULT_TILE_SIZE = 1024
+
+# Neighbourhood radius in pixels each filter reads around an output pixel
+HALOS = {
+    "Image Smoothing": lambda kernel_size=3: kernel_size // 2,
+    "Image Sharpening": lambda: 1,
+    "Low Pass Filter": lambda: 2,
+    "High Pass Filter": lambda: 1,
+    "Median Filter": lambda kernel_size=3: kernel_size // 2,
+    "Point Detection": lambda: 1,
+    "Line Detection": lambda: 1,
+    "Edge Detection": lambda method="Sobel": 1 if method == "Sobel" else None,
+}
+
+
+def halo_for(operation, params=None):
+    """Return the halo width for a tileable filter, 0 for point operations, or None if it cannot be tiled."""
+    params = params or {}
+    if operation in POINT_OPERATIONS:
+        return 0
+    if operation not in HALOS:
+        return None
+    return HALOS[operation](**params)
+
+
+def open_source(source):
+    """Return a read-only array for an .npy path (memory-mapped), an image path, or an array."""
+    if isinstance(source, np.ndarray):
+        return source
+    if str(source).lower().endswith(".npy"):
+        return np.load(source, mmap_mode="r")
+    # Compressed formats must be decoded whole; spill to a memmap so tiles are paged in on demand
+    image = cv2.imread(str(source), cv2.IMREAD_GRAYSCALE | cv2.IMREAD_ANYDEPTH)
+    if image is None:
+        raise ValueError(f"Could not decode {source}")
+    return spill_to_memmap(image)
+
+
+def decode_to_memmap(file_bytes):
+    """Decode uploaded bytes at their native bit depth into a memory-mapped array."""
+    buffer = np.frombuffer(file_bytes, dtype=np.uint8)
+    image = cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE | cv2.IMREAD_ANYDEPTH)
+    if image is None:
+        raise ValueError("Could not decode the uploaded image")
+    return spill_to_memmap(image)
+
+
+def _temporary_npy():
+    handle, path = tempfile.mkstemp(suffix=".npy")
+    os.close(handle)
+    return path
+
+
+def _discard(path):
+    # The mapping stays valid after unlinking on POSIX; elsewhere the temp file is left for the OS to clean
+    with contextlib.suppress(OSError):
+        os.unlink(path)
+
+
+def spill_to_memmap(image, path=None):
+    temporary = path is None
+    path = path or _temporary_npy()
+    spilled = np.lib.format.open_memmap(path, mode="w+", dtype=image.dtype, shape=image.shape)
+    spilled[:] = image
+    spilled.flush()
+    del spilled
+    mapped = np.load(path, mmap_mode="r")
+    if temporary:
+        _discard(path)
+    return mapped
+
+
+def iter_tiles(shape, tile_size, halo):
+    """Yield (read window, core window inside the read tile, output window) slices for each tile.
+
+    tile_size is either a side length or a (height, width) pair.
+    """
+    height, width = shape[:2]
+    tile_height, tile_width = (tile_size, tile_size) if np.isscalar(tile_size) else tile_size
+    for top in range(0, height, tile_height):
+        for left in range(0, width, tile_width):
+            bottom, right = min(top + tile_height, height), min(left + tile_width, width)
+            read_top, read_left = max(top - halo, 0), max(left - halo, 0)
+            read_bottom, read_right = min(bottom + halo, height), min(right + halo, width)
+            read = (slice(read_top, read_bottom), slice(read_left, read_right))
+            core = (slice(top - read_top, bottom - read_top), slice(left - read_left, right - read_left))
+            out = (slice(top, bottom), slice(left, right))
+            yield read, core, out
+
+
+def _levels(dtype):
+    return 256 if dtype == np.uint8 else 65536
+
+
+def _point_lut(source, operation, params, tile_size):
+    levels = _levels(source.dtype)
+    hist = None
+    if operation == "Histogram Equalization":
+        # Global statistics: one streaming pass accumulates the histogram tile by tile
+        hist = np.zeros(levels, dtype=np.int64)
+        for read, _, _ in iter_tiles(source.shape, tile_size, 0):
+            hist += np.bincount(np.asarray(source[read]).ravel(), minlength=levels)
+    return POINT_OPERATIONS[operation](hist, levels=levels, **params)
+
+
+def process_tiled(source, operation, params=None, output_path=None, tile_size=DEFAULT_TILE_SIZE, workers=1):
+    """Apply a filter tile by tile, writing into a memory-mapped .npy output.
+
+    Peak memory is bounded by workers x (tile_size + 2 x halo)^2 rather than the image size.
+    """
+    params = params or {}
+    source = open_source(source)
+    if source.ndim != 2 or source.dtype not in (np.uint8, np.uint16):
+        raise ValueError("Tiled mode expects a single-channel uint8 or uint16 image")
+    halo = halo_for(operation, params)
+    if halo is None:
+        raise ValueError(f"{operation} depends on the whole image and cannot be tiled")
+
+    lut = _point_lut(source, operation, params, tile_size) if operation in POINT_OPERATIONS else None
+    tiles = list(iter_tiles(source.shape, tile_size, halo))
+
+    def run_tile(tile):
+        read, core, _ = tile
+        block = np.ascontiguousarray(source[read])
+        if lut is not None:
+            return np.take(lut, block)
+        return np.asarray(apply_operation(block, operation, params))[core]
+
+    # The first tile fixes the output dtype (e.g. float for Sobel) before the memmap is created
+    first = run_tile(tiles[0])
+    temporary = output_path is None
+    output_path = output_path or _temporary_npy()
+    output = np.lib.format.open_memmap(output_path, mode="w+", dtype=first.dtype, shape=source.shape)
+    if temporary:
+        _discard(output_path)
+    output[tiles[0][2]] = first
+
+    def write_tile(tile):
+        output[tile[2]] = run_tile(tile)
+
+    if workers > 1:
+        # OpenCV and SciPy release the GIL, so threads process tiles in parallel
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(write_tile, tiles[1:]))
+    else:
+        for tile in tiles[1:]:
+            write_tile(tile)
+    output.flush()
+    return output